@@ -0,0 +1,107 @@
+import csv
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from bd.models import Client, CommandeItem, Produit
+
+FORMATS = ('csv', 'jsonl')
+
+# Lignes lues par aller-retour en base : la mémoire reste constante quel que soit le volume
+TAILLE_LOT = 2000
+
+
+class FiltreInvalide(ValueError):
+    pass
+
+
+def _debut_du_jour(jour):
+    return timezone.make_aware(datetime.datetime.combine(jour, datetime.time.min))
+
+
+def _plage(champ, debut=None, fin=None):
+    """Filtre sur un champ date/heure, bornes incluses, sans fonction appliquée à la colonne"""
+    filtres = {}
+    try:
+        if debut:
+            filtres[f'{champ}__gte'] = _debut_du_jour(datetime.date.fromisoformat(debut))
+        if fin:
+            filtres[f'{champ}__lt'] = _debut_du_jour(datetime.date.fromisoformat(fin) + datetime.timedelta(days=1))
+    except ValueError:
+        raise FiltreInvalide('Date attendue au format AAAA-MM-JJ')
+    return filtres
+
+
+def _commandes(debut=None, fin=None, statut=None):
+    # Une ligne par article commandé, jointures comprises : pas de prefetch ni d'objets modèles
+    lignes = CommandeItem.objects.filter(**_plage('commande__date', debut, fin))
+    if statut:
+        lignes = lignes.filter(commande__statut=statut)
+    return lignes.order_by('commande_id', 'id')
+
+
+def _produits(debut=None, fin=None, statut=None):
+    produits = Produit.objects.all()
+    if statut:
+        produits = produits.filter(statut=statut)
+    return produits.order_by('id')
+
+
+def _clients(debut=None, fin=None, statut=None):
+    clients = Client.objects.filter(**_plage('date_joined', debut, fin))
+    if statut:
+        clients = clients.filter(is_active=(statut == 'actif'))
+    return clients.order_by('idClient')
+
+
+# nom : (queryset filtré, colonnes exportées — chemins values_list)
+EXPORTS = {
+    'commandes': (_commandes, (
+        'commande_id', 'commande__date', 'commande__statut', 'commande__montant_total',
+        'commande__client__email', 'commande__client__nom', 'commande__client__prenom',
+        'produit_id', 'produit__nom', 'quantite', 'prix',
+    )),
+    'produits': (_produits, (
+        'id', 'nom', 'categorie__nom', 'vendeur__email', 'prix', 'prix_effectif',
+        'pourcentage_promotion', 'stock', 'statut', 'actif',
+    )),
+    'clients': (_clients, (
+        'idClient', 'email', 'nom', 'prenom', 'telephone', 'date_joined', 'is_active',
+    )),
+}
+
+
+class _Tampon:
+    """Pseudo-fichier : csv.writer y écrit une ligne et la récupère aussitôt"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def lignes_export(nom, format='csv', debut=None, fin=None, statut=None):
+    """
+    Générateur de lignes texte (en-tête CSV compris) pour l'export `nom`,
+    lues par lots de TAILLE_LOT via .iterator().
+    """
+    if nom not in EXPORTS:
+        raise FiltreInvalide(f'Export inconnu : {nom}')
+    if format not in FORMATS:
+        raise FiltreInvalide(f'Format inconnu : {format}')
+    construire, colonnes = EXPORTS[nom]
+    valeurs = construire(debut, fin, statut).values_list(*colonnes).iterator(chunk_size=TAILLE_LOT)
+    entetes = [colonne.replace('__', '_') for colonne in colonnes]
+    return _csv(entetes, valeurs) if format == 'csv' else _jsonl(entetes, valeurs)
+
+
+def _csv(entetes, valeurs):
+    writer = csv.writer(_Tampon())
+    yield writer.writerow(entetes)
+    for ligne in valeurs:
+        yield writer.writerow(ligne)
+
+
+def _jsonl(entetes, valeurs):
+    for ligne in valeurs:
+        yield json.dumps(dict(zip(entetes, ligne)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
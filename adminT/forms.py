@@ -5,7 +5,7 @@ from bd.models import Produit, Categorie, Vendeur
 class ProduitForm(forms.ModelForm):
     class Meta:
         model = Produit
-        fields = ['nom', 'description', 'prix', 'stock', 'categorie', 'vendeur', 'statut']
+        fields = ['nom', 'description', 'prix', 'stock', 'categorie', 'vendeur', 'statut', 'image']
         widgets = {
             'nom': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -0,0 +1,196 @@
+import csv
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from bd import metriques
+from bd.cache import invalider_catalogue
+from bd.models import Categorie, Produit, Vendeur
+from adminT.forms import ProduitForm
+from clients.recherche import indexer_produits
+
+FORMATS = ('csv', 'jsonl')
+
+TAILLE_LOT = 1000
+
+# Au-delà, les erreurs sont seulement comptées
+MAX_ERREURS_DETAILLEES = 1000
+
+# Champs validés par les champs de ProduitForm, instanciés une seule fois
+CHAMPS_FORMULAIRE = ('nom', 'description', 'prix', 'stock')
+STATUTS = {valeur for valeur, _ in ProduitForm.base_fields['statut'].widget.choices}
+STATUT_DEFAUT = 'disponible'
+
+CHAMPS_MODIFIES = ('nom', 'description', 'prix', 'stock', 'categorie', 'vendeur', 'statut')
+
+
+class FormatInvalide(ValueError):
+    pass
+
+
+def lire_enregistrements(fichier, format):
+    """Itère sur les lignes d'un fichier texte CSV (avec en-tête) ou JSONL : (numéro, dict)"""
+    if format == 'csv':
+        # Numéro de ligne du fichier, en-tête compris
+        for numero, ligne in enumerate(csv.DictReader(fichier), start=2):
+            yield numero, ligne
+    elif format == 'jsonl':
+        for numero, ligne in enumerate(fichier, start=1):
+            if not ligne.strip():
+                continue
+            try:
+                donnees = json.loads(ligne)
+            except ValueError:
+                donnees = None
+            yield numero, donnees if isinstance(donnees, dict) else None
+    else:
+        raise FormatInvalide(f'Format inconnu : {format}')
+
+
+class ImportProduits:
+    """
+    Import en masse de produits : chaque ligne est validée avec les champs de
+    ProduitForm (sans formulaire par ligne), catégories et vendeurs sont
+    résolus par des tables en mémoire, puis les produits sont créés ou mis à
+    jour par lots (bulk_create / bulk_update). Un produit existant est
+    reconnu par sa colonne `id` ou par le couple (vendeur, nom).
+
+    Si `vendeur` est fourni (import par un vendeur), tous les produits lui
+    sont rattachés et seuls les siens peuvent être modifiés.
+    """
+
+    def __init__(self, vendeur=None, taille_lot=TAILLE_LOT):
+        self.vendeur = vendeur
+        self.taille_lot = taille_lot
+        self.champs = {nom: ProduitForm.base_fields[nom] for nom in CHAMPS_FORMULAIRE}
+        self.categories = {}
+        for pk, nom in Categorie.objects.values_list('id', 'nom'):
+            self.categories[str(pk)] = pk
+            self.categories[nom.strip().lower()] = pk
+        self.vendeurs = {}
+        if vendeur is None:
+            for pk, email in Vendeur.objects.values_list('idVendeur', 'email'):
+                self.vendeurs[str(pk)] = pk
+                self.vendeurs[email.strip().lower()] = pk
+        self.rapport = {
+            'lignes': 0, 'crees': 0, 'mis_a_jour': 0, 'nb_erreurs': 0, 'erreurs': [],
+            'duree_s': 0.0, 'lignes_par_s': 0.0,
+        }
+
+    def erreur(self, numero, message):
+        self.rapport['nb_erreurs'] += 1
+        if len(self.rapport['erreurs']) < MAX_ERREURS_DETAILLEES:
+            self.rapport['erreurs'].append({'ligne': numero, 'erreur': message})
+
+    def valider(self, donnees):
+        """Retourne les valeurs nettoyées d'une ligne ou lève ValidationError"""
+        if donnees is None:
+            raise ValidationError('Ligne illisible')
+        erreurs = []
+        valeurs = {}
+        for nom, champ in self.champs.items():
+            try:
+                valeurs[nom] = champ.clean(donnees.get(nom))
+            except ValidationError as e:
+                erreurs.append(f'{nom} : {" ".join(e.messages)}')
+
+        statut = donnees.get('statut')
+        statut = STATUT_DEFAUT if statut in (None, '') else str(statut).strip()
+        if statut not in STATUTS:
+            erreurs.append(f'statut : « {statut} » invalide')
+        valeurs['statut'] = statut
+
+        categorie = str(donnees.get('categorie') or '').strip().lower()
+        valeurs['categorie_id'] = self.categories.get(categorie)
+        if valeurs['categorie_id'] is None:
+            erreurs.append(f'categorie : « {categorie} » inconnue')
+
+        if self.vendeur is not None:
+            valeurs['vendeur_id'] = self.vendeur.pk
+        else:
+            vendeur = str(donnees.get('vendeur') or '').strip().lower()
+            valeurs['vendeur_id'] = self.vendeurs.get(vendeur)
+            if valeurs['vendeur_id'] is None:
+                erreurs.append(f'vendeur : « {vendeur} » inconnu')
+
+        identifiant = str(donnees.get('id') or '').strip()
+        if identifiant and not identifiant.isdigit():
+            erreurs.append('id : entier attendu')
+        valeurs['id'] = int(identifiant) if identifiant.isdigit() else None
+
+        if erreurs:
+            raise ValidationError(erreurs)
+        return valeurs
+
+    def executer(self, enregistrements):
+        """Importe les (numéro, dict) fournis ; retourne le rapport"""
+        debut = time.perf_counter()
+        lot = []
+        for numero, donnees in enregistrements:
+            self.rapport['lignes'] += 1
+            try:
+                lot.append((numero, self.valider(donnees)))
+            except ValidationError as e:
+                self.erreur(numero, ' ; '.join(e.messages))
+                continue
+            if len(lot) >= self.taille_lot:
+                self.enregistrer_lot(lot)
+                lot = []
+        if lot:
+            self.enregistrer_lot(lot)
+        invalider_catalogue()
+
+        duree = time.perf_counter() - debut
+        self.rapport['duree_s'] = round(duree, 3)
+        self.rapport['lignes_par_s'] = round(self.rapport['lignes'] / duree, 1) if duree else 0.0
+        return self.rapport
+
+    def enregistrer_lot(self, lot):
+        par_id = Produit.objects.in_bulk([valeurs['id'] for _, valeurs in lot if valeurs['id']])
+        cles = [(valeurs['vendeur_id'], valeurs['nom']) for _, valeurs in lot if not valeurs['id']]
+        par_cle = {}
+        if cles:
+            existants = Produit.objects.filter(
+                vendeur_id__in={vendeur for vendeur, _ in cles}, nom__in={nom for _, nom in cles},
+            )
+            par_cle = {(produit.vendeur_id, produit.nom): produit for produit in existants}
+
+        a_creer, a_modifier, ruptures_avant = {}, {}, {}
+        for numero, valeurs in lot:
+            if valeurs['id']:
+                produit = par_id.get(valeurs['id'])
+                if produit is None or (self.vendeur is not None and produit.vendeur_id != self.vendeur.pk):
+                    self.erreur(numero, f'id : produit {valeurs["id"]} introuvable')
+                    continue
+            else:
+                cle = (valeurs['vendeur_id'], valeurs['nom'])
+                produit = par_cle.get(cle) or a_creer.get(cle)
+                if produit is None:
+                    produit = a_creer[cle] = Produit()
+
+            if produit.pk is not None:
+                if produit.pk not in a_modifier:
+                    ruptures_avant[produit.pk] = produit.stock == 0
+                    a_modifier[produit.pk] = produit
+                # Même produit désigné par id puis par (vendeur, nom) : une seule instance, la dernière ligne l'emporte
+                produit = a_modifier[produit.pk]
+            for champ in ('nom', 'description', 'prix', 'stock', 'statut', 'categorie_id', 'vendeur_id'):
+                setattr(produit, champ, valeurs[champ])
+            produit.calculer_prix_effectif()
+
+        with transaction.atomic():
+            crees = Produit.objects.bulk_create(list(a_creer.values()), batch_size=self.taille_lot)
+            Produit.objects.bulk_update(
+                a_modifier.values(), CHAMPS_MODIFIES + Produit.CHAMPS_PROMOTION, batch_size=self.taille_lot,
+            )
+            indexer_produits(crees + list(a_modifier.values()))
+
+            # bulk_* n'émet pas de signaux : compteurs du tableau de bord mis à jour ici
+            ruptures = sum(produit.stock == 0 for produit in crees)
+            ruptures += sum((produit.stock == 0) - ruptures_avant[pk] for pk, produit in a_modifier.items())
+            metriques.incrementer(**{metriques.PRODUITS: len(crees), metriques.PRODUITS_RUPTURE: ruptures})
+
+        self.rapport['crees'] += len(crees)
+        self.rapport['mis_a_jour'] += len(a_modifier)
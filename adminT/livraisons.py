@@ -0,0 +1,147 @@
+from django.db import transaction
+from django.db.models import Case, F, Sum, When
+from django.utils import timezone
+
+from bd import metriques
+from bd.cache import invalider_catalogue
+from bd.models import Commande, CommandeItem, HistoriqueStatutCommande, Livraison, Produit
+from clients.classement import retirer_ventes
+
+# Statuts atteignables depuis chaque statut de commande ; livree et annulee sont terminaux
+TRANSITIONS = {
+    'en_attente': ('validee', 'annulee'),
+    'validee': ('expediee', 'annulee'),
+    'expediee': ('livree',),
+    'livree': (),
+    'annulee': (),
+}
+
+# Anciennes valeurs de la liste admin, acceptées en entrée
+ALIAS = {'en_cours': 'validee', 'livre': 'livree', 'annule': 'annulee'}
+
+# Commandes traitées par UPDATE (et lues pour le journal) à la fois
+TAILLE_LOT = 1000
+
+
+class TransitionInvalide(ValueError):
+    pass
+
+
+def lire_statut(statut):
+    """Statut de commande normalisé (alias compris) ou TransitionInvalide"""
+    statut = ALIAS.get(statut, statut)
+    if statut not in TRANSITIONS:
+        raise TransitionInvalide(f'Statut inconnu : {statut}')
+    return statut
+
+
+def statuts_sources(statut):
+    """Statuts depuis lesquels une commande peut passer à `statut`"""
+    return [source for source, cibles in TRANSITIONS.items() if statut in cibles]
+
+
+def changer_statuts(statut, ids=None, depuis=None, auteur=None, taille_lot=TAILLE_LOT):
+    """
+    Fait passer à `statut` les commandes `ids`, ou toutes celles au statut
+    `depuis`. Seules les transitions autorisées par TRANSITIONS sont
+    appliquées, par lots de `taille_lot` : un UPDATE conditionnel sur les
+    commandes, le journal HistoriqueStatutCommande inséré en bloc et les
+    effets du nouveau statut sur les livraisons et le stock :
+
+    - validee : une Livraison par vendeur présent dans la commande ;
+    - expediee / livree : livraisons alignées (date de livraison renseignée) ;
+    - annulee : livraisons annulées, quantités remises en stock, ventes et
+      compteurs du tableau de bord diminués d'autant.
+
+    Retourne {'statut', 'modifiees', 'refusees'} ; `refusees` liste les ids
+    demandés restés inchangés (inconnus ou transition interdite).
+    """
+    statut = lire_statut(statut)
+    sources = statuts_sources(statut)
+    if ids is None and depuis is None:
+        raise TransitionInvalide('Aucune commande désignée')
+
+    commandes = Commande.objects.filter(statut__in=sources)
+    if ids is not None:
+        if not isinstance(ids, (list, tuple, set)):
+            raise TransitionInvalide('Liste d\'identifiants attendue')
+        try:
+            ids = {int(pk) for pk in ids}
+        except (TypeError, ValueError):
+            raise TransitionInvalide('Identifiants invalides')
+        commandes = commandes.filter(pk__in=ids)
+    if depuis is not None:
+        depuis = lire_statut(depuis)
+        if depuis not in sources:
+            raise TransitionInvalide(f'Transition {depuis} → {statut} interdite')
+        commandes = commandes.filter(statut=depuis)
+
+    modifiees = []
+    with transaction.atomic():
+        # Liste matérialisée : pas de curseur ouvert sur la table pendant les mises à jour
+        eligibles = list(commandes.select_for_update().order_by('id').values_list('id', 'statut'))
+        for debut in range(0, len(eligibles), taille_lot):
+            lot = dict(eligibles[debut:debut + taille_lot])
+            Commande.objects.filter(pk__in=lot, statut__in=sources).update(statut=statut)
+            HistoriqueStatutCommande.objects.bulk_create([
+                HistoriqueStatutCommande(commande_id=pk, ancien_statut=ancien, nouveau_statut=statut, auteur=auteur)
+                for pk, ancien in lot.items()
+            ])
+            _appliquer_effets(statut, list(lot))
+            modifiees.extend(lot)
+
+    if statut == 'annulee' and modifiees:
+        invalider_catalogue()
+    refusees = sorted(ids - set(modifiees)) if ids is not None else []
+    return {'statut': statut, 'modifiees': len(modifiees), 'refusees': refusees}
+
+
+def changer_statut(commande_id, statut, auteur=None):
+    """Transition d'une seule commande ; lève TransitionInvalide si elle est interdite"""
+    statut = lire_statut(statut)
+    resultat = changer_statuts(statut, ids=[commande_id], auteur=auteur)
+    if not resultat['modifiees']:
+        actuel = Commande.objects.filter(pk=commande_id).values_list('statut', flat=True).first()
+        if actuel is None:
+            raise TransitionInvalide(f'Commande {commande_id} introuvable')
+        raise TransitionInvalide(f'Transition {actuel} → {statut} interdite')
+    return resultat
+
+
+def _appliquer_effets(statut, commande_ids):
+    livraisons = Livraison.objects.filter(commande_id__in=commande_ids)
+    if statut == 'validee':
+        parts = (
+            CommandeItem.objects.filter(commande_id__in=commande_ids)
+            .values_list('commande_id', 'produit__vendeur_id').distinct()
+        )
+        Livraison.objects.bulk_create(
+            [Livraison(commande_id=commande_id, vendeur_id=vendeur_id) for commande_id, vendeur_id in parts],
+            ignore_conflicts=True,
+        )
+    elif statut == 'expediee':
+        livraisons.filter(statut='en_attente').update(statut='expediee')
+    elif statut == 'livree':
+        livraisons.exclude(statut='annulee').update(statut='livree', date_livraison=timezone.now())
+    elif statut == 'annulee':
+        livraisons.update(statut='annulee')
+        _restituer_stock(commande_ids)
+        # Une commande annulée ne compte ni dans les ventes ni dans le tableau de bord
+        retirer_ventes(commande_ids)
+        metriques.annuler_commandes(commande_ids)
+
+
+def _restituer_stock(commande_ids):
+    """Remet en stock les quantités des commandes annulées, en un seul UPDATE"""
+    quantites = dict(
+        CommandeItem.objects.filter(commande_id__in=commande_ids)
+        .values('produit_id').annotate(total=Sum('quantite')).values_list('produit_id', 'total')
+    )
+    if not quantites:
+        return
+    # Toute quantité restituée est positive : les produits en rupture en sortent
+    sorties_de_rupture = Produit.objects.filter(pk__in=quantites, stock=0).count()
+    Produit.objects.filter(pk__in=quantites).update(
+        stock=F('stock') + Case(*(When(pk=pk, then=quantite) for pk, quantite in quantites.items()), default=0)
+    )
+    metriques.incrementer(**{metriques.PRODUITS_RUPTURE: -sorties_de_rupture})
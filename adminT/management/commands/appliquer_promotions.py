@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from adminT.remises import appliquer_calendrier, prochaine_echeance
+
+
+class Command(BaseCommand):
+    help = (
+        "Active les remises dont la fenêtre s'ouvre et retire celles qui expirent, par lots. "
+        "À lancer périodiquement (cron) ou en continu avec --boucle"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boucle', action='store_true',
+                            help="Tourne en continu et se réveille à chaque échéance du calendrier")
+        parser.add_argument('--intervalle', type=int, default=60,
+                            help='Attente maximale entre deux passages en mode boucle (secondes)')
+
+    def handle(self, *args, **options):
+        while True:
+            modifies, activees, retirees = appliquer_calendrier()
+            if modifies or not options['boucle']:
+                self.stdout.write(
+                    f'{timezone.now():%Y-%m-%d %H:%M:%S} : {modifies} produit(s) mis à jour, '
+                    f'{activees} promotion(s) activée(s), {retirees} retirée(s)'
+                )
+            if not options['boucle']:
+                return
+
+            attente = options['intervalle']
+            echeance = prochaine_echeance()
+            if echeance is not None:
+                attente = min(attente, max(1, (echeance - timezone.now()).total_seconds()))
+            time.sleep(attente)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from adminT.livraisons import TransitionInvalide, changer_statuts
+
+
+class Command(BaseCommand):
+    help = (
+        "Fait passer des commandes à un nouveau statut par lots, transitions vérifiées "
+        "et journalisées (ex. : changer_statut_commandes expediee --depuis validee)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('statut', help='Nouveau statut')
+        parser.add_argument('--ids', type=int, nargs='+', help='Commandes concernées')
+        parser.add_argument('--depuis', help='Toutes les commandes de ce statut')
+
+    def handle(self, *args, **options):
+        try:
+            resultat = changer_statuts(options['statut'], ids=options['ids'], depuis=options['depuis'])
+        except TransitionInvalide as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"{resultat['modifiees']} commande(s) passée(s) au statut {resultat['statut']}")
+        if resultat['refusees']:
+            self.stderr.write(f"Inchangées : {', '.join(map(str, resultat['refusees']))}")
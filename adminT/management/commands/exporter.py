@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from adminT.exports import EXPORTS, FORMATS, FiltreInvalide, lignes_export
+
+
+class Command(BaseCommand):
+    help = "Exporte commandes, produits ou clients en CSV ou JSONL, en flux, vers un fichier ou la sortie standard"
+
+    def add_arguments(self, parser):
+        parser.add_argument('nom', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--debut', help='Date de début incluse (AAAA-MM-JJ)')
+        parser.add_argument('--fin', help='Date de fin incluse (AAAA-MM-JJ)')
+        parser.add_argument('--statut', help='Statut de commande, statut de produit ou actif/inactif pour les clients')
+        parser.add_argument('--sortie', help='Fichier de destination (défaut : sortie standard)')
+
+    def handle(self, *args, **options):
+        try:
+            lignes = lignes_export(
+                options['nom'], options['format'],
+                debut=options['debut'], fin=options['fin'], statut=options['statut'],
+            )
+        except FiltreInvalide as e:
+            raise CommandError(str(e))
+
+        if not options['sortie']:
+            for ligne in lignes:
+                self.stdout.write(ligne, ending='')
+            return
+
+        nombre = 0
+        with open(options['sortie'], 'w', encoding='utf-8', newline='') as fichier:
+            for ligne in lignes:
+                fichier.write(ligne)
+                nombre += 1
+        self.stderr.write(self.style.SUCCESS(f'{nombre} ligne(s) écrite(s) dans {options["sortie"]}'))
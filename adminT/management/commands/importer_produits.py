@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from adminT.imports import FORMATS, TAILLE_LOT, FormatInvalide, ImportProduits, lire_enregistrements
+from bd.models import Vendeur
+
+
+class Command(BaseCommand):
+    help = "Importe (crée ou met à jour) des produits en masse depuis un fichier CSV ou JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier')
+        parser.add_argument('--format', choices=FORMATS, help="Déduit de l'extension par défaut")
+        parser.add_argument('--vendeur', help='E-mail du vendeur auquel rattacher tous les produits')
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT)
+
+    def handle(self, *args, **options):
+        format = options['format'] or options['fichier'].rsplit('.', 1)[-1].lower()
+        if format not in FORMATS:
+            raise CommandError(f'Format inconnu : {format}')
+
+        vendeur = None
+        if options['vendeur']:
+            vendeur = Vendeur.objects.filter(email__iexact=options['vendeur']).first()
+            if vendeur is None:
+                raise CommandError(f'Vendeur introuvable : {options["vendeur"]}')
+
+        import_produits = ImportProduits(vendeur=vendeur, taille_lot=options['taille_lot'])
+        try:
+            with open(options['fichier'], encoding='utf-8-sig', newline='') as fichier:
+                rapport = import_produits.executer(lire_enregistrements(fichier, format))
+        except (OSError, FormatInvalide, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        for erreur in rapport['erreurs']:
+            self.stderr.write(f"ligne {erreur['ligne']} : {erreur['erreur']}")
+        if rapport['nb_erreurs'] > len(rapport['erreurs']):
+            self.stderr.write(f"... et {rapport['nb_erreurs'] - len(rapport['erreurs'])} autre(s) erreur(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"{rapport['lignes']} ligne(s) en {rapport['duree_s']} s ({rapport['lignes_par_s']} lignes/s) : "
+            f"{rapport['crees']} créé(s), {rapport['mis_a_jour']} mis à jour, {rapport['nb_erreurs']} erreur(s)"
+        ))
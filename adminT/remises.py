@@ -0,0 +1,186 @@
+from django.db import transaction
+from django.db.models import F, Min, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from bd import metriques
+from bd.cache import invalider_catalogue
+from bd.models import Produit, RemiseProposee, RemiseValidee
+
+
+class RemiseInvalide(ValueError):
+    pass
+
+
+def valider_pourcentage(pourcentage):
+    try:
+        pourcentage = int(pourcentage)
+    except (TypeError, ValueError):
+        raise RemiseInvalide('Pourcentage invalide')
+    if not 0 < pourcentage < 100:
+        raise RemiseInvalide('Pourcentage invalide')
+    return pourcentage
+
+
+def valider_produit_id(produit_id):
+    try:
+        return int(produit_id)
+    except (TypeError, ValueError):
+        raise RemiseInvalide(f'Produit invalide : {produit_id}')
+
+
+def lire_fenetre(debut=None, fin=None):
+    """(date_debut, date_fin) depuis des chaînes ISO 8601 ; None pour une borne absente"""
+    bornes = []
+    for valeur in (debut, fin):
+        if not valeur:
+            bornes.append(None)
+            continue
+        try:
+            date = parse_datetime(valeur)
+        except ValueError:
+            date = None
+        if date is None:
+            raise RemiseInvalide(f'Date invalide : {valeur}')
+        bornes.append(timezone.make_aware(date) if timezone.is_naive(date) else date)
+    if bornes[0] and bornes[1] and bornes[1] <= bornes[0]:
+        raise RemiseInvalide('La fin de la promotion doit suivre son début')
+    return tuple(bornes)
+
+
+def proposer_remises(vendeur, propositions):
+    """
+    Enregistre les propositions {produit_id: pourcentage} d'un vendeur sur
+    ses propres produits. Une proposition encore en attente pour le même
+    produit est remplacée. Retourne le nombre de propositions enregistrées.
+    """
+    pourcentages = {valider_produit_id(produit_id): valider_pourcentage(p) for produit_id, p in propositions.items()}
+    siens = set(
+        Produit.objects.filter(pk__in=pourcentages, vendeur=vendeur).values_list('id', flat=True)
+    )
+    etrangers = set(pourcentages) - siens
+    if etrangers:
+        raise RemiseInvalide(f'Produit(s) introuvable(s) : {", ".join(map(str, sorted(etrangers)))}')
+
+    with transaction.atomic():
+        en_attente = {
+            proposition.produit_id: proposition
+            for proposition in RemiseProposee.objects.select_for_update().filter(
+                vendeur=vendeur, produit_id__in=pourcentages, statut='en_attente',
+            )
+        }
+        for produit_id, proposition in en_attente.items():
+            proposition.pourcentage_propose = pourcentages[produit_id]
+        RemiseProposee.objects.bulk_update(en_attente.values(), ['pourcentage_propose'])
+        RemiseProposee.objects.bulk_create([
+            RemiseProposee(produit_id=produit_id, vendeur=vendeur, pourcentage_propose=pourcentage)
+            for produit_id, pourcentage in pourcentages.items() if produit_id not in en_attente
+        ])
+    return len(pourcentages)
+
+
+def _en_attente(ids=None):
+    propositions = RemiseProposee.objects.filter(statut='en_attente')
+    return propositions if ids is None else propositions.filter(pk__in=ids)
+
+
+def valider_propositions(ids=None, date_debut=None, date_fin=None):
+    """
+    Valide en une transaction les propositions en attente `ids` (toutes si
+    None) : une RemiseValidee par produit, prix dénormalisés recalculés et
+    propositions marquées validées, par insertions et mises à jour groupées.
+    Si un produit a plusieurs propositions, la plus récente l'emporte.
+    Avec une fenêtre qui ne commence pas tout de suite, les prix restent
+    inchangés : appliquer_calendrier activera la campagne à son début.
+    Retourne le nombre de propositions validées.
+    """
+    maintenant = timezone.now()
+    date_debut = date_debut or maintenant
+    if date_fin is not None and date_fin <= date_debut:
+        raise RemiseInvalide('La fin de la promotion doit suivre son début')
+    active = date_debut <= maintenant and (date_fin is None or date_fin > maintenant)
+
+    with transaction.atomic():
+        propositions = list(
+            _en_attente(ids).select_for_update().select_related('produit').order_by('date_proposition', 'id')
+        )
+        if not propositions:
+            return 0
+
+        produits = {}
+        for proposition in propositions:
+            produits[proposition.produit_id] = (proposition.produit, proposition.pourcentage_propose)
+
+        RemiseValidee.objects.bulk_create([
+            RemiseValidee(produit=produit, pourcentage=pourcentage, date_debut=date_debut, date_fin=date_fin)
+            for produit, pourcentage in produits.values()
+        ], batch_size=500)
+        RemiseProposee.objects.filter(pk__in=[p.pk for p in propositions]).update(statut='valide')
+
+        if active:
+            nouvelles_promotions = 0
+            for produit, pourcentage in produits.values():
+                nouvelles_promotions += not produit.en_promotion
+                produit.appliquer_remise(pourcentage)
+            Produit.objects.bulk_update(
+                [produit for produit, _ in produits.values()], Produit.CHAMPS_PROMOTION, batch_size=500,
+            )
+            # bulk_* n'émet pas de signaux
+            metriques.incrementer(**{metriques.PRODUITS_PROMOTION: nouvelles_promotions})
+    if active:
+        invalider_catalogue()
+    return len(propositions)
+
+
+def rejeter_propositions(ids=None):
+    """Rejette les propositions en attente `ids` (toutes si None) ; retourne leur nombre"""
+    return _en_attente(ids).update(statut='rejete')
+
+
+def appliquer_calendrier(maintenant=None, taille_lot=500):
+    """
+    Aligne les champs de promotion dénormalisés de Produit sur les remises
+    actives à `maintenant` : active les campagnes dont la fenêtre s'ouvre,
+    retire celles qui ont expiré. Seuls les produits dont la remise change
+    sont lus puis mis à jour par lots ; l'appel est idempotent.
+    Retourne (nombre de produits modifiés, promotions activées, retirées).
+    """
+    maintenant = maintenant or timezone.now()
+    actives = RemiseValidee.actives(maintenant)
+    remise_courante = (
+        actives.filter(produit=OuterRef('pk')).order_by('-date_validation', '-id').values('pourcentage')[:1]
+    )
+    a_changer = (
+        Produit.objects.filter(Q(en_promotion=True) | Q(pk__in=actives.values('produit_id')))
+        .annotate(cible=Coalesce(Subquery(remise_courante), Value(0)))
+        .exclude(pourcentage_promotion=F('cible'))
+    )
+
+    modifies = activees = retirees = 0
+    with transaction.atomic():
+        # Liste matérialisée : pas de curseur ouvert sur la table pendant les mises à jour
+        lot = []
+        for produit in list(a_changer.select_for_update().only('id', 'prix', *Produit.CHAMPS_PROMOTION)):
+            activees += not produit.en_promotion and produit.cible > 0
+            retirees += produit.en_promotion and produit.cible == 0
+            produit.appliquer_remise(produit.cible)
+            lot.append(produit)
+            if len(lot) >= taille_lot:
+                Produit.objects.bulk_update(lot, Produit.CHAMPS_PROMOTION)
+                modifies += len(lot)
+                lot = []
+        Produit.objects.bulk_update(lot, Produit.CHAMPS_PROMOTION)
+        modifies += len(lot)
+        metriques.incrementer(**{metriques.PRODUITS_PROMOTION: activees - retirees})
+    if modifies:
+        invalider_catalogue()
+    return modifies, activees, retirees
+
+
+def prochaine_echeance(maintenant=None):
+    """Prochain début ou fin de remise après `maintenant` (None si aucun)"""
+    maintenant = maintenant or timezone.now()
+    debut = RemiseValidee.objects.filter(date_debut__gt=maintenant).aggregate(m=Min('date_debut'))['m']
+    fin = RemiseValidee.objects.filter(date_fin__gt=maintenant).aggregate(m=Min('date_fin'))['m']
+    return min(filter(None, (debut, fin)), default=None)
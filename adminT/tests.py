@@ -1,3 +1,534 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bd import metriques
+from bd.models import (
+    Categorie, ClassementVente, Client, Commande, CommandeItem, Compteur, HistoriqueStatutCommande, Livraison,
+    Panier, PanierItem, Produit, RemiseProposee, RemiseValidee, StatistiqueJour, TermeProduit, User, Vendeur,
+    VenteProduitJour, administrator,
+)
+from bd.requetes import verifier_requetes
+from clients.classement import reconstruire_ventes
+from clients.commande import creer_commande
+from . import views
+from .exports import FiltreInvalide, lignes_export
+from .imports import ImportProduits, lire_enregistrements
+from .livraisons import TRANSITIONS, TransitionInvalide, changer_statut, changer_statuts
+from .remises import (
+    RemiseInvalide, appliquer_calendrier, prochaine_echeance, rejeter_propositions, valider_propositions,
+)
+
+
+class CommandesListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        vendeur = Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V')
+        cls.produits = [
+            Produit.objects.create(
+                nom=f'Basket {i}', description='Chaussure de sport', prix=Decimal(1000), stock=100,
+                categorie=Categorie.objects.create(nom=f'Catégorie {i}'), vendeur=vendeur,
+            )
+            for i in range(4)
+        ]
+        cls.client_tokos = Client.objects.create(username='client', email='client@tokos.cm', role='C')
+        admin = administrator.objects.create(username='admin', email='admin@tokos.cm', role='A')
+        cls.utilisateur = User.objects.get(pk=admin.user_ptr_id)
+
+    def ajouter_commandes(self, nombre):
+        for _ in range(nombre):
+            commande = Commande.objects.create(client=self.client_tokos, montant_total=Decimal(4000))
+            CommandeItem.objects.bulk_create([
+                CommandeItem(commande=commande, produit=produit, quantite=1, prix=produit.prix)
+                for produit in self.produits
+            ])
+
+    def test_budget_tenu_quel_que_soit_le_nombre_de_commandes(self):
+        self.client.force_login(self.utilisateur)
+        budget, seuil = views.commandes_list.budget_requetes
+        for nombre in (3, 15):
+            self.ajouter_commandes(nombre)
+            with verifier_requetes(budget=budget, seuil_n_plus_un=seuil):
+                reponse = self.client.get(reverse('admin_panel:commandes_list'))
+            self.assertEqual(reponse.status_code, 200)
+            self.assertEqual(len(reponse.context['commandes']), min(Commande.objects.count(), 15))
+
+    def test_lien_premiere_page_conserve_le_filtre(self):
+        self.client.force_login(self.utilisateur)
+        self.ajouter_commandes(20)
+        url = reverse('admin_panel:commandes_list')
+        curseur = self.client.get(url, {'statut': 'en_attente'}).context['commandes'].curseur_suivant
+        reponse = self.client.get(url, {'statut': 'en_attente', 'curseur': curseur})
+        self.assertEqual(len(reponse.context['commandes']), 5)
+        self.assertContains(reponse, '<a class="page-link" href="?statut=en_attente">Première</a>', html=True)
+
+
+class CasserPrixTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        vendeur = Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V')
+        categorie = Categorie.objects.create(nom='Chaussures')
+        cls.produits = [
+            Produit.objects.create(
+                nom=f'Basket {i}', description='Chaussure de sport', prix=Decimal(prix), stock=10,
+                categorie=categorie, vendeur=vendeur,
+            )
+            for i, prix in enumerate((1000, 800))
+        ]
+        admin = administrator.objects.create(username='admin', email='admin@tokos.cm', role='A')
+        cls.utilisateur = User.objects.get(pk=admin.user_ptr_id)
+
+    def test_remise_puis_annulation(self):
+        self.client.force_login(self.utilisateur)
+        produit = self.produits[0]
+        reponse = self.client.post(
+            reverse('admin_panel:casser_prix', args=[produit.pk]), json.dumps({'pourcentage': 25}),
+            content_type='application/json',
+        )
+        self.assertEqual(reponse.json()['nouveau_prix'], 750.0)
+        produit.refresh_from_db()
+        self.assertEqual((produit.prix, produit.prix_effectif), (Decimal('1000.00'), Decimal('750.00')))
+        # Le tri du catalogue suit le prix remisé
+        catalogue = self.client.get(reverse('produits'), {'sort': 'prix'}).context['page_obj']
+        self.assertEqual([p.pk for p in catalogue], [produit.pk, self.produits[1].pk])
+
+        remise = RemiseValidee.objects.get(produit=produit)
+        self.client.post(reverse('admin_panel:annuler_promotion', args=[remise.pk]))
+        produit.refresh_from_db()
+        self.assertEqual((produit.en_promotion, produit.prix_effectif), (False, Decimal('1000.00')))
+
+
+class MetriquesTests(TestCase):
+    """Compteurs du tableau de bord tenus à chaque écriture, identiques à une reconstruction"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur = Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V')
+        cls.categorie = Categorie.objects.create(nom='Chaussures')
+        cls.client_tokos = Client.objects.create(username='client', email='client@tokos.cm', role='C')
+        admin = administrator.objects.create(username='admin', email='admin@tokos.cm', role='A')
+        cls.utilisateur = User.objects.get(pk=admin.user_ptr_id)
+
+    def creer_produit(self, stock, prix=1000):
+        return Produit.objects.create(
+            nom='Basket', description='Chaussure', prix=Decimal(prix), stock=stock,
+            categorie=self.categorie, vendeur=self.vendeur,
+        )
+
+    def assertMetriquesReconstruites(self):
+        incrementales = metriques.lire_metriques()
+        jours = list(StatistiqueJour.objects.values_list('jour', 'nb_commandes', 'nb_articles', 'revenus'))
+        metriques.reconstruire_metriques()
+        self.assertEqual(metriques.lire_metriques(), incrementales)
+        self.assertEqual(list(StatistiqueJour.objects.values_list('jour', 'nb_commandes', 'nb_articles', 'revenus')),
+                         jours)
+
+    def test_produits(self):
+        produits = [self.creer_produit(stock) for stock in (0, 3, 5)]
+        produits[1].appliquer_remise(10)
+        produits[1].stock = 0
+        produits[1].save()
+        produits[0].stock = 2
+        produits[0].save(update_fields=['stock'])
+        produits[2].delete()
+        valeurs = metriques.lire_metriques()
+        self.assertEqual(
+            [valeurs[nom] for nom in (metriques.PRODUITS, metriques.PRODUITS_RUPTURE, metriques.PRODUITS_PROMOTION)],
+            [2, 1, 1],
+        )
+        self.assertMetriquesReconstruites()
+
+    def test_commandes(self):
+        produits = [self.creer_produit(2, prix=1500), self.creer_produit(10)]
+        panier = Panier.objects.create(client=self.client_tokos)
+        PanierItem.objects.bulk_create([
+            PanierItem(panier=panier, produit=produits[0], quantite=2),
+            PanierItem(panier=panier, produit=produits[1], quantite=3),
+        ])
+        creer_commande(self.client_tokos, panier)
+        valeurs = metriques.lire_metriques()
+        self.assertEqual(
+            [valeurs[nom] for nom in (metriques.COMMANDES, metriques.REVENUS, metriques.PRODUITS_RUPTURE)],
+            [1, Decimal('6000'), 1],
+        )
+        self.assertEqual(StatistiqueJour.objects.values_list('nb_commandes', 'nb_articles').get(), (1, 5))
+        self.assertMetriquesReconstruites()
+
+    def test_tableau_de_bord_dans_son_budget(self):
+        self.creer_produit(0)
+        self.client.force_login(self.utilisateur)
+        with verifier_requetes(budget=views.dashboard.budget_requetes[0]):
+            reponse = self.client.get(reverse('admin_panel:dashboard'))
+        self.assertEqual((reponse.context['total_produits'], reponse.context['produits_rupture']), (1, 1))
+
+
+class PropositionsRemisesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur = Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V')
+        categorie = Categorie.objects.create(nom='Chaussures')
+        cls.produits = [
+            Produit.objects.create(
+                nom=f'Basket {i}', description='Chaussure', prix=Decimal(1000), stock=1,
+                categorie=categorie, vendeur=cls.vendeur,
+            )
+            for i in range(30)
+        ]
+        admin = administrator.objects.create(username='admin', email='admin@tokos.cm', role='A')
+        cls.utilisateur = User.objects.get(pk=admin.user_ptr_id)
+
+    def proposer(self, pourcentages):
+        return [
+            RemiseProposee.objects.create(produit=produit, vendeur=self.vendeur, pourcentage_propose=pourcentage)
+            for produit, pourcentage in pourcentages
+        ]
+
+    def test_validation_groupee(self):
+        a, b = self.produits[:2]
+        propositions = self.proposer([(a, 10), (b, 20), (a, 30)])
+        self.assertEqual(valider_propositions(), 3)
+
+        self.assertEqual(set(RemiseProposee.objects.values_list('statut', flat=True)), {'valide'})
+        # Deux propositions pour a : la plus récente l'emporte
+        self.assertEqual(dict(RemiseValidee.objects.values_list('produit_id', 'pourcentage')), {a.pk: 30, b.pk: 20})
+        self.assertEqual(
+            list(Produit.objects.filter(pk__in=[a.pk, b.pk]).order_by('pk').values_list('prix_effectif', flat=True)),
+            [Decimal('700.00'), Decimal('800.00')],
+        )
+        self.assertEqual(metriques.lire_metriques()[metriques.PRODUITS_PROMOTION], 2)
+        # Déjà traitées : plus rien à valider ni à rejeter
+        self.assertEqual(valider_propositions([p.pk for p in propositions]), 0)
+        self.assertEqual(rejeter_propositions(), 0)
+
+    def test_fenetre_future_sans_effet_immediat(self):
+        self.proposer([(self.produits[0], 10)])
+        debut = timezone.now() + timedelta(days=1)
+        with self.assertRaises(RemiseInvalide):
+            valider_propositions(date_debut=debut, date_fin=debut)
+        self.assertEqual(valider_propositions(date_debut=debut), 1)
+        self.assertFalse(Produit.objects.get(pk=self.produits[0].pk).en_promotion)
+        self.assertEqual(RemiseValidee.objects.get().date_debut, debut)
+
+    def test_vue_en_nombre_de_requetes_constant(self):
+        self.client.force_login(self.utilisateur)
+        url = reverse('admin_panel:traiter_propositions')
+        nombres = []
+        for produits in (self.produits[:3], self.produits[3:]):
+            propositions = self.proposer([(produit, 15) for produit in produits])
+            with CaptureQueriesContext(connection) as requetes:
+                reponse = self.client.post(
+                    url, json.dumps({'action': 'valider', 'ids': [p.pk for p in propositions]}),
+                    content_type='application/json',
+                )
+            self.assertEqual(reponse.json(), {'success': True, 'action': 'valider', 'nombre': len(produits)})
+            nombres.append(len(requetes))
+        self.assertEqual(nombres[0], nombres[1])
+
+    def test_vue_formulaire_et_erreurs(self):
+        self.client.force_login(self.utilisateur)
+        url = reverse('admin_panel:traiter_propositions')
+        propositions = self.proposer([(self.produits[0], 10), (self.produits[1], 10)])
+        reponse = self.client.post(url, {'action': 'rejeter', 'ids': [propositions[0].pk]})
+        self.assertRedirects(reponse, reverse('admin_panel:propositions_list'), fetch_redirect_response=False)
+        self.assertEqual(RemiseProposee.objects.get(pk=propositions[0].pk).statut, 'rejete')
+
+        for donnees in (
+            {'action': 'supprimer', 'tout': True},
+            {'action': 'valider'},
+            {'action': 'valider', 'ids': ['x']},
+            {'action': 'valider', 'tout': True, 'date_debut': 'demain'},
+        ):
+            reponse = self.client.post(url, json.dumps(donnees), content_type='application/json')
+            self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(RemiseProposee.objects.get(pk=propositions[1].pk).statut, 'en_attente')
+
+
+class CalendrierPromotionsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        vendeur = Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V')
+        categorie = Categorie.objects.create(nom='Chaussures')
+        cls.produits = [
+            Produit.objects.create(
+                nom=f'Basket {i}', description='Chaussure', prix=Decimal(1000), stock=1,
+                categorie=categorie, vendeur=vendeur,
+            )
+            for i in range(4)
+        ]
+
+    def promotions(self):
+        return dict(Produit.objects.filter(en_promotion=True).values_list('pk', 'pourcentage_promotion'))
+
+    def test_activation_et_expiration(self):
+        maintenant = timezone.now()
+        a, b, c, _ = (produit.pk for produit in self.produits)
+        RemiseValidee.objects.create(produit_id=a, pourcentage=10, date_debut=maintenant + timedelta(hours=1))
+        RemiseValidee.objects.create(produit_id=b, pourcentage=20, date_debut=maintenant,
+                                     date_fin=maintenant + timedelta(hours=2))
+        RemiseValidee.objects.create(produit_id=c, pourcentage=30, date_debut=maintenant)
+        self.assertEqual(prochaine_echeance(maintenant), maintenant + timedelta(hours=1))
+
+        self.assertEqual(appliquer_calendrier(maintenant), (2, 2, 0))
+        self.assertEqual(self.promotions(), {b: 20, c: 30})
+        # Idempotent : rien ne change tant qu'aucune échéance n'est passée
+        self.assertEqual(appliquer_calendrier(maintenant), (0, 0, 0))
+
+        self.assertEqual(appliquer_calendrier(maintenant + timedelta(hours=1)), (1, 1, 0))
+        self.assertEqual(appliquer_calendrier(maintenant + timedelta(hours=3)), (1, 0, 1))
+        self.assertEqual(self.promotions(), {a: 10, c: 30})
+        self.assertEqual(Produit.objects.get(pk=b).prix_effectif, Decimal('1000.00'))
+        self.assertIsNone(prochaine_echeance(maintenant + timedelta(hours=3)))
+
+        compteur = metriques.lire_metriques()[metriques.PRODUITS_PROMOTION]
+        metriques.reconstruire_metriques()
+        self.assertEqual(metriques.lire_metriques()[metriques.PRODUITS_PROMOTION], compteur)
+
+    def test_commande(self):
+        RemiseValidee.objects.create(produit=self.produits[0], pourcentage=25)
+        sortie = io.StringIO()
+        call_command('appliquer_promotions', stdout=sortie)
+        self.assertIn('1 produit(s) mis à jour, 1 promotion(s) activée(s), 0 retirée(s)', sortie.getvalue())
+        self.assertEqual(self.promotions(), {self.produits[0].pk: 25})
+
+
+class ChangerStatutsTests(TestCase):
+    """Table TRANSITIONS et effets de bord des changements de statut"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categorie = Categorie.objects.create(nom='Chaussures')
+        cls.vendeurs = [
+            Vendeur.objects.create(username=f'vendeur{i}', email=f'vendeur{i}@tokos.cm', role='V') for i in range(2)
+        ]
+        cls.produits = [
+            Produit.objects.create(
+                nom=f'Basket {i}', description='Chaussure de sport', prix=Decimal(1000 * (i + 1)), stock=10,
+                categorie=categorie, vendeur=cls.vendeurs[i % 2],
+            )
+            for i in range(3)
+        ]
+        cls.client_tokos = Client.objects.create(username='client', email='client@tokos.cm', role='C')
+        metriques.reconstruire_metriques()
+
+    def commander(self, quantites):
+        """Commande passée par le parcours normal : stock, ventes et compteurs à jour"""
+        panier, _ = Panier.objects.get_or_create(client=self.client_tokos)
+        PanierItem.objects.bulk_create([
+            PanierItem(panier=panier, produit=self.produits[rang], quantite=quantite)
+            for rang, quantite in quantites.items()
+        ])
+        return creer_commande(self.client_tokos, panier)
+
+    def etat_derive(self):
+        """Ventes, classements et tableau de bord, comparables à leur reconstruction"""
+        return (
+            set(VenteProduitJour.objects.values_list('produit_id', 'jour', 'quantite')),
+            set(ClassementVente.objects.values_list('fenetre', 'produit_id', 'quantite')),
+            dict(Compteur.objects.values_list('nom', 'valeur')),
+            set(StatistiqueJour.objects.values_list('jour', 'nb_commandes', 'nb_articles', 'revenus')),
+        )
+
+    def test_transitions_autorisees_et_interdites(self):
+        for source, cibles in TRANSITIONS.items():
+            for cible in TRANSITIONS:
+                commande = Commande.objects.create(client=self.client_tokos, statut=source)
+                if cible in cibles:
+                    changer_statut(commande.pk, cible)
+                    self.assertTrue(HistoriqueStatutCommande.objects.filter(
+                        commande=commande, ancien_statut=source, nouveau_statut=cible,
+                    ).exists())
+                else:
+                    with self.assertRaises(TransitionInvalide):
+                        changer_statut(commande.pk, cible)
+                commande.refresh_from_db()
+                self.assertEqual(commande.statut, cible if cible in cibles else source)
+
+    def test_lot_et_alias(self):
+        attente = Commande.objects.create(client=self.client_tokos)
+        livree = Commande.objects.create(client=self.client_tokos, statut='livree')
+        resultat = changer_statuts('en_cours', ids=[attente.pk, livree.pk, 999])
+        self.assertEqual(resultat, {'statut': 'validee', 'modifiees': 1, 'refusees': [livree.pk, 999]})
+
+    def test_identifiants_invalides(self):
+        for ids in ('12', 12, ['abc']):
+            with self.assertRaises(TransitionInvalide):
+                changer_statuts('validee', ids=ids)
+        with self.assertRaises(TransitionInvalide):
+            changer_statuts('validee', depuis='livree')
+
+    def test_validation_cree_une_livraison_par_vendeur(self):
+        commande = self.commander({0: 1, 1: 1, 2: 1})
+        changer_statut(commande.pk, 'validee')
+        self.assertEqual(
+            set(Livraison.objects.filter(commande=commande).values_list('vendeur_id', flat=True)),
+            {vendeur.pk for vendeur in self.vendeurs},
+        )
+        changer_statut(commande.pk, 'expediee')
+        changer_statut(commande.pk, 'livree')
+        self.assertFalse(Livraison.objects.filter(commande=commande, date_livraison__isnull=True).exists())
+
+    def test_annulation_restitue_stock_ventes_et_compteurs(self):
+        conservee = self.commander({0: 2, 1: 1})
+        annulee = self.commander({1: 3, 2: 10})
+        changer_statut(annulee.pk, 'validee')
+        changer_statut(annulee.pk, 'annulee')
+
+        self.assertEqual(list(Produit.objects.order_by('pk').values_list('stock', flat=True)), [8, 9, 10])
+        self.assertEqual(
+            set(Livraison.objects.filter(commande=annulee).values_list('statut', flat=True)), {'annulee'},
+        )
+        incremental = self.etat_derive()
+        reconstruire_ventes()
+        metriques.reconstruire_metriques()
+        self.assertEqual(incremental, self.etat_derive())
+        self.assertEqual(Compteur.objects.get(nom=metriques.REVENUS).valeur, conservee.montant_total)
+
+
+class ImportProduitsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categorie = Categorie.objects.create(nom='Chaussures')
+        cls.vendeurs = [
+            Vendeur.objects.create(username=f'vendeur{i}', email=f'vendeur{i}@tokos.cm', role='V') for i in range(2)
+        ]
+        cls.existant = Produit.objects.create(
+            nom='Basket', description='Chaussure', prix=Decimal(1000), stock=5,
+            categorie=cls.categorie, vendeur=cls.vendeurs[0],
+        )
+        admin = administrator.objects.create(username='admin', email='admin@tokos.cm', role='A')
+        cls.utilisateur = User.objects.get(pk=admin.user_ptr_id)
+        metriques.reconstruire_metriques()
+
+    def importer(self, texte, format, vendeur=None):
+        return ImportProduits(vendeur=vendeur).executer(lire_enregistrements(io.StringIO(texte), format))
+
+    def test_csv_cree_et_met_a_jour(self):
+        rapport = self.importer(
+            'id,nom,description,prix,stock,categorie,vendeur\n'
+            f',Sandale,Sandale en cuir,2500,3,chaussures,VENDEUR1@tokos.cm\n'
+            f',Basket,Nouvelle description,1200,0,{self.categorie.pk},vendeur0@tokos.cm\n'
+            f'{self.existant.pk},Basket,Par identifiant,1300,4,Chaussures,vendeur0@tokos.cm\n',
+            'csv',
+        )
+        # Deux lignes pour le même produit existant : un seul produit mis à jour, la dernière l'emporte
+        self.assertEqual((rapport['crees'], rapport['mis_a_jour'], rapport['nb_erreurs']), (1, 1, 0))
+        sandale = Produit.objects.get(nom='Sandale')
+        self.assertEqual((sandale.vendeur_id, sandale.prix_effectif, sandale.statut),
+                         (self.vendeurs[1].pk, Decimal('2500.00'), 'disponible'))
+        self.assertTrue(TermeProduit.objects.filter(produit=sandale, terme='cuir').exists())
+        self.existant.refresh_from_db()
+        self.assertEqual((self.existant.description, self.existant.prix, self.existant.stock),
+                         ('Par identifiant', Decimal('1300.00'), 4))
+        self.assertEqual(metriques.lire_metriques()[metriques.PRODUITS], 2)
+
+    def test_erreurs_par_ligne(self):
+        lignes = [
+            {'nom': 'Valide', 'description': 'ok', 'prix': 100, 'stock': 1, 'categorie': 'chaussures',
+             'vendeur': 'vendeur0@tokos.cm'},
+            {'nom': 'Statut', 'description': 'ok', 'prix': 100, 'stock': 1, 'categorie': 'chaussures',
+             'vendeur': 'vendeur0@tokos.cm', 'statut': 1},
+            {'nom': 'Prix', 'description': 'ok', 'prix': 'cher', 'stock': 1, 'categorie': 'inconnue',
+             'vendeur': 'vendeur0@tokos.cm'},
+        ]
+        texte = '\n'.join(json.dumps(ligne) for ligne in lignes) + '\n{pas du json\n[1, 2]\n'
+        rapport = self.importer(texte, 'jsonl')
+
+        self.assertEqual((rapport['lignes'], rapport['crees'], rapport['nb_erreurs']), (5, 1, 4))
+        erreurs = {erreur['ligne']: erreur['erreur'] for erreur in rapport['erreurs']}
+        self.assertIn('statut : « 1 » invalide', erreurs[2])
+        self.assertIn('prix', erreurs[3])
+        self.assertIn('categorie : « inconnue » inconnue', erreurs[3])
+        self.assertEqual(erreurs[4], erreurs[5])
+        self.assertFalse(Produit.objects.filter(nom__in=['Statut', 'Prix']).exists())
+
+    def test_import_vendeur_limite_a_ses_produits(self):
+        rapport = self.importer(
+            'id,nom,description,prix,stock,categorie\n'
+            f'{self.existant.pk},Piratage,x,1,1,chaussures\n'
+            ',Mocassin,Cuir,3000,2,chaussures\n',
+            'csv', vendeur=self.vendeurs[1],
+        )
+        self.assertEqual((rapport['crees'], rapport['nb_erreurs']), (1, 1))
+        self.assertEqual(Produit.objects.get(nom='Mocassin').vendeur_id, self.vendeurs[1].pk)
+        self.existant.refresh_from_db()
+        self.assertEqual(self.existant.nom, 'Basket')
+
+    def test_vue_import(self):
+        self.client.force_login(self.utilisateur)
+        url = reverse('admin_panel:importer_produits')
+        fichier = SimpleUploadedFile(
+            'produits.jsonl', b'{"nom": "Botte", "description": "x", "prix": 5000, "stock": 1, '
+            b'"categorie": "chaussures", "vendeur": "vendeur0@tokos.cm", "statut": 1}\n',
+        )
+        reponse = self.client.post(url, {'fichier': fichier})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['nb_erreurs'], 1)
+
+        reponse = self.client.post(url, {'fichier': SimpleUploadedFile('produits.xls', b'')})
+        self.assertEqual(reponse.status_code, 400)
+
+
+class ExportsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categorie = Categorie.objects.create(nom='Chaussures')
+        vendeur = Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V')
+        cls.produits = [
+            Produit.objects.create(
+                nom=f'Basket, modèle {i}', description='Chaussure', prix=Decimal(1000 * (i + 1)), stock=i,
+                categorie=categorie, vendeur=vendeur, statut='disponible' if i else 'rupture',
+            )
+            for i in range(3)
+        ]
+        client = Client.objects.create(username='client', email='client@tokos.cm', role='C')
+        commande = Commande.objects.create(client=client, montant_total=Decimal(3000))
+        CommandeItem.objects.bulk_create([
+            CommandeItem(commande=commande, produit=produit, quantite=1, prix=produit.prix)
+            for produit in cls.produits[:2]
+        ])
+        admin = administrator.objects.create(username='admin', email='admin@tokos.cm', role='A')
+        cls.utilisateur = User.objects.get(pk=admin.user_ptr_id)
+
+    def test_csv(self):
+        lignes = list(csv.reader(io.StringIO(''.join(lignes_export('produits', 'csv')))))
+        self.assertEqual(lignes[0][:3], ['id', 'nom', 'categorie_nom'])
+        self.assertEqual([ligne[1] for ligne in lignes[1:]], [produit.nom for produit in self.produits])
+
+    def test_jsonl_et_filtres(self):
+        lignes = [json.loads(ligne) for ligne in lignes_export('produits', 'jsonl', statut='disponible')]
+        self.assertEqual([ligne['id'] for ligne in lignes], [produit.pk for produit in self.produits[1:]])
+        self.assertEqual(lignes[0]['prix'], '2000.00')
+
+        aujourd_hui = timezone.localdate().isoformat()
+        self.assertEqual(len(list(lignes_export('commandes', 'jsonl', debut=aujourd_hui, fin=aujourd_hui))), 2)
+        self.assertEqual(len(list(lignes_export('commandes', 'jsonl', fin='2000-01-01'))), 0)
+        for nom, format, debut in (('factures', 'csv', None), ('produits', 'xml', None), ('commandes', 'csv', '18/10')):
+            with self.assertRaises(FiltreInvalide):
+                lignes_export(nom, format, debut=debut)
+
+    def test_vue_en_flux(self):
+        self.client.force_login(self.utilisateur)
+        reponse = self.client.get(reverse('admin_panel:exporter', args=['commandes']), {'format': 'jsonl'})
+        self.assertTrue(reponse.streaming)
+        self.assertEqual(reponse['Content-Disposition'], 'attachment; filename="commandes.jsonl"')
+        lignes = [json.loads(ligne) for ligne in b''.join(reponse.streaming_content).decode().splitlines()]
+        self.assertEqual([ligne['produit_id'] for ligne in lignes], [produit.pk for produit in self.produits[:2]])
 
-# Create your tests here.
+        reponse = self.client.get(reverse('admin_panel:exporter', args=['commandes']), {'debut': 'hier'})
+        self.assertEqual(reponse.status_code, 400)
@@ -13,15 +13,24 @@ urlpatterns = [
     path('produits/ajouter/', views.ajouter_produit, name='ajouter_produit'),
     path('produits/modifier/<int:pk>/', views.modifier_produit, name='modifier_produit'),
     path('produits/supprimer/<int:pk>/', views.supprimer_produit, name='supprimer_produit'),
+    path('produits/importer/', views.importer_produits, name='importer_produits'),
     path('produits/casser-prix/<int:pk>/', views.casser_prix, name='casser_prix'),
     
     # Promotions
     path('promotions/', views.promotions_list, name='promotions_list'),
     path('promotions/annuler/<int:pk>/', views.annuler_promotion, name='annuler_promotion'),
     
+    # Remises proposées par les vendeurs
+    path('remises/propositions/', views.propositions_list, name='propositions_list'),
+    path('remises/propositions/traiter/', views.traiter_propositions, name='traiter_propositions'),
+    
     # Commandes
     path('commandes/', views.commandes_list, name='commandes_list'),
     path('commandes/statut/<int:pk>/', views.changer_statut_commande, name='changer_statut_commande'),
+    path('commandes/statut/', views.changer_statuts_commandes, name='changer_statuts_commandes'),
+    
+    # Exports (CSV / JSONL en flux)
+    path('exports/<str:nom>/', views.exporter, name='exporter'),
     
     # Utilisateurs
     path('utilisateurs/', views.utilisateurs_list, name='utilisateurs_list'),
@@ -2,48 +2,55 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Count
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
 
-from bd.models import Produit, Commande, CommandeItem, RemiseValidee, Categorie
+from bd.models import Produit, Commande, RemiseProposee, RemiseValidee, Categorie, Client
+from bd import metriques
+from bd.metriques import lire_metriques
+from bd.pagination import paginer
+from bd.requetes import budget_requetes
 from adminT.forms import ProduitForm, CategorieForm
+from adminT.exports import FiltreInvalide, lignes_export
+from adminT.livraisons import TRANSITIONS, TransitionInvalide, changer_statut, changer_statuts
+from adminT.remises import RemiseInvalide, lire_fenetre, rejeter_propositions, valider_propositions
+from adminT.imports import FORMATS, FormatInvalide, ImportProduits, lire_enregistrements
+from clients.recherche import indexer_produit
+import io
 import json
 from decimal import Decimal
 
 @login_required
+@budget_requetes(5)
 def dashboard(request):
     """Vue principale du tableau de bord"""
     if request.user.role != 'A':
         return redirect('/')
     
-    # Statistiques
-    total_produits = Produit.objects.count()
-    total_commandes = Commande.objects.count()
-    produits_promotion = RemiseValidee.objects.count()
-    revenus = CommandeItem.objects.aggregate(total=Sum('prix'))['total'] or 0
-    produits_rupture = Produit.objects.filter(stock=0).count()
+    # Statistiques maintenues incrémentalement (voir bd.metriques)
+    stats = lire_metriques()
     
     context = {
-        'total_produits': total_produits,
-        'total_commandes': total_commandes,
-        'produits_promotion': produits_promotion,
-        'revenus': revenus,
-        'produits_rupture': produits_rupture,
+        'total_produits': stats[metriques.PRODUITS],
+        'total_commandes': stats[metriques.COMMANDES],
+        'produits_promotion': stats[metriques.PRODUITS_PROMOTION],
+        'revenus': stats[metriques.REVENUS],
+        'produits_rupture': stats[metriques.PRODUITS_RUPTURE],
     }
     return render(request, 'admin/dashboard.html', context)
 
 @login_required
+@budget_requetes(5)
 def produits_list(request):
     """Liste des produits avec pagination"""
     if request.user.role != 'A':
         return redirect('/')
     
     produits = Produit.objects.select_related('categorie', 'vendeur').all()
-    paginator = Paginator(produits, 10)
-    page = request.GET.get('page')
-    produits_page = paginator.get_page(page)
+    produits_page = paginer(request, produits, 10, ('-id',), approx_count=True)
     
     return render(request, 'admin/produits/list.html', {'produits': produits_page})
 
@@ -54,9 +61,9 @@ def ajouter_produit(request):
         return redirect('/')
     
     if request.method == 'POST':
-        form = ProduitForm(request.POST)
+        form = ProduitForm(request.POST, request.FILES)
         if form.is_valid():
-            form.save()
+            indexer_produit(form.save())
             messages.success(request, 'Produit ajouté avec succès!')
             return redirect('admin_panel:produits_list')
     else:
@@ -73,9 +80,9 @@ def modifier_produit(request, pk):
     produit = get_object_or_404(Produit, pk=pk)
     
     if request.method == 'POST':
-        form = ProduitForm(request.POST, instance=produit)
+        form = ProduitForm(request.POST, request.FILES, instance=produit)
         if form.is_valid():
-            form.save()
+            indexer_produit(form.save())
             messages.success(request, 'Produit modifié avec succès!')
             return redirect('admin_panel:produits_list')
     else:
@@ -109,78 +116,201 @@ def casser_prix(request, pk):
     
     if 'pourcentage' in data:
         pourcentage = int(data['pourcentage'])
-        nouveau_prix = produit.prix * (100 - pourcentage) / 100
     elif 'nouveau_prix' in data:
         nouveau_prix = Decimal(data['nouveau_prix'])
         pourcentage = int((1 - nouveau_prix / produit.prix) * 100)
     else:
         return JsonResponse({'error': 'Données invalides'}, status=400)
     
-    # Créer une remise validée
-    RemiseValidee.objects.create(
-        produit=produit,
-        pourcentage=pourcentage
-    )
-    
-    # Mettre à jour le prix du produit
-    produit.prix = nouveau_prix
-    produit.save()
+    if not 0 < pourcentage < 100:
+        return JsonResponse({'error': 'Pourcentage invalide'}, status=400)
+    
+    # Fenêtre de validité optionnelle (ISO 8601) : par défaut, dès maintenant et sans fin
+    try:
+        date_debut, date_fin = lire_fenetre(data.get('date_debut'), data.get('date_fin'))
+    except RemiseInvalide as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    with transaction.atomic():
+        # Créer une remise validée
+        remise = RemiseValidee.objects.create(
+            produit=produit,
+            pourcentage=pourcentage,
+            date_debut=date_debut or timezone.now(),
+            date_fin=date_fin,
+        )
+        
+        # Le prix de base reste intact : seule la remise dénormalisée change,
+        # et seulement si la fenêtre est déjà ouverte (sinon le calendrier s'en charge)
+        produit.synchroniser_remise()
     
     return JsonResponse({
         'success': True,
-        'nouveau_prix': float(nouveau_prix),
-        'pourcentage': pourcentage
+        'nouveau_prix': float(produit.prix_effectif),
+        'pourcentage': pourcentage,
+        'date_debut': remise.date_debut,
+        'date_fin': remise.date_fin,
     })
 
 @login_required
+@budget_requetes(5)
 def promotions_list(request):
     """Liste des promotions actives"""
     if request.user.role != 'A':
         return redirect('/')
     
-    promotions = RemiseValidee.objects.select_related('produit').all()
+    promotions = RemiseValidee.objects.select_related('produit__categorie').all()
     return render(request, 'admin/promotions/list.html', {'promotions': promotions})
 
 @login_required
-def commandes_list(request):
-    """Liste des commandes"""
+@budget_requetes(6)
+def propositions_list(request):
+    """File des remises proposées par les vendeurs"""
     if request.user.role != 'A':
         return redirect('/')
     
-    commandes = Commande.objects.select_related('client').prefetch_related('commandeitem_set__produit').all()
-    paginator = Paginator(commandes, 15)
-    page = request.GET.get('page')
-    commandes_page = paginator.get_page(page)
+    statut = request.GET.get('statut', 'en_attente')
+    propositions = RemiseProposee.objects.filter(statut=statut).select_related('produit', 'vendeur')
+    propositions_page = paginer(request, propositions, 100, ('date_proposition', 'id'), approx_count=True)
+    
+    return render(request, 'admin/remises/propositions.html', {
+        'propositions': propositions_page,
+        'statut': statut,
+    })
+
+@login_required
+@require_http_methods(["POST"])
+def traiter_propositions(request):
+    """
+    Valide ou rejette des propositions en une seule action : `action`
+    (valider / rejeter) et `ids`, ou `tout` pour toute la file en attente.
+    Formulaire (redirection) ou JSON (réponse JSON).
+    """
+    en_json = request.content_type == 'application/json'
+    if request.user.role != 'A':
+        return JsonResponse({'error': 'Non autorisé'}, status=403)
+    
+    if en_json:
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Données invalides'}, status=400)
+        action, ids, tout = data.get('action'), data.get('ids') or [], bool(data.get('tout'))
+    else:
+        action, ids, tout = request.POST.get('action'), request.POST.getlist('ids'), bool(request.POST.get('tout'))
+    
+    if action not in ('valider', 'rejeter') or not (ids or tout):
+        if en_json:
+            return JsonResponse({'error': 'Données invalides'}, status=400)
+        messages.error(request, 'Aucune proposition sélectionnée.')
+        return redirect('admin_panel:propositions_list')
+    
+    source = data if en_json else request.POST
+    try:
+        ids = None if tout else [int(pk) for pk in ids]
+        if action == 'valider':
+            date_debut, date_fin = lire_fenetre(source.get('date_debut'), source.get('date_fin'))
+            nombre = valider_propositions(ids, date_debut, date_fin)
+        else:
+            nombre = rejeter_propositions(ids)
+    except (TypeError, ValueError) as e:
+        if en_json:
+            return JsonResponse({'error': str(e) if isinstance(e, RemiseInvalide) else 'Identifiants invalides'}, status=400)
+        messages.error(request, str(e) if isinstance(e, RemiseInvalide) else 'Identifiants invalides')
+        return redirect('admin_panel:propositions_list')
+    
+    if en_json:
+        return JsonResponse({'success': True, 'action': action, 'nombre': nombre})
+    messages.success(request, f"{nombre} proposition(s) {'validée(s)' if action == 'valider' else 'rejetée(s)'}.")
+    return redirect('admin_panel:propositions_list')
+
+@login_required
+@budget_requetes(8)
+def commandes_list(request):
+    """Liste des commandes, filtrable par statut"""
+    if request.user.role != 'A':
+        return redirect('/')
     
-    return render(request, 'admin/commandes/list.html', {'commandes': commandes_page})
+    commandes = Commande.objects.select_related('client').prefetch_related('commandeitem_set__produit__categorie').all()
+    statut = request.GET.get('statut')
+    if statut in TRANSITIONS:
+        commandes = commandes.filter(statut=statut)
+    else:
+        statut = None
+    commandes_page = paginer(request, commandes, 15, ('-date', '-id'), approx_count=True)
+    
+    return render(request, 'admin/commandes/list.html', {
+        'commandes': commandes_page,
+        'statut': statut,
+        'statuts': Commande.STATUT_CHOICES,
+        'transitions': [
+            (valeur, libelle) for valeur, libelle in Commande.STATUT_CHOICES
+            if statut and valeur in TRANSITIONS[statut]
+        ],
+    })
 
 @login_required
 @require_http_methods(["POST"])
 def changer_statut_commande(request, pk):
-    """Changer le statut d'une commande"""
+    """Changer le statut d'une commande, si la transition est autorisée"""
     if request.user.role != 'A':
         return JsonResponse({'error': 'Non autorisé'}, status=403)
     
-    commande = get_object_or_404(Commande, pk=pk)
-    nouveau_statut = request.POST.get('statut')
+    get_object_or_404(Commande.objects.only('id'), pk=pk)
+    try:
+        resultat = changer_statut(pk, request.POST.get('statut'), auteur=request.user)
+    except TransitionInvalide as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
-    if nouveau_statut in ['en_attente', 'en_cours', 'livre', 'annule']:
-        commande.statut = nouveau_statut
-        commande.save()
-        return JsonResponse({'success': True, 'statut': nouveau_statut})
+    return JsonResponse({'success': True, 'statut': resultat['statut']})
+
+@login_required
+@require_http_methods(["POST"])
+# Coût proportionnel au nombre de lots : les insertions groupées sont découpées par SQLite
+@budget_requetes(None, seuil_n_plus_un=50)
+def changer_statuts_commandes(request):
+    """
+    Changement de statut groupé : `statut` et `ids`, ou `depuis` pour toutes
+    les commandes d'un statut. Formulaire (redirection) ou JSON (réponse JSON).
+    """
+    en_json = request.content_type == 'application/json'
+    if request.user.role != 'A':
+        return JsonResponse({'error': 'Non autorisé'}, status=403)
     
-    return JsonResponse({'error': 'Statut invalide'}, status=400)
+    if en_json:
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Données invalides'}, status=400)
+        statut, ids, depuis = data.get('statut'), data.get('ids'), data.get('depuis')
+        if ids is not None and not isinstance(ids, list):
+            return JsonResponse({'error': 'Liste d\'identifiants attendue'}, status=400)
+    else:
+        statut, ids, depuis = request.POST.get('statut'), request.POST.getlist('ids'), request.POST.get('depuis')
+    
+    try:
+        resultat = changer_statuts(statut, ids=ids or None, depuis=depuis or None, auteur=request.user)
+    except (TypeError, ValueError) as e:
+        message = str(e) if isinstance(e, TransitionInvalide) else 'Identifiants invalides'
+        if en_json:
+            return JsonResponse({'error': message}, status=400)
+        messages.error(request, message)
+        return redirect('admin_panel:commandes_list')
+    
+    if en_json:
+        return JsonResponse({'success': True, **resultat})
+    messages.success(request, f"{resultat['modifiees']} commande(s) passée(s) au statut « {resultat['statut']} ».")
+    return redirect('admin_panel:commandes_list')
 
 @login_required
+@budget_requetes(6)
 def utilisateurs_list(request):
     """Liste des utilisateurs"""
     if request.user.role != 'A':
         return redirect('/')
     
     clients = Client.objects.annotate(nb_commandes=Count('commande')).all()
-    paginator = Paginator(clients, 20)
-    page = request.GET.get('page')
-    clients_page = paginator.get_page(page)
+    clients_page = paginer(request, clients, 20, ('-pk',), approx_count=True)
     
     return render(request, 'admin/utilisateurs/list.html', {'clients': clients_page})
 
@@ -209,7 +339,9 @@ def annuler_promotion(request, pk):
     
     promotion = get_object_or_404(RemiseValidee, pk=pk)
     if request.method == 'POST':
-        promotion.delete()
+        with transaction.atomic():
+            promotion.delete()
+            promotion.produit.synchroniser_remise()
         messages.success(request, 'Promotion annulée avec succès!')
         return redirect('admin_panel:promotions_list')
     
@@ -246,4 +378,52 @@ def ajouter_categorie(request):
     else:
         form = CategorieForm()
     
-    return render(request, 'admin/parametres/ajouter_categorie.html', {'form': form})
\ No newline at end of file
+    return render(request, 'admin/parametres/ajouter_categorie.html', {'form': form})
+
+@login_required
+def exporter(request, nom):
+    """Export en flux (CSV ou JSONL) des commandes, produits ou clients"""
+    if request.user.role != 'A':
+        return redirect('/')
+    
+    format = request.GET.get('format', 'csv')
+    try:
+        lignes = lignes_export(
+            nom, format,
+            debut=request.GET.get('debut'),
+            fin=request.GET.get('fin'),
+            statut=request.GET.get('statut'),
+        )
+    except FiltreInvalide as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    content_type = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(lignes, content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nom}.{format}"'
+    return response
+
+@login_required
+@require_http_methods(["POST"])
+def importer_produits(request):
+    """
+    Import en masse de produits (fichier CSV ou JSONL, champ `fichier`).
+    Un vendeur n'importe que ses propres produits. Retourne le rapport
+    d'import : créés, mis à jour, erreurs par ligne et débit.
+    """
+    if request.user.role not in ('A', 'V'):
+        return JsonResponse({'error': 'Non autorisé'}, status=403)
+    
+    fichier = request.FILES.get('fichier')
+    if fichier is None:
+        return JsonResponse({'error': 'Fichier manquant'}, status=400)
+    format = request.POST.get('format') or fichier.name.rsplit('.', 1)[-1].lower()
+    if format not in FORMATS:
+        return JsonResponse({'error': f'Format inconnu : {format}'}, status=400)
+    
+    vendeur = request.user.vendeur if request.user.role == 'V' else None
+    texte = io.TextIOWrapper(fichier.file, encoding='utf-8-sig', newline='')
+    try:
+        rapport = ImportProduits(vendeur=vendeur).executer(lire_enregistrements(texte, format))
+    except (FormatInvalide, UnicodeDecodeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(rapport)
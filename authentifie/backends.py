@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authentification par e-mail : une seule requête sur l'index unique de
+    bd_user.email, le rôle (client, vendeur, administrateur) étant porté par User.
+    """
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.get(email=email)
+        except UserModel.DoesNotExist:
+            # Même coût de hachage qu'un utilisateur existant (évite l'énumération par la durée)
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
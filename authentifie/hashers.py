@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class PBKDF2ReglableHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 dont le nombre d'itérations vient de settings.PBKDF2_ITERATIONS.
+    Quand ce réglage change, les mots de passe sont re-hachés à la connexion
+    suivante (check_password -> must_update).
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PBKDF2_ITERATIONS', None) or PBKDF2PasswordHasher.iterations
@@ -0,0 +1,75 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+
+def _cache():
+    return caches[getattr(settings, 'LIMITATION_CACHE', 'default')]
+
+
+def consommer_jeton(cle, capacite, par_minute):
+    """
+    Au plus `capacite` essais par fenêtre de capacite / par_minute minutes,
+    soit `par_minute` essais par minute en moyenne. Le compteur de la fenêtre
+    est créé par cache.add puis augmenté par cache.incr, sans lecture suivie
+    d'une écriture : des requêtes parallèles ne peuvent pas toutes lire le
+    même compte et passer ensemble. Retourne (autorise, secondes_avant_essai).
+    """
+    cache = _cache()
+    periode = max(1, math.ceil(capacite * 60 / par_minute))
+    maintenant = time.time()
+    fenetre = int(maintenant // periode)
+    cle = f'{cle}:{fenetre}'
+
+    try:
+        essais = 1 if cache.add(cle, 1, timeout=periode + 1) else cache.incr(cle)
+    except ValueError:
+        # Compteur expiré entre add et incr : la fenêtre est terminée
+        return True, 0
+    if essais > capacite:
+        return False, max(1, math.ceil((fenetre + 1) * periode - maintenant))
+    return True, 0
+
+
+def adresse_ip(request):
+    if getattr(settings, 'LIMITATION_FAIRE_CONFIANCE_PROXY', False):
+        transmise = request.META.get('HTTP_X_FORWARDED_FOR')
+        if transmise:
+            return transmise.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def limiter_debit(portee):
+    """
+    Refuse (HTTP 429) les POST au-delà des seaux par IP et par e-mail définis
+    dans settings.LIMITATION_AUTH[portee], avant tout hachage de mot de passe.
+    """
+    def decorateur(vue):
+        @wraps(vue)
+        def enveloppe(request, *args, **kwargs):
+            if request.method == 'POST':
+                regles = settings.LIMITATION_AUTH.get(portee, {})
+                cles = {'ip': adresse_ip(request)}
+                email = request.POST.get('email', '').strip().lower()
+                if email:
+                    cles['email'] = email
+
+                for critere, valeur in cles.items():
+                    if critere not in regles:
+                        continue
+                    capacite, par_minute = regles[critere]
+                    autorise, attente = consommer_jeton(f'limitation:{portee}:{critere}:{valeur}', capacite, par_minute)
+                    if not autorise:
+                        response = JsonResponse({
+                            'success': False,
+                            'errors': {'global': f"Trop de tentatives. Réessayez dans {attente} secondes."},
+                        }, status=429)
+                        response['Retry-After'] = str(attente)
+                        return response
+            return vue(request, *args, **kwargs)
+        return enveloppe
+    return decorateur
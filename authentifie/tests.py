@@ -1,3 +1,133 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from bd.models import Client, User, Vendeur, administrator
+from .limitation import consommer_jeton
+
+
+class LimitationTests(TestCase):
+
+    def setUp(self):
+        caches[settings.LIMITATION_CACHE].clear()
+
+    def test_capacite_puis_attente(self):
+        with mock.patch('authentifie.limitation.time.time', return_value=1000.0):
+            self.assertEqual([consommer_jeton('essai', 3, 1)[0] for _ in range(4)], [True, True, True, False])
+            # Fenêtre de 3 minutes commencée à 900 s
+            self.assertEqual(consommer_jeton('essai', 3, 1), (False, 80))
+            self.assertTrue(consommer_jeton('autre', 3, 1)[0])
+        with mock.patch('authentifie.limitation.time.time', return_value=1080.0):
+            self.assertTrue(consommer_jeton('essai', 3, 1)[0])
+
+    def test_rafale_parallele(self):
+        depart = threading.Barrier(20)
+        resultats = []
+
+        def essayer():
+            depart.wait()
+            resultats.append(consommer_jeton('rafale', 5, 1)[0])
+
+        # Lecture ralentie : une lecture suivie d'une écriture laisserait passer toute la rafale
+        backend = type(caches[settings.LIMITATION_CACHE])
+        lire = backend.get
+
+        def lire_lentement(*args, **kwargs):
+            valeur = lire(*args, **kwargs)
+            time.sleep(0.01)
+            return valeur
+
+        with mock.patch.object(backend, 'get', lire_lentement):
+            fils = [threading.Thread(target=essayer) for _ in range(20)]
+            for fil in fils:
+                fil.start()
+            for fil in fils:
+                fil.join()
+        self.assertEqual(resultats.count(True), 5)
+
+    def test_connexion_limitee_par_email(self):
+        url = reverse('login_post')
+        for i in range(5):
+            reponse = self.client.post(url, {'email': 'Cible@tokos.cm', 'motdepasse': 'faux'}, REMOTE_ADDR=f'10.0.0.{i}')
+            self.assertEqual(reponse.status_code, 200)
+        reponse = self.client.post(url, {'email': 'cible@tokos.cm ', 'motdepasse': 'faux'}, REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(reponse.status_code, 429)
+        self.assertGreater(int(reponse['Retry-After']), 0)
+        # Autre compte depuis la même adresse : seul le seau de l'e-mail est vide
+        reponse = self.client.post(url, {'email': 'autre@tokos.cm', 'motdepasse': 'faux'}, REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(reponse.status_code, 200)
+
+    def test_inscription_limitee_par_ip(self):
+        url = reverse('signup_post')
+        donnees = {
+            'nom': 'Nom', 'prenom': 'Prenom', 'telephone': '600000000', 'mdp': 'Secret123', 'confirm_mdp': 'Autre123',
+        }
+        for i in range(5):
+            reponse = self.client.post(url, {**donnees, 'email': f'client{i}@tokos.cm'})
+            self.assertEqual(reponse.status_code, 200)
+            self.assertIn('confirmMotdepasse', reponse.json()['errors'])
+        reponse = self.client.post(url, {**donnees, 'email': 'client9@tokos.cm'})
+        self.assertEqual(reponse.status_code, 429)
+        reponse = self.client.post(url, {**donnees, 'email': 'client9@tokos.cm'}, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(reponse.status_code, 200)
+
+
+@override_settings(PBKDF2_ITERATIONS=1000)
+class ConnexionParEmailTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.comptes = {}
+        for modele, role in ((Client, 'C'), (Vendeur, 'V'), (administrator, 'A')):
+            compte = modele(username=f'compte{role}', email=f'{role.lower()}@tokos.cm', role=role)
+            compte.set_password('Secret123')
+            compte.save()
+            cls.comptes[role] = compte
+
+    def setUp(self):
+        caches[settings.LIMITATION_CACHE].clear()
+
+    def test_une_requete_quel_que_soit_le_role(self):
+        for role, compte in self.comptes.items():
+            with self.assertNumQueries(1):
+                utilisateur = authenticate(email=compte.email, password='Secret123')
+            self.assertEqual((type(utilisateur), utilisateur.pk, utilisateur.role), (User, compte.user_ptr_id, role))
+
+    def test_refus(self):
+        self.assertIsNone(authenticate(email='c@tokos.cm', password='Mauvais123'))
+        self.assertIsNone(authenticate(email='inconnu@tokos.cm', password='Secret123'))
+        self.assertIsNone(authenticate(email='c@tokos.cm'))
+        User.objects.filter(pk=self.comptes['C'].user_ptr_id).update(is_active=False)
+        self.assertIsNone(authenticate(email='c@tokos.cm', password='Secret123'))
+
+    def test_inconnu_hache_quand_meme(self):
+        # Même coût qu'un compte existant : la durée ne révèle pas les e-mails enregistrés
+        with mock.patch('django.contrib.auth.base_user.make_password', wraps=make_password) as hachage:
+            authenticate(email='inconnu@tokos.cm', password='Secret123')
+        hachage.assert_called_once()
+
+    def hachage(self, role):
+        encode = User.objects.get(pk=self.comptes[role].user_ptr_id).password
+        return identify_hasher(encode).safe_summary(encode)
+
+    def test_iterations_relevees_a_la_connexion(self):
+        self.assertEqual(self.hachage('V')['iterations'], 1000)
+        with self.settings(PBKDF2_ITERATIONS=2000):
+            self.assertIsNotNone(authenticate(email='v@tokos.cm', password='Secret123'))
+        self.assertEqual(self.hachage('V')['iterations'], 2000)
+
+    def test_ancien_hachage_migre_par_la_vue_de_connexion(self):
+        User.objects.filter(pk=self.comptes['C'].user_ptr_id).update(
+            password=make_password('Secret123', hasher='pbkdf2_sha1'),
+        )
+        reponse = self.client.post(reverse('login_post'), {'email': 'c@tokos.cm', 'motdepasse': 'Secret123'})
+        self.assertTrue(reponse.json()['success'])
+        self.assertEqual(self.hachage('C')['algorithm'], 'pbkdf2_sha256')
+        self.assertEqual(self.hachage('C')['iterations'], 1000)
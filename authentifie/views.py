@@ -1,16 +1,19 @@
 from django.shortcuts import render, redirect
-from bd.models import Client, Vendeur, administrator
+from bd.models import Client
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import authenticate, login as auth_login
 
+from .limitation import limiter_debit
+
 
 def signup(request):
     return render(request, 'signup.html')
 
 
 @csrf_exempt
+@limiter_debit('inscription')
 def signupPost(request):
     if request.method == 'POST':
         nom = request.POST["nom"]
@@ -66,6 +69,7 @@ def login(request):
 
 
 @csrf_exempt
+@limiter_debit('connexion')
 def loginPost(request):
     if request.method == 'POST':
         email = request.POST.get('email', '').strip()
@@ -80,37 +84,23 @@ def loginPost(request):
         if errors:
             return JsonResponse({'success': False, 'errors': errors})
 
-        # Authentification par email pour tous les types d'utilisateurs
-        user = None
-        # On cherche dans Client, Vendeur, administrator
-        try:
-            user = Client.objects.get(email=email)
-        except Client.DoesNotExist:
-            try:
-                user = Vendeur.objects.get(email=email)
-            except Vendeur.DoesNotExist:
-                try:
-                    user = administrator.objects.get(email=email)
-                except administrator.DoesNotExist:
-                    user = None
-
-        if user is not None:
-            user_auth = authenticate(request, username=user.username, password=motdepasse)
-            if user_auth is not None:
-                auth_login(request, user_auth)
-                # Redirection selon le rôle
-                if hasattr(user_auth, 'role'):
-                    if user_auth.role == 'A':
-                        redirect_url = '/admin/dashboard/'  # à créer
-                    elif user_auth.role == 'V':
-                        redirect_url = '/vendeur/dashboard/'  # à créer
-                    elif user_auth.role == 'C':
-                        redirect_url = '/client/dashboard/'  # à créer
-                    else:
-                        redirect_url = '/'
+        # Authentification par email pour tous les types d'utilisateurs (authentifie.backends.EmailBackend)
+        user_auth = authenticate(request, email=email, password=motdepasse)
+        if user_auth is not None:
+            auth_login(request, user_auth)
+            # Redirection selon le rôle
+            if hasattr(user_auth, 'role'):
+                if user_auth.role == 'A':
+                    redirect_url = '/admin/dashboard/'  # à créer
+                elif user_auth.role == 'V':
+                    redirect_url = '/vendeur/dashboard/'  # à créer
+                elif user_auth.role == 'C':
+                    redirect_url = '/client/dashboard/'  # à créer
                 else:
                     redirect_url = '/'
-                return JsonResponse({'success': True, 'message': "Connexion réussie !", 'redirect': redirect_url})
+            else:
+                redirect_url = '/'
+            return JsonResponse({'success': True, 'message': "Connexion réussie !", 'redirect': redirect_url})
         errors['email'] = "Email ou mot de passe incorrect"
         errors['motdepasse'] = "Email ou mot de passe incorrect"
         return JsonResponse({'success': False, 'errors': errors})
@@ -0,0 +1,63 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast, Round
+
+from .models import Avis, Vendeur
+
+NOTES = range(1, 6)
+
+
+def ajuster_notes(vendeur_id, ancienne=None, nouvelle=None):
+    """
+    Répercute sur les agrégats du vendeur l'ajout (ancienne=None), la
+    modification ou la suppression (nouvelle=None) d'un avis : un seul
+    UPDATE, moyenne recalculée en SQL à partir des valeurs avant mise à jour.
+    """
+    if ancienne == nouvelle:
+        return
+    delta_nb = (nouvelle is not None) - (ancienne is not None)
+    delta_somme = (nouvelle or 0) - (ancienne or 0)
+    mise_a_jour = {
+        'nb_avis': F('nb_avis') + delta_nb,
+        'somme_notes': F('somme_notes') + delta_somme,
+        'note_moyenne': Case(
+            When(nb_avis__lte=-delta_nb, then=Value(0)),
+            default=Round(
+                Cast(F('somme_notes') + delta_somme, FloatField()) / (F('nb_avis') + delta_nb), 2,
+            ),
+            output_field=Vendeur._meta.get_field('note_moyenne'),
+        ),
+    }
+    if ancienne is not None:
+        mise_a_jour[f'notes_{ancienne}'] = F(f'notes_{ancienne}') - 1
+    if nouvelle is not None:
+        mise_a_jour[f'notes_{nouvelle}'] = F(f'notes_{nouvelle}') + 1
+    Vendeur.objects.filter(pk=vendeur_id).update(**mise_a_jour)
+
+
+def reconstruire_notes():
+    """Recalcule les agrégats de tous les vendeurs depuis la table Avis ; retourne le nombre de vendeurs notés"""
+    repartition = defaultdict(dict)
+    for vendeur_id, note, nombre in Avis.objects.values_list('vendeur_id', 'note').annotate(n=Count('id')).order_by():
+        repartition[vendeur_id][note] = nombre
+
+    with transaction.atomic():
+        vendeurs = list(Vendeur.objects.only('idVendeur'))
+        for vendeur in vendeurs:
+            notes = repartition.get(vendeur.pk, {})
+            vendeur.nb_avis = sum(notes.values())
+            vendeur.somme_notes = sum(note * nombre for note, nombre in notes.items())
+            vendeur.note_moyenne = (
+                (Decimal(vendeur.somme_notes) / vendeur.nb_avis).quantize(Decimal('0.01')) if vendeur.nb_avis else 0
+            )
+            for note in NOTES:
+                setattr(vendeur, f'notes_{note}', notes.get(note, 0))
+        Vendeur.objects.bulk_update(
+            vendeurs,
+            ['nb_avis', 'somme_notes', 'note_moyenne', *(f'notes_{note}' for note in NOTES)],
+            batch_size=500,
+        )
+    return len(repartition)
@@ -0,0 +1,24 @@
+from django.core.cache import cache
+
+# Compteur de génération du catalogue : l'incrémenter rend obsolètes, en O(1),
+# toutes les entrées construites avec cle_catalogue()
+CLE_VERSION = 'catalogue:version'
+
+
+def version_catalogue():
+    version = cache.get(CLE_VERSION)
+    if version is None:
+        cache.add(CLE_VERSION, 1, None)
+        version = cache.get(CLE_VERSION, 1)
+    return version
+
+
+def invalider_catalogue():
+    try:
+        cache.incr(CLE_VERSION)
+    except ValueError:
+        cache.set(CLE_VERSION, 2, None)
+
+
+def cle_catalogue(nom):
+    return f'{nom}:v{version_catalogue()}'
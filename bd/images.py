@@ -0,0 +1,102 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .cache import invalider_catalogue
+from .models import Produit
+
+logger = logging.getLogger('tchokos.images')
+
+# Largeurs (px) des vignettes carrées générées pour chaque image produit
+LARGEURS = (160, 320, 640)
+
+# Formats des variantes : extension -> (format Pillow, options d'enregistrement)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+DOSSIER_VARIANTES = 'produits/variantes'
+
+_pool = None
+
+
+def _executeur():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGES_WORKERS', 2), thread_name_prefix='images',
+        )
+    return _pool
+
+
+def largeurs():
+    return tuple(getattr(settings, 'IMAGES_LARGEURS', LARGEURS))
+
+
+def generer_variantes(contenu):
+    """
+    Vignettes carrées de chaque largeur, en WebP et JPEG, nommées d'après
+    l'empreinte du contenu source : une même image n'est traitée et stockée
+    qu'une fois, et les noms peuvent être mis en cache sans limite de durée.
+    Retourne {largeur: {extension: chemin}}.
+    """
+    empreinte = hashlib.sha256(contenu).hexdigest()[:16]
+    with Image.open(io.BytesIO(contenu)) as source:
+        source = ImageOps.exif_transpose(source).convert('RGB')
+        variantes = {}
+        for largeur in largeurs():
+            vignette = None
+            variantes[str(largeur)] = {}
+            for extension, (format, options) in FORMATS.items():
+                chemin = f'{DOSSIER_VARIANTES}/{empreinte}-{largeur}.{extension}'
+                if not default_storage.exists(chemin):
+                    if vignette is None:
+                        vignette = ImageOps.fit(source, (largeur, largeur), Image.LANCZOS)
+                    tampon = io.BytesIO()
+                    vignette.save(tampon, format, **options)
+                    chemin = default_storage.save(chemin, ContentFile(tampon.getvalue()))
+                variantes[str(largeur)][extension] = chemin
+    return variantes
+
+
+def traiter_image_produit(produit_id):
+    """Génère et enregistre les variantes de l'image courante du produit"""
+    try:
+        nom = Produit.objects.filter(pk=produit_id).values_list('image', flat=True).first()
+        if not nom:
+            return None
+        with default_storage.open(nom, 'rb') as fichier:
+            variantes = generer_variantes(fichier.read())
+        # Conditionné au nom d'image : une image remplacée entre-temps n'est pas écrasée
+        if Produit.objects.filter(pk=produit_id, image=nom).update(images_variantes=variantes):
+            invalider_catalogue()
+        return variantes
+    except Exception:
+        logger.exception("Variantes de l'image du produit %s non générées", produit_id)
+        return None
+
+
+def _traiter_dans_fil(produit_id):
+    try:
+        return traiter_image_produit(produit_id)
+    finally:
+        # Fil du pool : sa connexion ne doit pas rester ouverte
+        connection.close()
+
+
+def planifier_variantes(produit_id):
+    """Confie la génération au pool de fils après validation de la transaction en cours"""
+    def soumettre():
+        if getattr(settings, 'IMAGES_WORKERS', 2):
+            _executeur().submit(_traiter_dans_fil, produit_id)
+        else:
+            traiter_image_produit(produit_id)
+    transaction.on_commit(soumettre)
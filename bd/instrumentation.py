@@ -0,0 +1,186 @@
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger('tchokos.instrumentation')
+
+# Bornes (secondes) de l'histogramme des durées de réponse
+BORNES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+VUE_NON_RESOLUE = '<non résolue>'
+
+# Mesure de la requête en cours sur ce fil ; absente hors échantillon
+_courante = threading.local()
+
+
+class Mesure:
+    """Temps et volumes d'une requête HTTP"""
+
+    def __init__(self):
+        self.db = 0.0
+        self.requetes = 0
+        self.gabarits = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - debut
+            self.requetes += 1
+
+
+class Registre:
+    """Cumuls par nom d'URL, propres au processus"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._vues = {}
+
+    def enregistrer(self, vue, duree, mesure, octets):
+        with self._verrou:
+            stats = self._vues.get(vue)
+            if stats is None:
+                stats = self._vues[vue] = {
+                    'nombre': 0, 'duree': 0.0, 'db': 0.0, 'requetes': 0, 'gabarits': 0.0, 'octets': 0,
+                    'buckets': [0] * (len(BORNES_DUREE) + 1),
+                }
+            stats['nombre'] += 1
+            stats['duree'] += duree
+            stats['db'] += mesure.db
+            stats['requetes'] += mesure.requetes
+            stats['gabarits'] += mesure.gabarits
+            stats['octets'] += octets
+            stats['buckets'][bisect_left(BORNES_DUREE, duree)] += 1
+
+    def instantane(self):
+        with self._verrou:
+            return {vue: {**stats, 'buckets': list(stats['buckets'])} for vue, stats in self._vues.items()}
+
+    def vider(self):
+        with self._verrou:
+            self._vues.clear()
+
+
+registre = Registre()
+
+
+def _etiquette(valeur):
+    return valeur.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def exporter_prometheus(vues=None):
+    """Format texte d'exposition Prometheus (0.0.4)"""
+    vues = registre.instantane() if vues is None else vues
+    lignes = [
+        '# HELP tchokos_requete_duree_secondes Durée totale de traitement par vue',
+        '# TYPE tchokos_requete_duree_secondes histogram',
+    ]
+    for vue, stats in sorted(vues.items()):
+        etiquette = f'vue="{_etiquette(vue)}"'
+        cumul = 0
+        for borne, nombre in zip(BORNES_DUREE + ('+Inf',), stats['buckets']):
+            cumul += nombre
+            lignes.append(f'tchokos_requete_duree_secondes_bucket{{{etiquette},le="{borne}"}} {cumul}')
+        lignes.append(f'tchokos_requete_duree_secondes_sum{{{etiquette}}} {stats["duree"]:.6f}')
+        lignes.append(f'tchokos_requete_duree_secondes_count{{{etiquette}}} {stats["nombre"]}')
+
+    compteurs = (
+        ('db_secondes', 'db', 'Temps passé en base de données'),
+        ('requetes_sql', 'requetes', 'Requêtes SQL exécutées'),
+        ('gabarit_secondes', 'gabarits', 'Temps de rendu des gabarits'),
+        ('reponse_octets', 'octets', 'Taille des réponses'),
+    )
+    for nom, cle, aide in compteurs:
+        lignes.append(f'# HELP tchokos_{nom}_total {aide} par vue')
+        lignes.append(f'# TYPE tchokos_{nom}_total counter')
+        for vue, stats in sorted(vues.items()):
+            valeur = stats[cle]
+            valeur = f'{valeur:.6f}' if isinstance(valeur, float) else valeur
+            lignes.append(f'tchokos_{nom}_total{{vue="{_etiquette(vue)}"}} {valeur}')
+    return '\n'.join(lignes) + '\n'
+
+
+class InstrumentationMiddleware:
+    """
+    Mesure, pour une fraction INSTRUMENTATION_ECHANTILLON des requêtes, la
+    durée totale, le temps et le nombre de requêtes SQL, le temps de rendu des
+    gabarits et la taille de la réponse. Les cumuls par nom d'URL sont exposés
+    au format Prometheus ; chaque mesure est aussi journalisée en JSON.
+    Hors échantillon, la requête ne coûte qu'un tirage aléatoire.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        taux = getattr(settings, 'INSTRUMENTATION_ECHANTILLON', 1.0)
+        if taux <= 0 or (taux < 1 and random.random() >= taux):
+            return self.get_response(request)
+
+        mesure = _courante.mesure = Mesure()
+        debut = time.perf_counter()
+        try:
+            with ExitStack() as pile:
+                for connexion in connections.all():
+                    pile.enter_context(connexion.execute_wrapper(mesure))
+                response = self.get_response(request)
+        finally:
+            _courante.mesure = None
+        duree = time.perf_counter() - debut
+
+        resolution = getattr(request, 'resolver_match', None)
+        vue = (resolution.view_name if resolution else None) or VUE_NON_RESOLUE
+        octets = 0 if response.streaming else len(response.content)
+        registre.enregistrer(vue, duree, mesure, octets)
+
+        logger.info(json.dumps({
+            'vue': vue,
+            'methode': request.method,
+            'chemin': request.path,
+            'statut': response.status_code,
+            'duree_ms': round(duree * 1000, 2),
+            'db_ms': round(mesure.db * 1000, 2),
+            'requetes': mesure.requetes,
+            'gabarit_ms': round(mesure.gabarits * 1000, 2),
+            'octets': octets,
+        }, ensure_ascii=False))
+        return response
+
+
+class GabaritMesure:
+    """Enveloppe d'un gabarit Django qui chronomètre son rendu"""
+
+    def __init__(self, gabarit):
+        self.gabarit = gabarit
+
+    def __getattr__(self, nom):
+        return getattr(self.gabarit, nom)
+
+    def render(self, context=None, request=None):
+        mesure = getattr(_courante, 'mesure', None)
+        if mesure is None:
+            return self.gabarit.render(context, request)
+        debut = time.perf_counter()
+        try:
+            return self.gabarit.render(context, request)
+        finally:
+            mesure.gabarits += time.perf_counter() - debut
+
+
+class GabaritsMesures(DjangoTemplates):
+    """Moteur DjangoTemplates dont les gabarits de premier niveau sont chronométrés"""
+
+    def from_string(self, template_code):
+        return GabaritMesure(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return GabaritMesure(super().get_template(template_name))
@@ -0,0 +1,127 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as ClientTest
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from bd.peuplement import peupler
+
+# (nom, profil connecté, nom d'URL, query string)
+SCENARIOS = [
+    ('accueil', None, 'home', ''),
+    ('catalogue', None, 'produits', ''),
+    ('catalogue filtré', None, 'produits', '?categorie={categorie}&prix_min=5000&prix_max=50000&sort=prix'),
+    ('catalogue tri nom', None, 'produits', '?sort=nom'),
+    ('recherche', None, 'produits', '?search=cuir+été'),
+    ('promotions', None, 'promotions', ''),
+    ('panier', 'client', 'panier', ''),
+    ('mon compte', 'client', 'mon_compte', ''),
+    ('tableau de bord', 'admin', 'admin_panel:dashboard', ''),
+    ('admin produits', 'admin', 'admin_panel:produits_list', ''),
+    ('admin commandes', 'admin', 'admin_panel:commandes_list', ''),
+    ('admin promotions', 'admin', 'admin_panel:promotions_list', ''),
+]
+
+# Petites tables lues en entier volontairement
+TABLES_IGNOREES = ('bd_compteur', 'bd_categorie', 'django_content_type')
+
+_BOUCLE_SQLITE = re.compile(r'^(SCAN|SEARCH) (\w+)(.*)$')
+_SCAN_POSTGRES = re.compile(r'Seq Scan on (\w+)')
+
+
+def _scans_sqlite(lignes, sql):
+    # Un SCAN n'est accepté que s'il mène la boucle externe d'un ORDER BY ... LIMIT sans tri
+    # temporaire : il suit alors l'index (ou le rowid) qui sert le tri et s'arrête après LIMIT lignes
+    sql = sql.upper()
+    tri_par_index = (
+        ' ORDER BY ' in sql and ' LIMIT ' in sql and not any('TEMP B-TREE' in ligne for ligne in lignes)
+    )
+    boucles = [m for m in map(_BOUCLE_SQLITE.match, lignes) if m and m.group(2) != 'CONSTANT']
+    return [
+        m.group(2) for rang, m in enumerate(boucles)
+        if m.group(1) == 'SCAN' and not (rang == 0 and tri_par_index)
+    ]
+
+
+def plan_requete(sql):
+    """Retourne (lignes du plan, tables parcourues intégralement)"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            lignes = [ligne[-1] for ligne in cursor.fetchall()]
+            return lignes, _scans_sqlite(lignes, sql)
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql)
+            lignes = [ligne[0].strip() for ligne in cursor.fetchall()]
+            return lignes, [m.group(1) for ligne in lignes for m in [_SCAN_POSTGRES.search(ligne)] if m]
+    raise CommandError(f'Base {connection.vendor} non prise en charge')
+
+
+class Command(BaseCommand):
+    help = (
+        "Rejoue les vues boutique et administration sur une base de test peuplée, "
+        "capture le plan d'exécution de chaque requête et signale les parcours complets de table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produits', type=int, default=2000)
+        parser.add_argument('--commandes', type=int, default=500)
+        parser.add_argument('--ignorer', nargs='*', default=list(TABLES_IGNOREES),
+                            help='Tables dont le parcours complet est accepté')
+        parser.add_argument('--plans', action='store_true', help='Affiche le plan de chaque requête')
+        parser.add_argument('--strict', action='store_true',
+                            help='Échoue si un parcours complet est détecté')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        nom_base = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Cache local et vide : chaque vue exécute réellement ses requêtes
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+                signalements = self.analyser(options)
+        finally:
+            connection.creation.destroy_test_db(nom_base, verbosity=0)
+            teardown_test_environment()
+
+        if signalements:
+            self.stdout.write(self.style.WARNING(f'{signalements} requête(s) avec parcours complet'))
+            if options['strict']:
+                raise CommandError('Parcours complets détectés')
+        else:
+            self.stdout.write(self.style.SUCCESS('Aucun parcours complet détecté'))
+
+    def analyser(self, options):
+        donnees = peupler(nb_produits=options['produits'], nb_commandes=options['commandes'])
+        navigateurs = {None: ClientTest()}
+        for profil, utilisateur in (('client', donnees['clients'][0]), ('admin', donnees['admin'])):
+            navigateurs[profil] = ClientTest()
+            navigateurs[profil].force_login(utilisateur.user_ptr)
+
+        ignorees = set(options['ignorer'])
+        signalements = 0
+        for nom, profil, url_nom, query in SCENARIOS:
+            url = reverse(url_nom) + query.format(categorie=donnees['categories'][0].pk)
+            with CaptureQueriesContext(connection) as requetes:
+                try:
+                    statut = navigateurs[profil].get(url).status_code
+                except Exception as e:  # gabarit manquant, etc. : on analyse quand même les requêtes
+                    statut = type(e).__name__
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{nom} ({url}) -> {statut}, {len(requetes)} requête(s)'))
+
+            for requete in requetes.captured_queries:
+                sql = requete['sql']
+                if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    continue
+                lignes, scans = plan_requete(sql)
+                scans = [table for table in scans if table not in ignorees]
+                if scans:
+                    signalements += 1
+                    self.stdout.write(self.style.ERROR(f"  PARCOURS COMPLET {', '.join(scans)} : {sql[:200]}"))
+                if options['plans'] or scans:
+                    for ligne in lignes:
+                        self.stdout.write(f'    {ligne}')
+        return signalements
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from bd.images import traiter_image_produit
+from bd.models import Produit
+
+
+class Command(BaseCommand):
+    help = "Génère les vignettes (WebP, JPEG) des images produits qui n'en ont pas encore"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tous', action='store_true', help='Régénère aussi les variantes existantes')
+
+    def handle(self, *args, **options):
+        produits = Produit.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['tous']:
+            produits = produits.filter(images_variantes={})
+        traites = 0
+        for produit_id in produits.values_list('id', flat=True).iterator():
+            if traiter_image_produit(produit_id) is not None:
+                traites += 1
+        self.stdout.write(self.style.SUCCESS(f'{traites} image(s) traitée(s)'))
@@ -0,0 +1,192 @@
+import json
+import logging
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as ClientTest
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from bd.models import Panier, PanierItem, Produit
+from bd.peuplement import peupler
+from clients.panier import CLE_SESSION
+
+# (nom, profil connecté, méthode, nom d'URL, query string)
+SCENARIOS = [
+    ('accueil', None, 'get', 'home', ''),
+    ('accueil client', 'client', 'get', 'home', ''),
+    ('catalogue', None, 'get', 'produits', ''),
+    ('catalogue filtré', None, 'get', 'produits', '?categorie={categorie}&prix_min=5000&prix_max=50000&sort=prix'),
+    ('recherche', None, 'get', 'produits', '?search=cuir+été'),
+    ('panier', 'client', 'get', 'panier', ''),
+    ('passer commande', 'client', 'post', 'passer_commande', ''),
+    ('tableau de bord', 'admin', 'get', 'admin_panel:dashboard', ''),
+]
+
+LIGNES_PANIER = 10
+
+
+def percentile(valeurs, rang):
+    if len(valeurs) < 2:
+        return valeurs[0] if valeurs else 0
+    return statistics.quantiles(valeurs, n=100, method='inclusive')[rang - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Peuple une base de test, rejoue les parcours boutique, panier, commande et "
+        "tableau de bord, puis enregistre latences (p50/p95/p99), débit et requêtes SQL en JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produits', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--vendeurs', type=int, default=20)
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--commandes', type=int, default=1000)
+        parser.add_argument('--remises', type=int, default=200)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--echauffement', type=int, default=5)
+        parser.add_argument('--scenario', action='append', help='Limite la mesure à ce(s) scénario(s)')
+        parser.add_argument('--sortie', help='Fichier JSON de résultats (défaut : benchmarks/<date>.json)')
+        parser.add_argument('--comparer', help='Résultats JSON précédents à comparer')
+
+    def handle(self, *args, **options):
+        reference = None
+        if options['comparer']:
+            try:
+                reference = json.loads(Path(options['comparer']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Impossible de lire {options["comparer"]} : {e}')
+
+        # Une ligne de journal par requête mesurée noierait le tableau de résultats
+        logging.getLogger('tchokos.instrumentation').setLevel(logging.WARNING)
+        setup_test_environment()
+        nom_base = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Cache mémoire propre à la mesure : le cache partagé de l'application reste intact
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+                resultats = self.mesurer(options)
+        finally:
+            connection.creation.destroy_test_db(nom_base, verbosity=0)
+            teardown_test_environment()
+
+        sortie = Path(options['sortie'] or settings.BASE_DIR / 'benchmarks' / f'{datetime.now():%Y%m%d-%H%M%S}.json')
+        sortie.parent.mkdir(parents=True, exist_ok=True)
+        sortie.write_text(json.dumps(resultats, indent=2, ensure_ascii=False))
+
+        self.afficher(resultats, reference)
+        self.stdout.write(self.style.SUCCESS(f'Résultats enregistrés dans {sortie}'))
+
+    def mesurer(self, options):
+        volumes = {
+            'produits': options['produits'],
+            'categories': options['categories'],
+            'vendeurs': options['vendeurs'],
+            'clients': options['clients'],
+            'commandes': options['commandes'],
+            'remises': options['remises'],
+        }
+        debut = time.perf_counter()
+        donnees = peupler(
+            nb_categories=volumes['categories'], nb_vendeurs=volumes['vendeurs'],
+            nb_produits=volumes['produits'], nb_clients=volumes['clients'],
+            nb_commandes=volumes['commandes'], nb_remises=volumes['remises'],
+        )
+        self.stdout.write(f'Base peuplée en {time.perf_counter() - debut:.1f} s')
+
+        client = donnees['clients'][0]
+        navigateurs = {None: ClientTest()}
+        for profil, utilisateur in (('client', client), ('admin', donnees['admin'])):
+            navigateurs[profil] = ClientTest()
+            navigateurs[profil].force_login(utilisateur.user_ptr)
+
+        # Panier de référence sur des produits au stock inépuisable
+        panier, _ = Panier.objects.get_or_create(client=client)
+        produits_panier = [p.pk for p in donnees['produits'][:LIGNES_PANIER]]
+        Produit.objects.filter(pk__in=produits_panier).update(stock=10 ** 9)
+
+        def remplir_panier():
+            PanierItem.objects.filter(panier=panier).delete()
+            PanierItem.objects.bulk_create([
+                PanierItem(panier=panier, produit_id=pk, quantite=1) for pk in produits_panier
+            ])
+            # Le panier de session est rechargé depuis la base à la requête suivante
+            session = navigateurs['client'].session
+            session.pop(CLE_SESSION, None)
+            session.save()
+
+        resultats = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'base': connection.vendor,
+            'volumes': volumes,
+            'iterations': options['iterations'],
+            'scenarios': {},
+        }
+        for nom, profil, methode, url_nom, query in SCENARIOS:
+            if options['scenario'] and nom not in options['scenario']:
+                continue
+            url = reverse(url_nom) + query.format(categorie=donnees['categories'][0].pk)
+            navigateur = getattr(navigateurs[profil], methode)
+            avant = remplir_panier if profil == 'client' else None
+
+            durees, requetes, statut = [], [], None
+            for i in range(options['echauffement'] + options['iterations']):
+                if avant:
+                    avant()
+                with CaptureQueriesContext(connection) as capture:
+                    t0 = time.perf_counter()
+                    try:
+                        statut = navigateur(url).status_code
+                    except Exception as e:  # gabarit manquant, etc.
+                        statut = type(e).__name__
+                    duree = time.perf_counter() - t0
+                # Une page d'erreur n'est pas le parcours à mesurer : scénario ignoré
+                if not isinstance(statut, int) or statut >= 500:
+                    break
+                if i >= options['echauffement']:
+                    durees.append(duree * 1000)
+                    requetes.append(len(capture))
+
+            if not isinstance(statut, int) or statut >= 500:
+                self.stdout.write(self.style.WARNING(f'{nom} ignoré : {url} -> {statut}'))
+                resultats['scenarios'][nom] = {'url': url, 'statut': statut}
+                continue
+
+            total = sum(durees) / 1000
+            resultats['scenarios'][nom] = {
+                'url': url,
+                'statut': statut,
+                'p50_ms': round(percentile(durees, 50), 2),
+                'p95_ms': round(percentile(durees, 95), 2),
+                'p99_ms': round(percentile(durees, 99), 2),
+                'moyenne_ms': round(statistics.fmean(durees), 2),
+                'debit_rps': round(len(durees) / total, 1) if total else None,
+                'requetes_par_appel': round(statistics.fmean(requetes), 1),
+            }
+        return resultats
+
+    def afficher(self, resultats, reference=None):
+        anciens = (reference or {}).get('scenarios', {})
+        self.stdout.write(f"{'scénario':<20}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'SQL':>6}  statut")
+        for nom, mesure in resultats['scenarios'].items():
+            if 'p50_ms' not in mesure:
+                self.stdout.write(f"{nom:<20}{'-':>9}{'-':>9}{'-':>9}{'-':>9}{'-':>6}  {mesure['statut']}")
+                continue
+            ligne = (
+                f"{nom:<20}{mesure['p50_ms']:>9.1f}{mesure['p95_ms']:>9.1f}{mesure['p99_ms']:>9.1f}"
+                f"{mesure['debit_rps'] or 0:>9.1f}{mesure['requetes_par_appel']:>6.1f}  {mesure['statut']}"
+            )
+            ancien = anciens.get(nom)
+            if ancien and ancien.get('p95_ms'):
+                ecart = (mesure['p95_ms'] - ancien['p95_ms']) / ancien['p95_ms'] * 100
+                style = self.style.ERROR if ecart > 10 else self.style.SUCCESS
+                ligne += style(f'  p95 {ecart:+.0f}%')
+            self.stdout.write(ligne)
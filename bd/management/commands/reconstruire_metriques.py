@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from bd.avis import reconstruire_notes
+from bd.metriques import reconstruire_metriques
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs et cumuls quotidiens du tableau de bord, et les notes des vendeurs, depuis zéro"
+
+    def handle(self, *args, **options):
+        valeurs = reconstruire_metriques()
+        for nom, valeur in valeurs.items():
+            self.stdout.write(f'{nom} : {valeur}')
+        self.stdout.write(f'vendeurs notés : {reconstruire_notes()}')
+        self.stdout.write(self.style.SUCCESS('Métriques reconstruites'))
@@ -0,0 +1,113 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Commande, CommandeItem, Compteur, Produit, StatistiqueJour
+
+PRODUITS = 'produits'
+PRODUITS_RUPTURE = 'produits_rupture'
+PRODUITS_PROMOTION = 'produits_promotion'
+COMMANDES = 'commandes'
+REVENUS = 'revenus'
+
+COMPTEURS = (PRODUITS, PRODUITS_RUPTURE, PRODUITS_PROMOTION, COMMANDES, REVENUS)
+
+
+def incrementer(**deltas):
+    """Ajoute les deltas aux compteurs nommés, un UPDATE par compteur non nul"""
+    for nom, delta in deltas.items():
+        if not delta:
+            continue
+        if not Compteur.objects.filter(nom=nom).update(valeur=F('valeur') + delta):
+            Compteur.objects.get_or_create(nom=nom)
+            Compteur.objects.filter(nom=nom).update(valeur=F('valeur') + delta)
+
+
+def enregistrer_commande(commande, nb_articles, nouvelles_ruptures=0):
+    """Comptabilise une commande passée ; à appeler dans la transaction de la commande"""
+    incrementer(**{
+        COMMANDES: 1,
+        REVENUS: commande.montant_total,
+        PRODUITS_RUPTURE: nouvelles_ruptures,
+    })
+
+    jour = timezone.localdate()
+    mise_a_jour = {
+        'nb_commandes': F('nb_commandes') + 1,
+        'nb_articles': F('nb_articles') + nb_articles,
+        'revenus': F('revenus') + commande.montant_total,
+    }
+    if not StatistiqueJour.objects.filter(jour=jour).update(**mise_a_jour):
+        StatistiqueJour.objects.get_or_create(jour=jour)
+        StatistiqueJour.objects.filter(jour=jour).update(**mise_a_jour)
+
+
+def annuler_commandes(commande_ids):
+    """
+    Retire des compteurs et des cumuls quotidiens les commandes annulées
+    `commande_ids` ; à appeler dans la transaction de l'annulation.
+    Un UPDATE par compteur et par jour concerné.
+    """
+    par_jour = defaultdict(lambda: {'nb_commandes': 0, 'nb_articles': 0, 'revenus': Decimal('0')})
+    for date, montant in Commande.objects.filter(pk__in=commande_ids).values_list('date', 'montant_total'):
+        cumul = par_jour[timezone.localdate(date)]
+        cumul['nb_commandes'] += 1
+        cumul['revenus'] += montant
+    for date, quantite in CommandeItem.objects.filter(commande_id__in=commande_ids).values_list('commande__date', 'quantite'):
+        par_jour[timezone.localdate(date)]['nb_articles'] += quantite
+
+    incrementer(**{
+        COMMANDES: -sum(cumul['nb_commandes'] for cumul in par_jour.values()),
+        REVENUS: -sum(cumul['revenus'] for cumul in par_jour.values()),
+    })
+    for jour, cumul in par_jour.items():
+        StatistiqueJour.objects.filter(jour=jour).update(**{
+            champ: F(champ) - valeur for champ, valeur in cumul.items()
+        })
+
+
+def lire_metriques():
+    """Toutes les métriques du tableau de bord en une seule requête"""
+    valeurs = dict.fromkeys(COMPTEURS, Decimal('0'))
+    valeurs.update(Compteur.objects.values_list('nom', 'valeur'))
+    for nom in (PRODUITS, PRODUITS_RUPTURE, PRODUITS_PROMOTION, COMMANDES):
+        valeurs[nom] = int(valeurs[nom])
+    return valeurs
+
+
+def reconstruire_metriques():
+    """
+    Recalcule compteurs et cumuls quotidiens depuis les tables sources ;
+    les commandes annulées ne comptent pas, comme dans annuler_commandes.
+    """
+    commandes = Commande.objects.exclude(statut='annulee')
+    lignes = CommandeItem.objects.exclude(commande__statut='annulee')
+    with transaction.atomic():
+        revenus = lignes.aggregate(total=Sum(F('prix') * F('quantite')))['total']
+        valeurs = {
+            PRODUITS: Produit.objects.count(),
+            PRODUITS_RUPTURE: Produit.objects.filter(stock=0).count(),
+            PRODUITS_PROMOTION: Produit.objects.filter(en_promotion=True).count(),
+            COMMANDES: commandes.count(),
+            REVENUS: revenus or 0,
+        }
+        Compteur.objects.all().delete()
+        Compteur.objects.bulk_create([Compteur(nom=nom, valeur=valeur) for nom, valeur in valeurs.items()])
+
+        StatistiqueJour.objects.all().delete()
+        jours = {}
+        for commande in commandes.only('id', 'date', 'montant_total').iterator(chunk_size=2000):
+            jour = timezone.localdate(commande.date)
+            stat = jours.setdefault(jour, StatistiqueJour(jour=jour, revenus=Decimal('0')))
+            stat.nb_commandes += 1
+            stat.revenus += commande.montant_total
+        articles = (
+            lignes.values_list('commande__date', 'quantite').iterator(chunk_size=2000)
+        )
+        for date, quantite in articles:
+            jours[timezone.localdate(date)].nb_articles += quantite
+        StatistiqueJour.objects.bulk_create(jours.values(), batch_size=500)
+    return valeurs
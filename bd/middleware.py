@@ -0,0 +1,44 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .requetes import BudgetDepasse, EnregistreurRequetes
+
+logger = logging.getLogger('tchokos.requetes')
+
+
+class BudgetRequetesMiddleware:
+    """
+    Compte les requêtes SQL de chaque requête HTTP et les compare au budget
+    déclaré par @budget_requetes sur la vue ; signale aussi les formes de
+    requête répétées (boucles N+1). Avertit dans les journaux, ou lève
+    BudgetDepasse si BUDGET_REQUETES_STRICT (tests).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BUDGET_REQUETES_ACTIF', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.budget_requetes = (None, None)
+        with EnregistreurRequetes() as enregistreur:
+            response = self.get_response(request)
+        # La page d'erreur réévalue le contexte : le compte n'a plus de sens
+        if response.status_code >= 500:
+            return response
+
+        budget, seuil = request.budget_requetes
+        if budget is None:
+            budget = getattr(settings, 'BUDGET_REQUETES_DEFAUT', None)
+        messages = enregistreur.problemes(budget, seuil)
+        if messages:
+            rapport = f'{request.method} {request.path} : ' + ' ; '.join(messages)
+            if getattr(settings, 'BUDGET_REQUETES_STRICT', False):
+                raise BudgetDepasse(rapport)
+            logger.warning(rapport)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.budget_requetes = getattr(view_func, 'budget_requetes', (None, None))
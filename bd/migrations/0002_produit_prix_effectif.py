@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:30
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def remplir_prix_effectif(apps, schema_editor):
+    Produit = apps.get_model('bd', 'Produit')
+    RemiseValidee = apps.get_model('bd', 'RemiseValidee')
+
+    # Dernière remise validée par produit
+    remises = {}
+    for produit_id, pourcentage in RemiseValidee.objects.order_by('date_validation', 'id').values_list('produit_id', 'pourcentage'):
+        remises[produit_id] = pourcentage
+
+    produits = list(Produit.objects.only('id', 'prix'))
+    for produit in produits:
+        pourcentage = remises.get(produit.id, 0)
+        if 0 < pourcentage < 100:
+            # L'ancien casser_prix écrasait prix par le prix réduit : on retrouve le prix de base
+            produit.prix = (produit.prix * 100 / (100 - pourcentage)).quantize(Decimal('0.01'))
+            produit.en_promotion = True
+            produit.pourcentage_promotion = pourcentage
+            produit.prix_promotion = (produit.prix * (100 - pourcentage) / 100).quantize(Decimal('0.01'))
+            produit.prix_effectif = produit.prix_promotion
+        else:
+            produit.en_promotion = False
+            produit.pourcentage_promotion = 0
+            produit.prix_promotion = None
+            produit.prix_effectif = produit.prix
+    Produit.objects.bulk_update(
+        produits,
+        ['prix', 'en_promotion', 'pourcentage_promotion', 'prix_promotion', 'prix_effectif'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produit',
+            name='pourcentage_promotion',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='produit',
+            name='prix_effectif',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(remplir_prix_effectif, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from clients.recherche import termes_produit
+
+
+def indexer_produits_existants(apps, schema_editor):
+    # Sans index, rechercher() ne trouverait aucun produit déjà en base
+    Produit = apps.get_model('bd', 'Produit')
+    TermeProduit = apps.get_model('bd', 'TermeProduit')
+    lot = []
+    for produit in Produit.objects.only('id', 'nom', 'description').iterator(chunk_size=500):
+        lot.extend(
+            TermeProduit(terme=terme, produit_id=produit.id, poids=poids)
+            for terme, poids in termes_produit(produit).items()
+        )
+        if len(lot) >= 500:
+            TermeProduit.objects.bulk_create(lot)
+            lot = []
+    TermeProduit.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0002_produit_prix_effectif'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermeProduit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terme', models.CharField(max_length=64)),
+                ('poids', models.PositiveIntegerField(default=1)),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bd.produit')),
+            ],
+            options={
+                'unique_together': {('terme', 'produit')},
+            },
+        ),
+        migrations.RunPython(indexer_produits_existants, migrations.RunPython.noop),
+    ]
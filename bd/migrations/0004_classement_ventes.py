@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:34
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from clients.classement import FENETRES
+
+
+def cumuler_historique(apps, schema_editor):
+    # Cumuls journaliers et classements des commandes déjà passées (annulées exclues)
+    CommandeItem = apps.get_model('bd', 'CommandeItem')
+    VenteProduitJour = apps.get_model('bd', 'VenteProduitJour')
+    ClassementVente = apps.get_model('bd', 'ClassementVente')
+    Produit = apps.get_model('bd', 'Produit')
+
+    cumuls = (
+        CommandeItem.objects.exclude(commande__statut='annulee')
+        .annotate(jour=TruncDate('commande__date'))
+        .values('produit_id', 'jour')
+        .annotate(total=Sum('quantite'))
+    )
+    VenteProduitJour.objects.bulk_create([
+        VenteProduitJour(produit_id=ligne['produit_id'], jour=ligne['jour'], quantite=ligne['total'])
+        for ligne in cumuls
+    ], batch_size=500)
+
+    categories = dict(Produit.objects.values_list('id', 'categorie_id'))
+    aujourd_hui = timezone.localdate()
+    for fenetre in FENETRES:
+        totaux = (
+            VenteProduitJour.objects.filter(jour__gt=aujourd_hui - timedelta(days=fenetre))
+            .values('produit_id').annotate(total=Sum('quantite'))
+        )
+        ClassementVente.objects.bulk_create([
+            ClassementVente(
+                fenetre=fenetre, produit_id=ligne['produit_id'],
+                categorie_id=categories[ligne['produit_id']], quantite=ligne['total'],
+            )
+            for ligne in totaux if ligne['total']
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0003_termeproduit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassementVente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fenetre', models.PositiveSmallIntegerField()),
+                ('quantite', models.PositiveIntegerField()),
+                ('categorie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bd.categorie')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bd.produit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fenetre', '-quantite'], name='bd_classeme_fenetre_a07ada_idx'), models.Index(fields=['fenetre', 'categorie', '-quantite'], name='bd_classeme_fenetre_6a0de5_idx')],
+                'unique_together': {('fenetre', 'produit')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VenteProduitJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('quantite', models.PositiveIntegerField(default=0)),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bd.produit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['jour'], name='bd_ventepro_jour_f36ea0_idx')],
+                'unique_together': {('produit', 'jour')},
+            },
+        ),
+        migrations.RunPython(cumuler_historique, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def initialiser_compteurs(apps, schema_editor):
+    Produit = apps.get_model('bd', 'Produit')
+    Commande = apps.get_model('bd', 'Commande')
+    CommandeItem = apps.get_model('bd', 'CommandeItem')
+    Compteur = apps.get_model('bd', 'Compteur')
+
+    # Les commandes annulées ne comptent pas (même règle que reconstruire_metriques)
+    revenus = (
+        CommandeItem.objects.exclude(commande__statut='annulee')
+        .aggregate(total=Sum(F('prix') * F('quantite')))['total'] or 0
+    )
+    Compteur.objects.bulk_create([
+        Compteur(nom='produits', valeur=Produit.objects.count()),
+        Compteur(nom='produits_rupture', valeur=Produit.objects.filter(stock=0).count()),
+        Compteur(nom='produits_promotion', valeur=Produit.objects.filter(en_promotion=True).count()),
+        Compteur(nom='commandes', valeur=Commande.objects.exclude(statut='annulee').count()),
+        Compteur(nom='revenus', valeur=revenus),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0004_classement_ventes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Compteur',
+            fields=[
+                ('nom', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valeur', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatistiqueJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(unique=True)),
+                ('nb_commandes', models.PositiveIntegerField(default=0)),
+                ('nb_articles', models.PositiveIntegerField(default=0)),
+                ('revenus', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.RunPython(initialiser_compteurs, migrations.RunPython.noop),
+    ]
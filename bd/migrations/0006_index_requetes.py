@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0005_metriques'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['client', '-date'], name='commande_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['-date', '-id'], name='commande_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['statut', '-id'], name='produit_statut_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['statut', 'prix_effectif', 'id'], name='produit_statut_prix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['statut', 'nom', 'id'], name='produit_statut_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['categorie', 'statut', '-id'], name='produit_categorie_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('en_promotion', True), ('statut', 'disponible')), fields=['-pourcentage_promotion', '-id'], name='produit_promo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('stock', 0)), fields=['id'], name='produit_rupture_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='remisevalidee',
+            index=models.Index(fields=['produit', '-date_validation', '-id'], name='remise_produit_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0006_index_requetes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produit',
+            name='images_variantes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
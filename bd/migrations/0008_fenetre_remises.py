@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:49
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def debut_a_la_validation(apps, schema_editor):
+    # Les remises existantes sont actives depuis leur validation
+    RemiseValidee = apps.get_model('bd', 'RemiseValidee')
+    RemiseValidee.objects.update(date_debut=F('date_validation'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0007_images_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='remisevalidee',
+            name='date_debut',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='remisevalidee',
+            name='date_fin',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(debut_a_la_validation, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='remisevalidee',
+            index=models.Index(fields=['date_debut'], name='remise_debut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='remisevalidee',
+            index=models.Index(fields=['date_fin'], name='remise_fin_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0008_fenetre_remises'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoriqueStatutCommande',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancien_statut', models.CharField(choices=[('en_attente', 'En attente'), ('validee', 'Validée'), ('expediee', 'Expédiée'), ('livree', 'Livrée'), ('annulee', 'Annulée')], max_length=20)),
+                ('nouveau_statut', models.CharField(choices=[('en_attente', 'En attente'), ('validee', 'Validée'), ('expediee', 'Expédiée'), ('livree', 'Livrée'), ('annulee', 'Annulée')], max_length=20)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='livraison',
+            name='statut',
+            field=models.CharField(choices=[('en_attente', 'En attente'), ('expediee', 'Expédiée'), ('livree', 'Livrée'), ('annulee', 'Annulée')], default='en_attente', max_length=50),
+        ),
+        migrations.AlterUniqueTogether(
+            name='livraison',
+            unique_together={('commande', 'vendeur')},
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['statut', '-date', '-id'], name='commande_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='livraison',
+            index=models.Index(fields=['vendeur', 'statut'], name='livraison_vendeur_statut_idx'),
+        ),
+        migrations.AddField(
+            model_name='historiquestatutcommande',
+            name='auteur',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='historiquestatutcommande',
+            name='commande',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bd.commande'),
+        ),
+        migrations.AddIndex(
+            model_name='historiquestatutcommande',
+            index=models.Index(fields=['commande', 'date'], name='historique_commande_date_idx'),
+        ),
+    ]
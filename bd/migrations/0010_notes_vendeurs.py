@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:54
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def agreger_avis_existants(apps, schema_editor):
+    Avis = apps.get_model('bd', 'Avis')
+    Vendeur = apps.get_model('bd', 'Vendeur')
+    repartition = {}
+    for vendeur_id, note, nombre in Avis.objects.values_list('vendeur_id', 'note').annotate(n=Count('id')).order_by():
+        repartition.setdefault(vendeur_id, {})[note] = nombre
+    for vendeur_id, notes in repartition.items():
+        nb_avis = sum(notes.values())
+        somme = sum(note * nombre for note, nombre in notes.items())
+        Vendeur.objects.filter(pk=vendeur_id).update(
+            nb_avis=nb_avis,
+            somme_notes=somme,
+            note_moyenne=(Decimal(somme) / nb_avis).quantize(Decimal('0.01')),
+            **{f'notes_{note}': notes.get(note, 0) for note in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0009_livraisons'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendeur',
+            name='nb_avis',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendeur',
+            name='note_moyenne',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='vendeur',
+            name='notes_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendeur',
+            name='notes_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendeur',
+            name='notes_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendeur',
+            name='notes_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendeur',
+            name='notes_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendeur',
+            name='somme_notes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(agreger_avis_existants, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='avis',
+            index=models.Index(fields=['vendeur', '-date', '-id'], name='avis_vendeur_date_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bd', '0010_notes_vendeurs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='produit',
+            name='produit_promo_idx',
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('en_promotion', True)), fields=['statut', '-pourcentage_promotion', '-id'], name='produit_promo_idx'),
+        ),
+    ]
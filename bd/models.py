@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
@@ -37,6 +40,24 @@ class Client(User):
 
 class Vendeur(User):
     idVendeur = models.AutoField(primary_key=True)
+    # Agrégats des avis reçus, tenus à jour incrémentalement par bd.avis
+    nb_avis = models.PositiveIntegerField(default=0)
+    somme_notes = models.PositiveIntegerField(default=0)
+    note_moyenne = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    notes_1 = models.PositiveIntegerField(default=0)
+    notes_2 = models.PositiveIntegerField(default=0)
+    notes_3 = models.PositiveIntegerField(default=0)
+    notes_4 = models.PositiveIntegerField(default=0)
+    notes_5 = models.PositiveIntegerField(default=0)
+
+    @property
+    def repartition_notes(self):
+        """[(note, nombre d'avis, pourcentage)] de 5 à 1"""
+        return [
+            (note, getattr(self, f'notes_{note}'),
+             round(100 * getattr(self, f'notes_{note}') / self.nb_avis) if self.nb_avis else 0)
+            for note in range(5, 0, -1)
+        ]
    
     
 
@@ -60,13 +81,75 @@ class Produit(models.Model):
     statut = models.CharField(max_length=100, default="disponible")
     en_promotion = models.BooleanField(default=False)
     prix_promotion = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Prix dénormalisés : remise courante et prix réellement payé, pour filtrer/trier en SQL
+    pourcentage_promotion = models.PositiveIntegerField(default=0)
+    prix_effectif = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     image = models.ImageField(upload_to='produits/', null=True, blank=True)
+    # {largeur: {extension: chemin}} : vignettes générées par bd.images
+    images_variantes = models.JSONField(default=dict, blank=True)
     actif = models.BooleanField(default=True)
 
+    CHAMPS_PROMOTION = ('en_promotion', 'pourcentage_promotion', 'prix_promotion', 'prix_effectif')
+
+    class Meta:
+        indexes = [
+            # Catalogue : nouveautés / tri par défaut, tri par prix, tri par nom
+            models.Index(fields=['statut', '-id'], name='produit_statut_id_idx'),
+            models.Index(fields=['statut', 'prix_effectif', 'id'], name='produit_statut_prix_idx'),
+            models.Index(fields=['statut', 'nom', 'id'], name='produit_statut_nom_idx'),
+            models.Index(fields=['categorie', 'statut', '-id'], name='produit_categorie_statut_idx'),
+            # Promotions en cours, triées par remise. Le statut reste une colonne de l'index :
+            # SQLite n'applique pas une condition partielle `statut = 'disponible'` à `statut = ?`
+            models.Index(
+                fields=['statut', '-pourcentage_promotion', '-id'],
+                condition=models.Q(en_promotion=True),
+                name='produit_promo_idx',
+            ),
+            # Produits en rupture
+            models.Index(fields=['id'], condition=models.Q(stock=0), name='produit_rupture_idx'),
+        ]
+
     @property
     def promotion_active(self):
         return self.en_promotion and self.prix_promotion is not None
 
+    def appliquer_remise(self, pourcentage):
+        """Positionne la remise courante sans toucher au prix de base"""
+        self.pourcentage_promotion = pourcentage
+        self.en_promotion = pourcentage > 0
+        self.calculer_prix_effectif()
+
+    def retirer_remise(self):
+        self.appliquer_remise(0)
+
+    def calculer_prix_effectif(self):
+        if self.en_promotion and self.pourcentage_promotion:
+            self.prix_promotion = (
+                Decimal(self.prix) * (100 - self.pourcentage_promotion) / 100
+            ).quantize(Decimal('0.01'))
+        else:
+            self.en_promotion = False
+            self.pourcentage_promotion = 0
+            self.prix_promotion = None
+        self.prix_effectif = self.prix_promotion if self.promotion_active else self.prix
+        return self.prix_effectif
+
+    def synchroniser_remise(self):
+        """Recalcule la remise à partir de la dernière RemiseValidee active du produit"""
+        remise = RemiseValidee.actives().filter(produit=self).order_by('-date_validation', '-id').first()
+        if remise is not None:
+            self.appliquer_remise(remise.pourcentage)
+        else:
+            self.retirer_remise()
+        self.save(update_fields=self.CHAMPS_PROMOTION)
+
+    def save(self, *args, **kwargs):
+        self.calculer_prix_effectif()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(self.CHAMPS_PROMOTION)
+        super().save(*args, **kwargs)
+
 class RemiseProposee(models.Model):
     produit = models.ForeignKey(Produit, on_delete=models.CASCADE)
     vendeur = models.ForeignKey(Vendeur, on_delete=models.CASCADE)
@@ -74,10 +157,35 @@ class RemiseProposee(models.Model):
     statut = models.CharField(max_length=20, choices=[('en_attente', 'En attente'), ('valide', 'Validée'), ('rejete', 'Rejetée')], default='en_attente')
     date_proposition = models.DateTimeField(auto_now_add=True)
 
+    @property
+    def prix_propose(self):
+        return (Decimal(self.produit.prix) * (100 - self.pourcentage_propose) / 100).quantize(Decimal('0.01'))
+
 class RemiseValidee(models.Model):
     produit = models.ForeignKey(Produit, on_delete=models.CASCADE)
     pourcentage = models.PositiveIntegerField()
     date_validation = models.DateTimeField(auto_now_add=True)
+    # Fenêtre de validité ; sans date de fin, la remise reste active jusqu'à annulation
+    date_debut = models.DateTimeField(default=timezone.now)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Dernière remise d'un produit (Produit.synchroniser_remise)
+            models.Index(fields=['produit', '-date_validation', '-id'], name='remise_produit_date_idx'),
+            # Échéances du calendrier des promotions
+            models.Index(fields=['date_debut'], name='remise_debut_idx'),
+            models.Index(fields=['date_fin'], name='remise_fin_idx'),
+        ]
+
+    @classmethod
+    def actives(cls, maintenant=None):
+        """Remises dont la fenêtre contient `maintenant`"""
+        maintenant = maintenant or timezone.now()
+        return cls.objects.filter(
+            models.Q(date_fin__isnull=True) | models.Q(date_fin__gt=maintenant),
+            date_debut__lte=maintenant,
+        )
 
 class Panier(models.Model):
     client = models.OneToOneField(Client, on_delete=models.CASCADE)
@@ -100,6 +208,15 @@ class Commande(models.Model):
     statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default="en_attente")
     montant_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    class Meta:
+        indexes = [
+            # Historique d'un client (mon_compte) et liste admin paginée par date
+            models.Index(fields=['client', '-date'], name='commande_client_date_idx'),
+            models.Index(fields=['-date', '-id'], name='commande_date_id_idx'),
+            # Liste admin filtrée par statut et transitions groupées d'un statut à l'autre
+            models.Index(fields=['statut', '-date', '-id'], name='commande_statut_date_idx'),
+        ]
+
     def calculer_montant_total(self):
         total = sum(item.prix * item.quantite for item in self.commandeitem_set.all())
         self.montant_total = total
@@ -113,10 +230,36 @@ class CommandeItem(models.Model):
     prix = models.DecimalField(max_digits=10, decimal_places=2)
 
 class Livraison(models.Model):
+    """Part d'une commande expédiée par un vendeur, créée à la validation de la commande"""
     commande = models.ForeignKey(Commande, on_delete=models.CASCADE)
     vendeur = models.ForeignKey(Vendeur, on_delete=models.CASCADE)
-    statut = models.CharField(max_length=50, default="en_attente")
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('expediee', 'Expédiée'),
+        ('livree', 'Livrée'),
+        ('annulee', 'Annulée'),
+    ]
+    statut = models.CharField(max_length=50, choices=STATUT_CHOICES, default="en_attente")
     date_livraison = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('commande', 'vendeur')
+        indexes = [
+            # Livraisons à préparer d'un vendeur
+            models.Index(fields=['vendeur', 'statut'], name='livraison_vendeur_statut_idx'),
+        ]
+
+class HistoriqueStatutCommande(models.Model):
+    """Journal des changements de statut des commandes"""
+    commande = models.ForeignKey(Commande, on_delete=models.CASCADE)
+    ancien_statut = models.CharField(max_length=20, choices=Commande.STATUT_CHOICES)
+    nouveau_statut = models.CharField(max_length=20, choices=Commande.STATUT_CHOICES)
+    auteur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['commande', 'date'], name='historique_commande_date_idx')]
+
 class Avis(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
     vendeur = models.ForeignKey(Vendeur, on_delete=models.CASCADE)
@@ -126,5 +269,54 @@ class Avis(models.Model):
 
     class Meta:
         unique_together = ('client', 'vendeur')  # Un seul avis par client/vendeur
+        indexes = [
+            # Derniers avis d'un vendeur
+            models.Index(fields=['vendeur', '-date', '-id'], name='avis_vendeur_date_idx'),
+        ]
 
    
+
+class TermeProduit(models.Model):
+    """Index inversé de la recherche catalogue : un terme normalisé par produit"""
+    terme = models.CharField(max_length=64)
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE)
+    poids = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('terme', 'produit')
+
+class VenteProduitJour(models.Model):
+    """Quantités vendues par produit et par jour, alimentées à chaque commande"""
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE)
+    jour = models.DateField()
+    quantite = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('produit', 'jour')
+        indexes = [models.Index(fields=['jour'])]
+
+class ClassementVente(models.Model):
+    """Classement matérialisé des meilleures ventes sur une fenêtre glissante (en jours)"""
+    fenetre = models.PositiveSmallIntegerField()
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE)
+    categorie = models.ForeignKey(Categorie, on_delete=models.CASCADE)
+    quantite = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('fenetre', 'produit')
+        indexes = [
+            models.Index(fields=['fenetre', '-quantite']),
+            models.Index(fields=['fenetre', 'categorie', '-quantite']),
+        ]
+
+class Compteur(models.Model):
+    """Métrique globale du tableau de bord, maintenue incrémentalement"""
+    nom = models.CharField(max_length=50, primary_key=True)
+    valeur = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+class StatistiqueJour(models.Model):
+    """Cumul quotidien des commandes passées"""
+    jour = models.DateField(unique=True)
+    nb_commandes = models.PositiveIntegerField(default=0)
+    nb_articles = models.PositiveIntegerField(default=0)
+    revenus = models.DecimalField(max_digits=14, decimal_places=2, default=0)
@@ -0,0 +1,165 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+from functools import reduce
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Durée de vie des comptes approximatifs mis en cache (secondes)
+DUREE_COMPTE = 300
+
+
+class _EncodeurCurseur(DjangoJSONEncoder):
+    # DjangoJSONEncoder tronque les microsecondes, ce qui casserait l'égalité sur la clé
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def empreinte_ordre(ordre):
+    """Empreinte courte de l'ordre de tri, embarquée dans le curseur"""
+    return hashlib.md5(','.join(ordre).encode()).hexdigest()[:8]
+
+
+def encoder_curseur(valeurs, sens, ordre=()):
+    brut = json.dumps(
+        {'v': valeurs, 's': sens, 'o': empreinte_ordre(ordre)}, cls=_EncodeurCurseur, separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur, ordre=()):
+    """
+    Retourne (valeurs, sens) ou None si le curseur est absent, illisible ou
+    produit pour un autre ordre de tri (changement de tri en cours de navigation).
+    """
+    if not curseur:
+        return None
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        donnees = json.loads(brut)
+        valeurs, sens = list(donnees['v']), donnees['s']
+        if donnees.get('o') != empreinte_ordre(ordre) or len(valeurs) != len(ordre):
+            return None
+        return valeurs, sens
+    except (binascii.Error, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def compte_approximatif(queryset):
+    """COUNT(*) mis en cache quelques minutes : suffisant pour un « ~N résultats »"""
+    cle = 'compte:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+    return cache.get_or_set(cle, queryset.count, DUREE_COMPTE)
+
+
+class PageCurseur:
+    """Page produite par KeysetPaginator, itérable comme une page de Paginator"""
+
+    def __init__(self, object_list, paginator, curseur_suivant, curseur_precedent):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.curseur_suivant = curseur_suivant
+        self.curseur_precedent = curseur_precedent
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.curseur_suivant is not None
+
+    def has_previous(self):
+        return self.curseur_precedent is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur sur un ordre stable, par exemple ('-prix_effectif', '-id').
+    Le dernier champ de l'ordre doit être unique pour départager les égalités.
+    Chaque page coûte une requête indexée « WHERE (clé, id) > curseur LIMIT n+1 »,
+    sans COUNT ni OFFSET ; le compte total n'est calculé que si approx_count=True.
+    """
+
+    def __init__(self, queryset, per_page, ordre=('-id',), approx_count=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordre = tuple(ordre)
+        self.approx_count = approx_count
+
+    @cached_property
+    def count(self):
+        if not self.approx_count:
+            return None
+        return compte_approximatif(self.queryset.order_by())
+
+    @staticmethod
+    def _champ(terme):
+        return terme.lstrip('-')
+
+    def _valeurs(self, obj):
+        # Un terme peut traverser une relation chargée (ex. vendeur__note_moyenne)
+        return [reduce(getattr, self._champ(terme).split('__'), obj) for terme in self.ordre]
+
+    def _apres(self, valeurs, inverse=False):
+        """Condition « strictement après `valeurs` » dans l'ordre (ou l'ordre inverse)"""
+        condition = Q()
+        for i, terme in enumerate(self.ordre):
+            decroissant = terme.startswith('-') != inverse
+            lookup = '__lt' if decroissant else '__gt'
+            etape = Q(**{self._champ(t) + '__exact': valeurs[j] for j, t in enumerate(self.ordre[:i])})
+            etape &= Q(**{self._champ(terme) + lookup: valeurs[i]})
+            condition |= etape
+        return condition
+
+    def _curseur(self, obj, sens):
+        return encoder_curseur(self._valeurs(obj), sens, self.ordre)
+
+    def _inverser(self, terme):
+        return terme[1:] if terme.startswith('-') else '-' + terme
+
+    def page(self, curseur=None):
+        decode = decoder_curseur(curseur, self.ordre)
+        if decode is not None:
+            try:
+                apres = self.queryset.filter(self._apres(decode[0], inverse=decode[1] == 'precedent'))
+            except (ValidationError, ValueError, TypeError):
+                # Valeurs incompatibles avec les champs (curseur altéré) : retour à la première page
+                decode = None
+
+        if decode is None or decode[1] != 'precedent':
+            queryset = (self.queryset if decode is None else apres).order_by(*self.ordre)
+            objets = list(queryset[:self.per_page + 1])
+            suite = len(objets) > self.per_page
+            objets = objets[:self.per_page]
+            suivant = self._curseur(objets[-1], 'suivant') if suite else None
+            precedent = self._curseur(objets[0], 'precedent') if decode is not None and objets else None
+        else:
+            queryset = apres.order_by(*[self._inverser(terme) for terme in self.ordre])
+            objets = list(queryset[:self.per_page + 1])
+            suite = len(objets) > self.per_page
+            objets = objets[:self.per_page][::-1]
+            precedent = self._curseur(objets[0], 'precedent') if suite else None
+            suivant = self._curseur(objets[-1], 'suivant') if objets else None
+
+        return PageCurseur(objets, self, suivant, precedent)
+
+
+def paginer(request, queryset, per_page, ordre=('-id',), approx_count=False):
+    """Page courante d'après le paramètre GET « curseur »"""
+    paginator = KeysetPaginator(queryset, per_page, ordre, approx_count=approx_count)
+    return paginator.page(request.GET.get('curseur'))
@@ -0,0 +1,105 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import (
+    Categorie, Client, Commande, CommandeItem, Produit, RemiseValidee, Vendeur, administrator,
+)
+
+MOT_DE_PASSE = 'Tchokos2025'
+
+MOTS = [
+    'basket', 'sandale', 'escarpin', 'mocassin', 'botte', 'chaussure', 'cuir', 'toile',
+    'été', 'hiver', 'légère', 'élégante', 'sport', 'ville', 'enfant', 'femme', 'homme',
+    'noir', 'blanc', 'rouge', 'confort', 'randonnée', 'soirée', 'plage',
+]
+
+
+def peupler(nb_categories=5, nb_vendeurs=5, nb_produits=200, nb_clients=20, nb_commandes=100,
+            nb_remises=20, lignes_par_commande=3, graine=0):
+    """
+    Remplit la base avec un jeu de données reproductible (même `graine`, mêmes
+    données) puis reconstruit les tables dérivées : index de recherche,
+    classement des ventes et métriques. Retourne les objets utiles aux scénarios.
+    """
+    # Imports tardifs : ces modules dépendent de l'app clients
+    from clients.classement import reconstruire_ventes
+    from clients.recherche import reindexer_tout
+    from .metriques import reconstruire_metriques
+
+    alea = random.Random(graine)
+    mot_de_passe = make_password(MOT_DE_PASSE)
+
+    with transaction.atomic():
+        categories = Categorie.objects.bulk_create([
+            Categorie(nom=f'Catégorie {i}') for i in range(nb_categories)
+        ])
+
+        # Héritage multi-tables : pas de bulk_create possible pour les utilisateurs
+        admin = administrator.objects.create(
+            username='admin_peuplement', email='admin@peuplement.cm', role='A', password=mot_de_passe,
+        )
+        vendeurs = [
+            Vendeur.objects.create(
+                username=f'vendeur{i}', email=f'vendeur{i}@peuplement.cm', role='V',
+                nom=f'Vendeur{i}', prenom='Test', password=mot_de_passe,
+            )
+            for i in range(nb_vendeurs)
+        ]
+        clients = [
+            Client.objects.create(
+                username=f'client{i}', email=f'client{i}@peuplement.cm', role='C',
+                nom=f'Client{i}', prenom='Test', password=mot_de_passe,
+            )
+            for i in range(nb_clients)
+        ]
+
+        produits = []
+        for i in range(nb_produits):
+            produit = Produit(
+                nom=' '.join(alea.sample(MOTS, 3)).capitalize(),
+                description=' '.join(alea.choices(MOTS, k=12)),
+                prix=Decimal(alea.randrange(1000, 100000, 500)),
+                stock=alea.choice([0, 2, 10, 50, 500]),
+                categorie=alea.choice(categories),
+                vendeur=alea.choice(vendeurs),
+            )
+            produit.calculer_prix_effectif()
+            produits.append(produit)
+        Produit.objects.bulk_create(produits, batch_size=500)
+
+        remises = []
+        for produit in alea.sample(produits, min(nb_remises, len(produits))):
+            pourcentage = alea.choice([10, 15, 20, 30, 50])
+            produit.appliquer_remise(pourcentage)
+            remises.append(RemiseValidee(produit=produit, pourcentage=pourcentage))
+        RemiseValidee.objects.bulk_create(remises, batch_size=500)
+        Produit.objects.bulk_update([r.produit for r in remises], Produit.CHAMPS_PROMOTION, batch_size=500)
+
+        commandes = Commande.objects.bulk_create([
+            Commande(client=alea.choice(clients)) for _ in range(nb_commandes)
+        ], batch_size=500) if clients else []
+        lignes = []
+        for commande in commandes:
+            total = Decimal('0')
+            for produit in alea.sample(produits, min(lignes_par_commande, len(produits))):
+                quantite = alea.randint(1, 3)
+                lignes.append(CommandeItem(commande=commande, produit=produit, quantite=quantite, prix=produit.prix_effectif))
+                total += produit.prix_effectif * quantite
+            commande.montant_total = total
+        CommandeItem.objects.bulk_create(lignes, batch_size=500)
+        Commande.objects.bulk_update(commandes, ['montant_total'], batch_size=500)
+
+    reindexer_tout()
+    reconstruire_ventes()
+    reconstruire_metriques()
+
+    return {
+        'admin': admin,
+        'vendeurs': vendeurs,
+        'clients': clients,
+        'categories': categories,
+        'produits': produits,
+    }
@@ -0,0 +1,92 @@
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+SEUIL_N_PLUS_UN = 5
+
+_CHAINE = re.compile(r"'(?:[^']|'')*'")
+_NOMBRE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTE_IN = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_ESPACES = re.compile(r'\s+')
+
+
+class BudgetDepasse(AssertionError):
+    """Nombre de requêtes supérieur au budget, ou boucle N+1 détectée"""
+
+
+def forme_requete(sql):
+    """SQL sans ses valeurs : deux requêtes de même forme ne diffèrent que par leurs paramètres"""
+    sql = _CHAINE.sub('?', sql)
+    sql = _NOMBRE.sub('?', sql)
+    sql = _LISTE_IN.sub('IN (...)', sql)
+    return _ESPACES.sub(' ', sql).strip()
+
+
+class EnregistreurRequetes:
+    """Enregistre chaque requête SQL exécutée, sur toutes les connexions, le temps d'un bloc `with`"""
+
+    def __init__(self):
+        self.requetes = []
+        self._pile = None
+
+    def __enter__(self):
+        self._pile = ExitStack()
+        for connexion in connections.all():
+            self._pile.enter_context(connexion.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc):
+        self._pile.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.requetes.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.requetes)
+
+    def repetitions(self, seuil=None):
+        """Formes de requête exécutées au moins `seuil` fois : [(forme, nombre)], la plus fréquente d'abord"""
+        seuil = seuil or getattr(settings, 'BUDGET_REQUETES_SEUIL_N_PLUS_UN', SEUIL_N_PLUS_UN)
+        formes = Counter(forme_requete(sql) for sql in self.requetes)
+        return [(forme, nombre) for forme, nombre in formes.most_common() if nombre >= seuil]
+
+    def problemes(self, budget=None, seuil=None):
+        """Liste des messages : dépassement de budget puis répétitions suspectes"""
+        messages = []
+        if budget is not None and len(self) > budget:
+            messages.append(f'{len(self)} requêtes pour un budget de {budget}')
+        for forme, nombre in self.repetitions(seuil):
+            messages.append(f'N+1 probable, {nombre} × {forme[:300]}')
+        return messages
+
+
+def budget_requetes(maximum, seuil_n_plus_un=None):
+    """
+    Déclare le nombre maximal de requêtes SQL d'une vue ; contrôlé par
+    BudgetRequetesMiddleware. L'attribut est conservé par les décorateurs
+    qui utilisent functools.wraps (login_required, require_http_methods...).
+    """
+    def decorateur(vue):
+        vue.budget_requetes = (maximum, seuil_n_plus_un)
+        return vue
+    return decorateur
+
+
+@contextmanager
+def verifier_requetes(budget=None, seuil_n_plus_un=None):
+    """
+    Aide pour les tests : lève BudgetDepasse si le bloc dépasse `budget`
+    requêtes ou répète une même forme de requête `seuil_n_plus_un` fois.
+
+        with verifier_requetes(budget=6):
+            self.client.get(reverse('panier'))
+    """
+    with EnregistreurRequetes() as enregistreur:
+        yield enregistreur
+    messages = enregistreur.problemes(budget, seuil_n_plus_un)
+    if messages:
+        raise BudgetDepasse('\n'.join(messages))
@@ -0,0 +1,99 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import metriques
+from .avis import ajuster_notes
+from .cache import invalider_catalogue
+from .images import planifier_variantes
+from .models import Avis, Categorie, Produit, RemiseValidee
+
+
+def _invalider_catalogue(sender, **kwargs):
+    invalider_catalogue()
+
+
+for modele in (Produit, Categorie, RemiseValidee):
+    post_save.connect(_invalider_catalogue, sender=modele, dispatch_uid=f'catalogue_save_{modele.__name__}')
+    post_delete.connect(_invalider_catalogue, sender=modele, dispatch_uid=f'catalogue_delete_{modele.__name__}')
+
+
+def _etat_metriques(stock, en_promotion):
+    return {
+        metriques.PRODUITS_RUPTURE: int(stock == 0),
+        metriques.PRODUITS_PROMOTION: int(bool(en_promotion)),
+    }
+
+
+def _memoriser_etat_produit(sender, instance, update_fields=None, **kwargs):
+    # État avant sauvegarde, pour ne compter que les transitions (rupture, promotion)
+    instance._etat_metriques = None
+    if instance.pk is None or instance._state.adding:
+        return
+    if update_fields is not None and not {'stock', 'en_promotion'} & set(update_fields):
+        return
+    ancien = Produit.objects.filter(pk=instance.pk).values_list('stock', 'en_promotion').first()
+    if ancien is not None:
+        instance._etat_metriques = _etat_metriques(*ancien)
+
+
+def _compter_produit_enregistre(sender, instance, created, update_fields=None, **kwargs):
+    nouveau = _etat_metriques(instance.stock, instance.en_promotion)
+    if created:
+        metriques.incrementer(**{metriques.PRODUITS: 1}, **nouveau)
+        return
+    ancien = getattr(instance, '_etat_metriques', None)
+    if ancien is not None:
+        metriques.incrementer(**{nom: nouveau[nom] - ancien[nom] for nom in nouveau})
+
+
+def _compter_produit_supprime(sender, instance, **kwargs):
+    etat = _etat_metriques(instance.stock, instance.en_promotion)
+    metriques.incrementer(**{metriques.PRODUITS: -1}, **{nom: -valeur for nom, valeur in etat.items()})
+
+
+pre_save.connect(_memoriser_etat_produit, sender=Produit, dispatch_uid='metriques_produit_pre_save')
+post_save.connect(_compter_produit_enregistre, sender=Produit, dispatch_uid='metriques_produit_save')
+post_delete.connect(_compter_produit_supprime, sender=Produit, dispatch_uid='metriques_produit_delete')
+
+
+def _detecter_nouvelle_image(sender, instance, **kwargs):
+    # Fichier assigné mais pas encore écrit : nouvel envoi, anciennes variantes caduques
+    instance._image_envoyee = bool(instance.image) and not instance.image._committed
+    if instance._image_envoyee:
+        instance.images_variantes = {}
+
+
+def _generer_variantes(sender, instance, **kwargs):
+    if getattr(instance, '_image_envoyee', False):
+        instance._image_envoyee = False
+        planifier_variantes(instance.pk)
+
+
+pre_save.connect(_detecter_nouvelle_image, sender=Produit, dispatch_uid='images_produit_pre_save')
+post_save.connect(_generer_variantes, sender=Produit, dispatch_uid='images_produit_save')
+
+
+def _memoriser_avis(sender, instance, **kwargs):
+    # (vendeur, note) avant modification, pour n'appliquer que la différence
+    instance._note_avant = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._note_avant = Avis.objects.filter(pk=instance.pk).values_list('vendeur_id', 'note').first()
+
+
+def _noter_avis_enregistre(sender, instance, **kwargs):
+    ancienne = None
+    avant = getattr(instance, '_note_avant', None)
+    if avant is not None:
+        if avant[0] == instance.vendeur_id:
+            ancienne = avant[1]
+        else:
+            ajuster_notes(avant[0], ancienne=avant[1])
+    ajuster_notes(instance.vendeur_id, ancienne=ancienne, nouvelle=instance.note)
+
+
+def _noter_avis_supprime(sender, instance, **kwargs):
+    ajuster_notes(instance.vendeur_id, ancienne=instance.note)
+
+
+pre_save.connect(_memoriser_avis, sender=Avis, dispatch_uid='notes_avis_pre_save')
+post_save.connect(_noter_avis_enregistre, sender=Avis, dispatch_uid='notes_avis_save')
+post_delete.connect(_noter_avis_supprime, sender=Avis, dispatch_uid='notes_avis_delete')
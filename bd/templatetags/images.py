@@ -0,0 +1,43 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+register = template.Library()
+
+IMAGE_DEFAUT = 'images/products/default.jpg'
+
+# Largeur affichée des cartes produit selon la grille Bootstrap (col-md-6, col-lg-4)
+TAILLES_DEFAUT = '(max-width: 767px) 100vw, (max-width: 991px) 50vw, 33vw'
+
+
+def _srcset(variantes, extension):
+    return ', '.join(
+        f'{default_storage.url(formats[extension])} {largeur}w'
+        for largeur, formats in sorted(variantes.items(), key=lambda item: int(item[0]))
+        if extension in formats
+    )
+
+
+@register.simple_tag
+def image_produit(produit, classe='card-img-top', sizes=TAILLES_DEFAUT):
+    """
+    <picture> de l'image produit : vignettes WebP et JPEG en srcset, le
+    navigateur choisit la variante adaptée à `sizes`. Sans variantes (pas
+    encore générées), l'original ; sans image, l'illustration par défaut.
+    """
+    variantes = produit.images_variantes if produit.image else None
+    if not variantes:
+        src = produit.image.url if produit.image else static(IMAGE_DEFAUT)
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', src, classe, produit.nom)
+
+    plus_petite = min(variantes, key=int)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" alt="{}" loading="lazy">'
+        '</picture>',
+        _srcset(variantes, 'webp'), sizes,
+        default_storage.url(variantes[plus_petite]['jpg']), _srcset(variantes, 'jpg'), sizes,
+        plus_petite, plus_petite, classe, produit.nom,
+    )
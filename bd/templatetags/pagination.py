@@ -0,0 +1,18 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def url_curseur(context, curseur):
+    """
+    Query string courante avec le curseur remplacé (les filtres sont
+    conservés) ; sans curseur, lien vers la première page.
+    """
+    params = context['request'].GET.copy()
+    params.pop('page', None)
+    if curseur:
+        params['curseur'] = curseur
+    else:
+        params.pop('curseur', None)
+    return '?' + params.urlencode()
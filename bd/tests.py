@@ -1,3 +1,389 @@
-from django.test import TestCase
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .avis import NOTES, reconstruire_notes
+from .images import DOSSIER_VARIANTES
+from .instrumentation import VUE_NON_RESOLUE, exporter_prometheus, registre
+from .management.commands import mesurer_performances
+from .management.commands.analyser_requetes import _scans_sqlite, plan_requete
+from .models import Avis, Categorie, Client, Produit, RemiseValidee, Vendeur
+from .pagination import KeysetPaginator, encoder_curseur
+from .templatetags.images import image_produit
+
+CHAMPS_NOTES = ('nb_avis', 'somme_notes', 'note_moyenne', *(f'notes_{note}' for note in NOTES))
+
+
+class PrixEffectifTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.produit = Produit.objects.create(
+            nom='Basket', description='Chaussure', prix=Decimal(1000), stock=1,
+            categorie=Categorie.objects.create(nom='Chaussures'),
+            vendeur=Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V'),
+        )
+
+    def en_base(self):
+        return Produit.objects.values_list(*Produit.CHAMPS_PROMOTION).get(pk=self.produit.pk)
+
+    def test_remise_sans_toucher_au_prix_de_base(self):
+        self.assertEqual(self.en_base(), (False, 0, None, Decimal('1000.00')))
+        self.produit.appliquer_remise(15)
+        self.produit.save()
+        self.assertEqual(self.en_base(), (True, 15, Decimal('850.00'), Decimal('850.00')))
+        self.assertEqual(Produit.objects.get(pk=self.produit.pk).prix, Decimal('1000.00'))
+        self.produit.retirer_remise()
+        self.produit.save()
+        self.assertEqual(self.en_base(), (False, 0, None, Decimal('1000.00')))
+
+    def test_changement_de_prix_avec_update_fields(self):
+        self.produit.appliquer_remise(50)
+        self.produit.save()
+        self.produit.prix = Decimal(3000)
+        self.produit.save(update_fields=['prix'])
+        self.assertEqual(self.en_base(), (True, 50, Decimal('1500.00'), Decimal('1500.00')))
+
+    def test_synchronisation_sur_la_derniere_remise_active(self):
+        maintenant = timezone.now()
+        RemiseValidee.objects.create(produit=self.produit, pourcentage=10)
+        derniere = RemiseValidee.objects.create(produit=self.produit, pourcentage=30)
+        # Fenêtres future et expirée : ignorées
+        RemiseValidee.objects.create(produit=self.produit, pourcentage=60, date_debut=maintenant + timedelta(days=1))
+        RemiseValidee.objects.create(produit=self.produit, pourcentage=70, date_fin=maintenant - timedelta(seconds=1),
+                                     date_debut=maintenant - timedelta(days=2))
+        self.produit.synchroniser_remise()
+        self.assertEqual(self.en_base(), (True, 30, Decimal('700.00'), Decimal('700.00')))
+        derniere.delete()
+        self.produit.synchroniser_remise()
+        self.assertEqual(self.en_base()[1], 10)
+        RemiseValidee.objects.all().delete()
+        self.produit.synchroniser_remise()
+        self.assertEqual(self.en_base(), (False, 0, None, Decimal('1000.00')))
+
+
+class NotesVendeurTests(TestCase):
+    """Les agrégats tenus par les signaux d'Avis sont ceux que reconstruire_notes recalcule"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeurs = [
+            Vendeur.objects.create(username=f'vendeur{i}', email=f'vendeur{i}@tokos.cm', role='V') for i in range(2)
+        ]
+        cls.clients = [
+            Client.objects.create(username=f'client{i}', email=f'client{i}@tokos.cm', role='C') for i in range(3)
+        ]
+
+    def agregats(self):
+        return list(Vendeur.objects.order_by('pk').values_list(*CHAMPS_NOTES))
+
+    def assertAgregatsReconstruits(self):
+        incrementaux = self.agregats()
+        reconstruire_notes()
+        self.assertEqual(incrementaux, self.agregats())
+
+    def test_ajout(self):
+        for client, note in zip(self.clients, (5, 4, 4)):
+            Avis.objects.create(client=client, vendeur=self.vendeurs[0], note=note)
+        self.assertEqual(self.agregats()[0][:3], (3, 13, Decimal('4.33')))
+        self.assertAgregatsReconstruits()
+
+    def test_modification(self):
+        avis = Avis.objects.create(client=self.clients[0], vendeur=self.vendeurs[0], note=2)
+        Avis.objects.create(client=self.clients[1], vendeur=self.vendeurs[0], note=5)
+        avis.note = 4
+        avis.save()
+        # Même note : aucun changement
+        avis.save()
+        self.assertEqual(self.agregats()[0][:3], (2, 9, Decimal('4.5')))
+        self.assertAgregatsReconstruits()
+
+    def test_changement_de_vendeur(self):
+        avis = Avis.objects.create(client=self.clients[0], vendeur=self.vendeurs[0], note=3)
+        Avis.objects.create(client=self.clients[1], vendeur=self.vendeurs[0], note=5)
+        avis.vendeur = self.vendeurs[1]
+        avis.note = 1
+        avis.save()
+        self.assertEqual([ligne[:3] for ligne in self.agregats()], [(1, 5, 5), (1, 1, 1)])
+        self.assertAgregatsReconstruits()
+
+    def test_suppression(self):
+        avis = [
+            Avis.objects.create(client=client, vendeur=self.vendeurs[0], note=note)
+            for client, note in zip(self.clients, (1, 2, 5))
+        ]
+        avis[0].delete()
+        self.assertEqual(self.agregats()[0][:3], (2, 7, Decimal('3.5')))
+        self.assertAgregatsReconstruits()
+        # Dernier avis supprimé : moyenne remise à zéro
+        for restant in avis[1:]:
+            restant.delete()
+        self.assertEqual(self.agregats()[0][:3], (0, 0, 0))
+        self.assertAgregatsReconstruits()
+
+
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categorie = Categorie.objects.create(nom='Chaussures')
+        vendeur = Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V')
+        # Prix répétés : l'id départage les égalités
+        for i in range(23):
+            Produit.objects.create(
+                nom=f'Basket {i}', description='Chaussure', prix=Decimal(1000 * (i % 4 + 1)), stock=1,
+                categorie=categorie, vendeur=vendeur,
+            )
+
+    def parcourir(self, paginator):
+        """Toutes les pages dans le sens suivant, puis dans le sens précédent depuis la dernière"""
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].curseur_suivant))
+        retour = [pages[-1]]
+        while retour[-1].has_previous():
+            retour.append(paginator.page(retour[-1].curseur_precedent))
+        return pages, retour[::-1]
+
+    def test_parcours_complet_dans_les_deux_sens(self):
+        for ordre in (('prix_effectif', 'id'), ('-prix_effectif', '-id'), ('-id',)):
+            paginator = KeysetPaginator(Produit.objects.all(), 5, ordre)
+            pages, retour = self.parcourir(paginator)
+            attendu = list(Produit.objects.order_by(*ordre).values_list('id', flat=True))
+            self.assertEqual([produit.id for page in pages for produit in page], attendu)
+            self.assertEqual([[produit.id for produit in page] for page in retour],
+                             [[produit.id for produit in page] for page in pages])
+            self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+
+    def test_curseur_d_un_autre_tri_ou_altere(self):
+        paginator = KeysetPaginator(Produit.objects.all(), 5, ('prix_effectif', 'id'))
+        premiere = [produit.id for produit in paginator.page()]
+        autre_tri = KeysetPaginator(Produit.objects.all(), 5, ('-id',)).page().curseur_suivant
+        for curseur in (autre_tri, 'pas-un-curseur', encoder_curseur(['abc', 'x'], 'suivant', paginator.ordre)):
+            self.assertEqual([produit.id for produit in paginator.page(curseur)], premiere)
+
+
+class AnalyseRequetesTests(TestCase):
+
+    def test_scan_accepte_seulement_s_il_sert_le_tri(self):
+        trie = 'SELECT * FROM "bd_produit" ORDER BY "bd_produit"."id" DESC LIMIT 13'
+        self.assertEqual(_scans_sqlite(['SCAN bd_produit'], trie), [])
+        # Sans ORDER BY, rien ne garantit l'arrêt précoce ; en boucle interne, la table est relue à chaque ligne
+        self.assertEqual(_scans_sqlite(['SCAN bd_produit'], 'SELECT * FROM "bd_produit" WHERE "stock" > 3 LIMIT 1'),
+                         ['bd_produit'])
+        self.assertEqual(
+            _scans_sqlite(['SCAN bd_produit', 'SCAN bd_categorie'], trie.replace(' ORDER', ', "bd_categorie" ORDER')),
+            ['bd_categorie'],
+        )
+        self.assertEqual(_scans_sqlite(['SCAN bd_produit', 'USE TEMP B-TREE FOR ORDER BY'], trie), ['bd_produit'])
+        self.assertEqual(_scans_sqlite(['SCAN bd_produit USING INDEX produit_statut_nom_idx'], trie), [])
+        self.assertEqual(_scans_sqlite(['SCAN bd_produit USING COVERING INDEX produit_statut_nom_idx'],
+                                       'SELECT COUNT(*) FROM "bd_produit"'), ['bd_produit'])
+
+    def test_promotions_par_index_partiel(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan SQLite')
+        produits = Produit.objects.filter(statut='disponible', en_promotion=True).select_related('categorie', 'vendeur')
+        with CaptureQueriesContext(connection) as requetes:
+            page = KeysetPaginator(produits, 12, ('-pourcentage_promotion', '-id')).page()
+            list(page)
+        lignes, scans = plan_requete(requetes.captured_queries[0]['sql'])
+        self.assertEqual(scans, [])
+        self.assertIn('SEARCH bd_produit USING INDEX produit_promo_idx (statut=?)', lignes)
+        self.assertFalse(any('TEMP B-TREE' in ligne for ligne in lignes))
+
+
+class ProfilsBaseTests(TestCase):
+    """Profil de base de données choisi par l'environnement (tchokos/settings.py)"""
+
+    def charger(self, **environ):
+        module = importlib.import_module(settings.SETTINGS_MODULE)
+        environ_propre = {nom: valeur for nom, valeur in os.environ.items() if not nom.startswith('TCHOKOS_DB')}
+        with mock.patch.dict(os.environ, {**environ_propre, **environ}, clear=True):
+            spec = importlib.util.spec_from_file_location('profil_settings', module.__file__)
+            profil = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(profil)
+        return profil.DATABASES['default']
+
+    def test_sqlite_par_defaut(self):
+        base = self.charger()
+        self.assertEqual(base['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(base['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertNotIn('journal_mode', base['OPTIONS']['init_command'])
+        wal = self.charger(TCHOKOS_DB_WAL='oui')
+        self.assertTrue(wal['OPTIONS']['init_command'].startswith('PRAGMA journal_mode=WAL;'))
+
+    def test_postgresql(self):
+        base = self.charger(TCHOKOS_DB='postgresql', TCHOKOS_DB_NAME='boutique')
+        self.assertEqual(
+            (base['ENGINE'], base['NAME'], base['CONN_MAX_AGE']), ('django.db.backends.postgresql', 'boutique', 60),
+        )
+        self.assertNotIn('pool', base['OPTIONS'])
+        base = self.charger(TCHOKOS_DB='postgresql', TCHOKOS_DB_POOL='1', TCHOKOS_DB_POOL_MAX='20')
+        self.assertEqual(base['CONN_MAX_AGE'], 0)
+        self.assertEqual(base['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+
+    def test_pragmas_appliques_a_la_connexion(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Profil SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+class MesurerPerformancesTests(TestCase):
+
+    def test_mesure_et_comparaison(self):
+        commande = mesurer_performances.Command(stdout=io.StringIO())
+        options = {
+            'produits': 30, 'categories': 2, 'vendeurs': 2, 'clients': 2, 'commandes': 5, 'remises': 2,
+            'iterations': 3, 'echauffement': 1, 'scenario': ['catalogue', 'panier', 'passer commande'],
+        }
+        with self.assertLogs('django.request', 'ERROR'):
+            resultats = commande.mesurer(options)
+
+        self.assertEqual(list(resultats['scenarios']), ['catalogue', 'panier', 'passer commande'])
+        catalogue = resultats['scenarios']['catalogue']
+        self.assertEqual(catalogue['statut'], 200)
+        self.assertLessEqual(catalogue['p50_ms'], catalogue['p99_ms'])
+        self.assertEqual(resultats['scenarios']['passer commande']['statut'], 302)
+        # Gabarit du panier absent du dépôt : la page d'erreur n'est pas mesurée
+        self.assertEqual(resultats['scenarios']['panier'], {'url': '/panier/', 'statut': 'TemplateDoesNotExist'})
+
+        reference = {'scenarios': {'catalogue': {**catalogue, 'p95_ms': catalogue['p95_ms'] / 2}}}
+        commande.afficher(resultats, reference)
+        lignes = commande.stdout.getvalue().splitlines()
+        self.assertIn('p95 +100%', next(ligne for ligne in lignes if ligne.startswith('catalogue')))
+        self.assertTrue(next(ligne for ligne in lignes if ligne.startswith('panier')).endswith('TemplateDoesNotExist'))
+
+    def test_percentile(self):
+        self.assertEqual(mesurer_performances.percentile([], 95), 0)
+        self.assertEqual(mesurer_performances.percentile([4.0], 95), 4.0)
+        self.assertEqual(mesurer_performances.percentile(list(range(101)), 95), 95)
+
+
+@override_settings(INSTRUMENTATION_ECHANTILLON=1.0)
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        registre.vider()
+        self.addCleanup(registre.vider)
+
+    def test_mesure_par_vue(self):
+        with self.assertLogs('tchokos.instrumentation', 'INFO') as journal, \
+                CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get(reverse('produits'))
+        stats = registre.instantane()['produits']
+        self.assertEqual((stats['nombre'], stats['requetes'], stats['octets']),
+                         (1, len(requetes), len(reponse.content)))
+        self.assertGreater(stats['gabarits'], 0)
+        self.assertLessEqual(stats['db'] + stats['gabarits'], stats['duree'])
+        ligne = json.loads(journal.records[0].getMessage())
+        self.assertEqual((ligne['vue'], ligne['statut'], ligne['requetes']), ('produits', 200, len(requetes)))
+
+        self.client.get('/introuvable/')
+        self.assertEqual(registre.instantane()[VUE_NON_RESOLUE]['nombre'], 1)
+
+    @override_settings(INSTRUMENTATION_ECHANTILLON=0)
+    def test_hors_echantillon(self):
+        self.client.get(reverse('produits'))
+        self.assertEqual(registre.instantane(), {})
+
+    def test_export_prometheus(self):
+        vues = {'a"b': {
+            'nombre': 3, 'duree': 0.5, 'db': 0.25, 'requetes': 7, 'gabarits': 0.0, 'octets': 42,
+            'buckets': [1, 0, 2] + [0] * 9,
+        }}
+        texte = exporter_prometheus(vues)
+        self.assertIn('tchokos_requete_duree_secondes_bucket{vue="a\\"b",le="0.025"} 3', texte)
+        self.assertIn('tchokos_requete_duree_secondes_bucket{vue="a\\"b",le="+Inf"} 3', texte)
+        self.assertIn('tchokos_requete_duree_secondes_count{vue="a\\"b"} 3', texte)
+        self.assertIn('tchokos_requetes_sql_total{vue="a\\"b"} 7', texte)
+        self.assertIn('tchokos_db_secondes_total{vue="a\\"b"} 0.250000', texte)
+
+    def test_point_d_acces_local_uniquement(self):
+        self.client.get(reverse('home'))
+        reponse = self.client.get(reverse('metriques_prometheus'))
+        self.assertEqual(reponse['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn('tchokos_requete_duree_secondes_count{vue="home"} 1', reponse.content.decode())
+        self.assertEqual(self.client.get(reverse('metriques_prometheus'), REMOTE_ADDR='10.0.0.1').status_code, 404)
+
+
+@override_settings(IMAGES_WORKERS=0, IMAGES_LARGEURS=(32, 64))
+class VariantesImageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categorie = Categorie.objects.create(nom='Chaussures')
+        cls.vendeur = Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V')
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        reglages = self.settings(MEDIA_ROOT=media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+    def png(self, couleur='red'):
+        tampon = io.BytesIO()
+        Image.new('RGB', (120, 60), couleur).save(tampon, 'PNG')
+        return SimpleUploadedFile('basket.png', tampon.getvalue(), content_type='image/png')
+
+    def creer_produit(self, image=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            produit = Produit.objects.create(
+                nom='Basket', description='Chaussure', prix=Decimal(1000), stock=1,
+                categorie=self.categorie, vendeur=self.vendeur, image=image,
+            )
+        produit.refresh_from_db()
+        return produit
+
+    def test_vignettes_generees_apres_enregistrement(self):
+        produit = self.creer_produit(self.png())
+        self.assertEqual(sorted(produit.images_variantes), ['32', '64'])
+        for largeur, formats in produit.images_variantes.items():
+            self.assertEqual(sorted(formats), ['jpg', 'webp'])
+            with default_storage.open(formats['webp']) as fichier, Image.open(fichier) as vignette:
+                self.assertEqual((vignette.format, vignette.size), ('WEBP', (int(largeur), int(largeur))))
+
+        # Enregistrement sans nouvelle image : variantes conservées
+        with self.captureOnCommitCallbacks(execute=True) as rappels:
+            produit.stock = 3
+            produit.save()
+        self.assertEqual(rappels, [])
+        self.assertEqual(Produit.objects.get(pk=produit.pk).images_variantes, produit.images_variantes)
+
+    def test_meme_image_traitee_une_fois(self):
+        variantes = self.creer_produit(self.png()).images_variantes
+        self.assertEqual(self.creer_produit(self.png()).images_variantes, variantes)
+        self.assertEqual(len(default_storage.listdir(DOSSIER_VARIANTES)[1]), 4)
+        self.assertNotEqual(self.creer_produit(self.png('blue')).images_variantes, variantes)
+
+    def test_balise_image(self):
+        produit = self.creer_produit(self.png())
+        html = image_produit(produit)
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn('-32.webp 32w, ', html)
+        self.assertIn('width="32" height="32"', html)
+        # Variantes pas encore générées : l'original ; sans image : l'illustration par défaut
+        produit.images_variantes = {}
+        self.assertIn(f'<img src="{produit.image.url}"', image_produit(produit))
+        self.assertIn('images/products/default.jpg', image_produit(self.creer_produit()))
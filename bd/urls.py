@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('metriques/', views.metriques_prometheus, name='metriques_prometheus'),
+]
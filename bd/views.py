@@ -1,3 +1,11 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import Http404, HttpResponse
 
-# Create your views here.
+from .instrumentation import exporter_prometheus
+
+
+def metriques_prometheus(request):
+    """Métriques d'instrumentation au format Prometheus, réservées aux adresses locales"""
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'INSTRUMENTATION_IPS', ('127.0.0.1', '::1')):
+        raise Http404
+    return HttpResponse(exporter_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,115 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from bd.models import ClassementVente, CommandeItem, VenteProduitJour
+
+# Fenêtres glissantes du classement, en jours
+FENETRES = (7, 30, 90)
+FENETRE_DEFAUT = 30
+
+
+def enregistrer_ventes(quantites, jour=None):
+    """
+    Ajoute les quantités vendues {produit_id: quantite} au cumul du jour puis
+    rafraîchit le classement des seuls produits concernés.
+    À appeler dans la transaction de la commande.
+    """
+    if not quantites:
+        return
+    jour = jour or timezone.localdate()
+
+    existants = set(
+        VenteProduitJour.objects.filter(jour=jour, produit_id__in=quantites).values_list('produit_id', flat=True)
+    )
+    if existants:
+        VenteProduitJour.objects.filter(jour=jour, produit_id__in=existants).update(
+            quantite=F('quantite') + Case(*[When(produit_id=pk, then=quantites[pk]) for pk in existants], default=0)
+        )
+    VenteProduitJour.objects.bulk_create(
+        [VenteProduitJour(produit_id=pk, jour=jour, quantite=q) for pk, q in quantites.items() if pk not in existants],
+        ignore_conflicts=True,
+    )
+
+    # Fenêtres comptées depuis aujourd'hui, même pour des ventes datées d'un autre jour
+    rafraichir_classement(list(quantites))
+
+
+def retirer_ventes(commande_ids):
+    """
+    Retire des cumuls journaliers les quantités des commandes annulées
+    `commande_ids`, un UPDATE par jour concerné, puis rafraîchit le
+    classement des produits touchés. À appeler dans la transaction de l'annulation.
+    """
+    par_jour = defaultdict(lambda: defaultdict(int))
+    lignes = CommandeItem.objects.filter(commande_id__in=commande_ids).values_list('commande__date', 'produit_id', 'quantite')
+    for date, produit_id, quantite in lignes:
+        par_jour[timezone.localdate(date)][produit_id] += quantite
+    if not par_jour:
+        return
+
+    produit_ids = set()
+    for jour, quantites in par_jour.items():
+        VenteProduitJour.objects.filter(jour=jour, produit_id__in=quantites).update(
+            quantite=F('quantite') - Case(*[When(produit_id=pk, then=q) for pk, q in quantites.items()], default=0)
+        )
+        produit_ids.update(quantites)
+    VenteProduitJour.objects.filter(produit_id__in=produit_ids, quantite=0).delete()
+    rafraichir_classement(list(produit_ids))
+
+
+def rafraichir_classement(produit_ids=None, aujourd_hui=None):
+    """
+    Recalcule le classement de chaque fenêtre pour `produit_ids`, ou pour tout
+    le catalogue si None (à lancer chaque nuit pour faire glisser les fenêtres).
+    """
+    aujourd_hui = aujourd_hui or timezone.localdate()
+
+    with transaction.atomic():
+        for fenetre in FENETRES:
+            ventes = VenteProduitJour.objects.filter(jour__gt=aujourd_hui - timedelta(days=fenetre))
+            anciens = ClassementVente.objects.filter(fenetre=fenetre)
+            if produit_ids is not None:
+                ventes = ventes.filter(produit_id__in=produit_ids)
+                anciens = anciens.filter(produit_id__in=produit_ids)
+
+            totaux = ventes.values('produit_id', 'produit__categorie_id').annotate(total=Sum('quantite'))
+            anciens.delete()
+            ClassementVente.objects.bulk_create([
+                ClassementVente(
+                    fenetre=fenetre,
+                    produit_id=ligne['produit_id'],
+                    categorie_id=ligne['produit__categorie_id'],
+                    quantite=ligne['total'],
+                )
+                for ligne in totaux if ligne['total']
+            ], batch_size=500)
+
+
+def reconstruire_ventes():
+    """Reconstruit les cumuls journaliers depuis l'historique des commandes (annulées exclues)"""
+    with transaction.atomic():
+        VenteProduitJour.objects.all().delete()
+        cumuls = (
+            CommandeItem.objects.exclude(commande__statut='annulee')
+            .annotate(jour=TruncDate('commande__date'))
+            .values('produit_id', 'jour')
+            .annotate(total=Sum('quantite'))
+        )
+        VenteProduitJour.objects.bulk_create([
+            VenteProduitJour(produit_id=ligne['produit_id'], jour=ligne['jour'], quantite=ligne['total'])
+            for ligne in cumuls
+        ], batch_size=500)
+        rafraichir_classement()
+
+
+def meilleures_ventes(fenetre=FENETRE_DEFAUT, categorie_id=None, limite=8):
+    """Produits les plus vendus : une lecture indexée du classement matérialisé"""
+    classement = ClassementVente.objects.filter(fenetre=fenetre, produit__statut='disponible')
+    if categorie_id:
+        classement = classement.filter(categorie_id=categorie_id)
+    return [ligne.produit for ligne in classement.select_related('produit').order_by('-quantite', 'produit_id')[:limite]]
@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+
+from bd.metriques import enregistrer_commande
+from bd.models import Commande, CommandeItem, Produit
+from .classement import enregistrer_ventes
+from .tarification import lignes_panier, tarifer_lignes
+
+
+class PanierVide(Exception):
+    pass
+
+
+class StockInsuffisant(Exception):
+    def __init__(self, produits):
+        self.produits = produits
+        noms = ', '.join(produit.nom for produit in produits)
+        super().__init__(f'Stock insuffisant pour : {noms}')
+
+
+class _ReservationIncomplete(Exception):
+    def __init__(self, quantites):
+        self.quantites = quantites
+
+
+def reserver_stock(quantites):
+    """
+    Décrémente le stock de tous les produits en un seul UPDATE conditionnel.
+    Chaque ligne n'est modifiée que si son stock couvre la quantité demandée ;
+    retourne False si une seule ligne échoue : la transaction appelante doit
+    alors être annulée, les autres lignes ayant déjà été décrémentées.
+    """
+    condition = Q()
+    decrement = []
+    for produit_id, quantite in quantites.items():
+        condition |= Q(pk=produit_id, stock__gte=quantite)
+        decrement.append(When(pk=produit_id, then=quantite))
+
+    reserves = Produit.objects.filter(condition).update(
+        stock=F('stock') - Case(*decrement, default=0)
+    )
+    return reserves == len(quantites)
+
+
+def produits_manquants(quantites):
+    """Produits dont le stock ne couvre pas la quantité demandée (à lire hors de la transaction annulée)"""
+    return [
+        produit for produit in Produit.objects.filter(pk__in=quantites).only('id', 'nom', 'stock').order_by('id')
+        if produit.stock < quantites[produit.id]
+    ]
+
+
+def creer_commande(client, panier):
+    """
+    Transforme le panier en commande dans une seule transaction :
+    réservation du stock, insertion groupée des lignes, montant total
+    calculé au passage, puis vidage du panier.
+    """
+    items = lignes_panier(panier)
+
+    try:
+        with transaction.atomic():
+            lignes, total = tarifer_lignes(items)
+            if not lignes:
+                raise PanierVide()
+
+            quantites = defaultdict(int)
+            for ligne in lignes:
+                quantites[ligne['item'].produit_id] += ligne['item'].quantite
+            if not reserver_stock(quantites):
+                raise _ReservationIncomplete(quantites)
+            enregistrer_ventes(quantites)
+            # Tout produit acheté et désormais à zéro vient de passer en rupture
+            nouvelles_ruptures = Produit.objects.filter(pk__in=quantites, stock=0).count()
+
+            commande = Commande.objects.create(client=client, montant_total=total)
+            enregistrer_commande(commande, sum(quantites.values()), nouvelles_ruptures)
+            CommandeItem.objects.bulk_create([
+                CommandeItem(
+                    commande=commande,
+                    produit_id=ligne['item'].produit_id,
+                    quantite=ligne['item'].quantite,
+                    prix=ligne['prix_unitaire'],
+                )
+                for ligne in lignes
+            ])
+
+            items.delete()
+    except _ReservationIncomplete as e:
+        # Transaction annulée : les stocks relus sont ceux d'avant la réservation
+        raise StockInsuffisant(produits_manquants(e.quantites)) from None
+
+    return commande
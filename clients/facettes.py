@@ -0,0 +1,86 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Count, IntegerField, Value, When
+
+from bd.cache import cle_catalogue
+
+# Bornes supérieures (FCFA, incluses) des tranches de prix ; la dernière tranche est ouverte.
+# La borne précédente est exclue : les liens de tranche la passent en `prix_min_exclu`
+TRANCHES_PRIX = (5000, 10000, 25000, 50000, 100000)
+
+# Durée de vie des comptes mis en cache ; toute modification du catalogue les invalide
+DUREE_CACHE_FACETTES = 600
+
+
+def _combinaisons(produits):
+    """
+    Nombre de produits par combinaison (catégorie, tranche de prix, en
+    promotion, en stock) : une seule requête GROUP BY, quel que soit le
+    nombre de facettes affichées.
+    """
+    tranche = Case(
+        *[When(prix_effectif__lte=borne, then=Value(rang)) for rang, borne in enumerate(TRANCHES_PRIX)],
+        default=Value(len(TRANCHES_PRIX)),
+        output_field=IntegerField(),
+    )
+    en_stock = Case(When(stock__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField())
+    return list(
+        produits.order_by()
+        .annotate(tranche=tranche, disponible=en_stock)
+        .values_list('categorie_id', 'tranche', 'en_promotion', 'disponible')
+        .annotate(n=Count('id'))
+    )
+
+
+def _tranches():
+    """[(rang, prix_min, prix_max)] ; prix_max None pour la dernière tranche"""
+    bornes = (None,) + TRANCHES_PRIX
+    return [(rang, bornes[rang], TRANCHES_PRIX[rang] if rang < len(TRANCHES_PRIX) else None)
+            for rang in range(len(bornes))]
+
+
+def calculer_facettes(produits, categorie_id=None, promotion=False, en_stock=False, cle=None):
+    """
+    Comptes par facette pour le queryset `produits`, déjà filtré par tout ce
+    qui n'est pas une facette (recherche, vendeur, fourchette de prix).
+    Chaque facette est comptée avec les autres facettes actives mais sans la
+    sienne : les catégories voisines restent visibles avec leur effectif.
+    Avec `cle` (paramètres du filtrage de base), les combinaisons sont mises
+    en cache par version du catalogue.
+
+    Retourne {'categories': {id: n}, 'tranches': [(prix_min, prix_max, n)],
+    'promotion': n, 'en_stock': n, 'total': n}.
+    """
+    if cle is None:
+        combinaisons = _combinaisons(produits)
+    else:
+        empreinte = hashlib.md5(repr(cle).encode()).hexdigest()
+        combinaisons = cache.get_or_set(
+            cle_catalogue(f'facettes:{empreinte}'), lambda: _combinaisons(produits), DUREE_CACHE_FACETTES,
+        )
+
+    categorie_id = int(categorie_id) if categorie_id else None
+    categories, tranches = {}, {}
+    nb_promotion = nb_en_stock = total = 0
+    for categorie, tranche, en_promotion, disponible, n in combinaisons:
+        dans_categorie = categorie_id is None or categorie == categorie_id
+        dans_promotion = not promotion or en_promotion
+        dans_stock = not en_stock or disponible
+        if dans_promotion and dans_stock:
+            categories[categorie] = categories.get(categorie, 0) + n
+        if dans_categorie and dans_stock and en_promotion:
+            nb_promotion += n
+        if dans_categorie and dans_promotion and disponible:
+            nb_en_stock += n
+        if dans_categorie and dans_promotion and dans_stock:
+            tranches[tranche] = tranches.get(tranche, 0) + n
+            total += n
+
+    return {
+        'categories': categories,
+        'tranches': [(prix_min, prix_max, tranches.get(rang, 0)) for rang, prix_min, prix_max in _tranches()],
+        'promotion': nb_promotion,
+        'en_stock': nb_en_stock,
+        'total': total,
+    }
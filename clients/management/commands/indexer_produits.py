@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from clients.recherche import reindexer_tout
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche des produits"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = reindexer_tout(taille_lot=options['taille_lot'])
+        self.stdout.write(self.style.SUCCESS(f'{total} produit(s) indexé(s)'))
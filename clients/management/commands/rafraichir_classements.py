@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from clients.classement import rafraichir_classement, reconstruire_ventes
+
+
+class Command(BaseCommand):
+    help = "Fait glisser les fenêtres du classement des meilleures ventes (à planifier chaque nuit)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconstruire', action='store_true',
+            help="Recalcule d'abord les cumuls journaliers depuis l'historique des commandes",
+        )
+
+    def handle(self, *args, **options):
+        if options['reconstruire']:
+            reconstruire_ventes()
+        else:
+            rafraichir_classement()
+        self.stdout.write(self.style.SUCCESS('Classement des ventes rafraîchi'))
@@ -0,0 +1,192 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from bd.models import Panier, PanierItem, Produit
+
+CLE_SESSION = 'panier'
+
+# Délai minimal (secondes) entre deux recopies du panier de session en base
+DELAI_PERSISTANCE = 300
+
+
+# Opérations acceptées par PanierSession.appliquer (alias anglais compris)
+OPERATIONS = {
+    'ajouter': 'ajouter', 'add': 'ajouter',
+    'fixer': 'fixer', 'set': 'fixer',
+    'retirer': 'retirer', 'remove': 'retirer',
+}
+
+
+class OperationInvalide(ValueError):
+    pass
+
+
+class LignePanier:
+    """Ligne du panier de session, compatible avec tarifer_lignes (item.produit, item.quantite)"""
+
+    def __init__(self, produit, quantite):
+        self.produit = produit
+        self.quantite = quantite
+
+    @property
+    def id(self):
+        return self.produit.id
+
+
+def client_de(user):
+    """Client connecté, ou None pour un visiteur anonyme, un administrateur ou un vendeur"""
+    if not user.is_authenticated:
+        return None
+    try:
+        return user.client
+    except AttributeError:
+        return None
+
+
+class PanierSession:
+    """
+    Panier de travail conservé dans la session : ajout, modification et
+    suppression sont des opérations sur un dict, sans requête SQL. Pour un
+    client connecté, le contenu est recopié dans Panier/PanierItem au plus
+    une fois par PANIER_DELAI_PERSISTANCE, à la commande et à la déconnexion.
+    """
+
+    def __init__(self, request, user=None):
+        self.session = request.session
+        self.client = client_de(user or request.user)
+        donnees = self.session.get(CLE_SESSION)
+        if donnees is None:
+            # Première lecture pour ce client : on repart du panier enregistré
+            donnees = {'lignes': self._lignes_en_base(), 'modifie': False, 'persiste': time.time()}
+            self.session[CLE_SESSION] = donnees
+        self.donnees = donnees
+
+    def _lignes_en_base(self):
+        if self.client is None:
+            return {}
+        return {
+            str(produit_id): quantite
+            for produit_id, quantite in PanierItem.objects.filter(panier__client=self.client)
+            .values_list('produit_id', 'quantite')
+        }
+
+    @property
+    def lignes(self):
+        return self.donnees['lignes']
+
+    def quantites(self):
+        """{produit_id: quantité}"""
+        return {int(produit_id): quantite for produit_id, quantite in self.lignes.items()}
+
+    def __len__(self):
+        return sum(self.lignes.values())
+
+    def _modifie(self):
+        self.donnees['modifie'] = True
+        self.session.modified = True
+        delai = getattr(settings, 'PANIER_DELAI_PERSISTANCE', DELAI_PERSISTANCE)
+        if time.time() - self.donnees['persiste'] >= delai:
+            self.persister()
+
+    def ajouter(self, produit_id, quantite=1):
+        cle = str(produit_id)
+        self.lignes[cle] = self.lignes.get(cle, 0) + quantite
+        self._modifie()
+
+    def modifier(self, produit_id, quantite):
+        """Fixe la quantité d'une ligne ; 0 ou moins la retire. Retourne False si la ligne n'existe pas"""
+        cle = str(produit_id)
+        if cle not in self.lignes:
+            return False
+        if quantite <= 0:
+            del self.lignes[cle]
+        else:
+            self.lignes[cle] = quantite
+        self._modifie()
+        return True
+
+    def retirer(self, produit_id):
+        return self.modifier(produit_id, 0)
+
+    def fusionner(self, lignes):
+        """Ajoute des lignes {produit_id: quantité} (panier anonyme repris à la connexion)"""
+        for cle, quantite in lignes.items():
+            self.lignes[str(cle)] = self.lignes.get(str(cle), 0) + quantite
+        self._modifie()
+
+    def appliquer(self, operations):
+        """
+        Applique un lot d'opérations [{'op': 'ajouter'|'fixer'|'retirer',
+        'produit_id': id, 'quantite': n}] en tout ou rien : une opération
+        invalide (ou un produit inconnu) lève OperationInvalide sans rien
+        modifier. Une seule requête vérifie l'existence des produits.
+        """
+        if not isinstance(operations, list) or not operations:
+            raise OperationInvalide('Liste d\'opérations vide ou invalide')
+
+        lot = []
+        for rang, operation in enumerate(operations):
+            try:
+                op = OPERATIONS[operation['op']]
+                produit_id = int(operation['produit_id'])
+                quantite = int(operation.get('quantite', 1 if op == 'ajouter' else 0))
+            except (KeyError, TypeError, ValueError):
+                raise OperationInvalide(f'Opération {rang} invalide')
+            if op == 'ajouter' and quantite <= 0:
+                raise OperationInvalide(f'Opération {rang} : quantité positive attendue')
+            lot.append((op, produit_id, quantite))
+
+        ajoutes = {produit_id for op, produit_id, quantite in lot if op != 'retirer'}
+        existants = set(Produit.objects.filter(pk__in=ajoutes).values_list('id', flat=True))
+        inconnus = ajoutes - existants
+        if inconnus:
+            raise OperationInvalide(f'Produit(s) inconnu(s) : {", ".join(map(str, sorted(inconnus)))}')
+
+        lignes = dict(self.lignes)
+        for op, produit_id, quantite in lot:
+            cle = str(produit_id)
+            if op == 'ajouter':
+                lignes[cle] = lignes.get(cle, 0) + quantite
+            elif op == 'fixer' and quantite > 0:
+                lignes[cle] = quantite
+            else:
+                lignes.pop(cle, None)
+        self.donnees['lignes'] = lignes
+        self._modifie()
+
+    def vider(self):
+        self.lignes.clear()
+        self.donnees['modifie'] = False
+        self.session.modified = True
+
+    def lignes_tarifables(self):
+        """Lignes avec leur produit chargé en une requête ; les produits supprimés sont écartés"""
+        quantites = self.quantites()
+        produits = Produit.objects.in_bulk(list(quantites))
+        for produit_id in list(quantites):
+            if produit_id not in produits:
+                del self.lignes[str(produit_id)]
+                self.session.modified = True
+        return [LignePanier(produits[pk], quantite) for pk, quantite in quantites.items() if pk in produits]
+
+    def persister(self):
+        """Recopie le panier de session dans Panier/PanierItem ; retourne le Panier (None si anonyme)"""
+        if self.client is None:
+            return None
+        with transaction.atomic():
+            panier, _ = Panier.objects.get_or_create(client=self.client)
+            PanierItem.objects.filter(panier=panier).delete()
+            PanierItem.objects.bulk_create([
+                PanierItem(panier=panier, produit_id=produit_id, quantite=quantite)
+                for produit_id, quantite in self.quantites().items()
+            ])
+        self.donnees['modifie'] = False
+        self.donnees['persiste'] = time.time()
+        self.session.modified = True
+        return panier
+
+    def persister_si_modifie(self):
+        if self.donnees['modifie']:
+            self.persister()
@@ -0,0 +1,131 @@
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from bd.models import Produit, TermeProduit
+
+# Un mot du nom pèse plus qu'un mot de la description
+POIDS_NOM = 3
+POIDS_DESCRIPTION = 1
+
+MOTS_VIDES = {
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'dans', 'de', 'des', 'du', 'en', 'et',
+    'la', 'le', 'les', 'leur', 'ou', 'par', 'pour', 'sa', 'se', 'ses', 'son',
+    'sur', 'un', 'une',
+}
+
+_MOT = re.compile(r'[a-z0-9]+')
+
+
+def normaliser(texte):
+    """Minuscules sans accents : « Été » et « ete » donnent le même terme"""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def tokeniser(texte):
+    termes = []
+    for mot in _MOT.findall(normaliser(texte)):
+        if len(mot) < 2 or mot in MOTS_VIDES:
+            continue
+        # Pluriels français simples : chaussures -> chaussure, chapeaux -> chapeau
+        if len(mot) > 3 and mot[-1] in 'sx' and not mot.isdigit():
+            mot = mot[:-1]
+        termes.append(mot[:64])
+    return termes
+
+
+def termes_produit(produit):
+    poids = Counter()
+    for terme in tokeniser(produit.nom):
+        poids[terme] += POIDS_NOM
+    for terme in tokeniser(produit.description):
+        poids[terme] += POIDS_DESCRIPTION
+    return poids
+
+
+def indexer_produit(produit):
+    """Met à jour incrémentalement les termes d'un produit"""
+    indexer_produits([produit])
+
+
+def indexer_produits(produits):
+    """Met à jour les termes d'un lot de produits en deux requêtes"""
+    with transaction.atomic():
+        TermeProduit.objects.filter(produit__in=[produit.pk for produit in produits]).delete()
+        TermeProduit.objects.bulk_create([
+            TermeProduit(terme=terme, produit=produit, poids=poids)
+            for produit in produits
+            for terme, poids in termes_produit(produit).items()
+        ])
+
+
+def reindexer_tout(taille_lot=500):
+    """Reconstruit l'index complet ; retourne le nombre de produits indexés"""
+    total = 0
+    with transaction.atomic():
+        TermeProduit.objects.all().delete()
+        lot = []
+        for produit in Produit.objects.only('id', 'nom', 'description').iterator(chunk_size=taille_lot):
+            lot.extend(
+                TermeProduit(terme=terme, produit_id=produit.id, poids=poids)
+                for terme, poids in termes_produit(produit).items()
+            )
+            total += 1
+            if len(lot) >= taille_lot:
+                TermeProduit.objects.bulk_create(lot)
+                lot = []
+        TermeProduit.objects.bulk_create(lot)
+    return total
+
+
+def rechercher(produits, texte):
+    """
+    Restreint le queryset `produits` aux produits contenant tous les termes
+    recherchés et l'annote d'un score de pertinence : poids du terme dans le
+    produit, divisé par le nombre de produits qui le contiennent.
+    Retourne le queryset trié par pertinence décroissante ; `pertinence`
+    est toujours annotée (0 sans terme exploitable ou sans résultat), le
+    tri par pertinence reste donc possible.
+    """
+    termes = sorted(set(tokeniser(texte)))
+    if not termes:
+        return produits.annotate(pertinence=Value(0.0, output_field=FloatField()))
+
+    # Fréquence documentaire de chaque terme, en une requête indexée
+    frequences = dict(
+        TermeProduit.objects.filter(terme__in=termes)
+        .values_list('terme')
+        .annotate(n=Count('id'))
+    )
+    if len(frequences) < len(termes):
+        return produits.none().annotate(pertinence=Value(0.0, output_field=FloatField()))
+
+    # Les termes rares départagent mieux que les termes courants
+    idf = {terme: 1.0 / frequences[terme] for terme in termes}
+
+    correspondances = (
+        TermeProduit.objects.filter(terme__in=termes)
+        .values('produit')
+        .annotate(n=Count('id'))
+        .filter(n=len(termes))
+        .values('produit')
+    )
+    score = (
+        TermeProduit.objects.filter(produit=OuterRef('pk'), terme__in=termes)
+        .values('produit')
+        .annotate(s=Sum(F('poids') * Case(
+            *[When(terme=terme, then=Value(idf[terme])) for terme in termes],
+            output_field=FloatField(),
+        ), output_field=FloatField()))
+        .values('s')
+    )
+    return (
+        produits.filter(pk__in=correspondances)
+        .annotate(pertinence=Coalesce(Subquery(score, output_field=FloatField()), Value(0.0)))
+        .order_by('-pertinence', '-id')
+    )
@@ -0,0 +1,25 @@
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+
+from .panier import CLE_SESSION, PanierSession, client_de
+
+
+def _fusionner_panier_anonyme(sender, request, user, **kwargs):
+    # Le panier constitué avant connexion rejoint celui du client
+    # (un administrateur ou un vendeur garde simplement son panier de session)
+    if request is None or client_de(user) is None:
+        return
+    anonyme = request.session.pop(CLE_SESSION, None)
+    panier = PanierSession(request, user)
+    if anonyme and anonyme['lignes']:
+        panier.fusionner(anonyme['lignes'])
+        panier.persister()
+
+
+def _persister_panier(sender, request, user, **kwargs):
+    # La session va être vidée : dernière recopie des modifications en attente
+    if request is not None and CLE_SESSION in request.session:
+        PanierSession(request, user).persister_si_modifie()
+
+
+user_logged_in.connect(_fusionner_panier_anonyme, dispatch_uid='panier_fusion_connexion')
+user_logged_out.connect(_persister_panier, dispatch_uid='panier_persistance_deconnexion')
@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+from bd.models import PanierItem
+
+
+def lignes_panier(panier):
+    """Lignes d'un panier avec leur produit, en une seule requête"""
+    return PanierItem.objects.filter(panier=panier).select_related('produit').order_by('id')
+
+
+def tarifer_lignes(items):
+    """
+    Calcule le prix unitaire et le total de chaque ligne à partir du prix
+    effectif dénormalisé sur Produit : aucune requête par ligne.
+    Retourne (lignes, total).
+    """
+    total = Decimal('0')
+    lignes = []
+
+    for item in items:
+        prix_unitaire = item.produit.prix_effectif
+        prix_total = prix_unitaire * item.quantite
+        total += prix_total
+
+        lignes.append({
+            'item': item,
+            'prix_unitaire': prix_unitaire,
+            'prix_total': prix_total,
+        })
+
+    return lignes, total
+
+
+def tarifer_panier(panier):
+    """Tarifie un panier complet en une requête, quel que soit le nombre de lignes"""
+    return tarifer_lignes(lignes_panier(panier))
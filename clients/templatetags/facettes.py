@@ -0,0 +1,19 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def url_facette(context, **valeurs):
+    """
+    Query string courante avec les filtres `valeurs` remplacés (None ou ''
+    retire le filtre) ; le curseur de pagination est abandonné.
+    """
+    params = context['request'].GET.copy()
+    params.pop('curseur', None)
+    for nom, valeur in valeurs.items():
+        if valeur is None or valeur == '':
+            params.pop(nom, None)
+        else:
+            params[nom] = valeur
+    return '?' + params.urlencode()
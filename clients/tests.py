@@ -1,3 +1,458 @@
-from django.test import TestCase
+from datetime import timedelta
+import html
+import json
+import re
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bd.models import (
+    Categorie, ClassementVente, Client, Commande, CommandeItem, Panier, PanierItem, Produit, TermeProduit, User,
+    Vendeur,
+)
+from bd.requetes import verifier_requetes
+from .classement import enregistrer_ventes, meilleures_ventes, rafraichir_classement, reconstruire_ventes
+from .commande import StockInsuffisant, creer_commande
+from .panier import CLE_SESSION
+from .recherche import indexer_produits, rechercher, reindexer_tout, tokeniser
+from .tarification import tarifer_panier
+from . import views
+
+# store/panier.html n'est pas livré avec le dépôt : gabarit minimal parcourant les lignes tarifées
+GABARIT_PANIER = {
+    'store/panier.html': '{% for ligne in items_with_prices %}{{ ligne.item.produit.nom }} {{ ligne.prix_total }}{% endfor %}',
+}
+
+
+def creer_catalogue(nb_produits, stock=10):
+    """Une catégorie, un vendeur et `nb_produits` produits de prix distincts"""
+    categorie = Categorie.objects.create(nom='Chaussures')
+    vendeur = Vendeur.objects.create(username='vendeur', email='vendeur@tokos.cm', role='V')
+    produits = [
+        Produit.objects.create(
+            nom=f'Basket {i}', description='Chaussure de sport', prix=Decimal(1000 + 250 * i),
+            stock=stock, categorie=categorie, vendeur=vendeur,
+        )
+        for i in range(nb_produits)
+    ]
+    return vendeur, produits
+
+
+class CacheAccueilTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur, cls.produits = creer_catalogue(10)
+
+    def setUp(self):
+        cache.clear()
+
+    def nouveautes(self):
+        return [produit.pk for produit in self.client.get(reverse('home')).context['nouveautes']]
+
+    def test_donnees_servies_depuis_le_cache(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            reponse = self.client.get(reverse('home'))
+        self.assertEqual(reponse.status_code, 200)
+
+    def test_invalidation_par_les_modifications_du_catalogue(self):
+        self.assertEqual(self.nouveautes(), [produit.pk for produit in self.produits[::-1][:8]])
+        nouveau = Produit.objects.create(
+            nom='Basket neuve', description='Chaussure', prix=Decimal(1000), stock=1,
+            categorie=self.produits[0].categorie, vendeur=self.vendeur,
+        )
+        self.assertEqual(self.nouveautes()[0], nouveau.pk)
+
+        self.produits[0].appliquer_remise(30)
+        self.produits[0].save()
+        promotions = self.client.get(reverse('home')).context['produits_promo']
+        self.assertEqual([produit.pk for produit in promotions], [self.produits[0].pk])
+
+        nouveau.delete()
+        self.assertNotIn(nouveau.pk, self.nouveautes())
+
+
+class TarificationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur, cls.produits = creer_catalogue(30)
+        cls.client_tokos = Client.objects.create(username='client', email='client@tokos.cm', role='C')
+
+    def test_une_requete_et_prix_remises(self):
+        self.produits[2].appliquer_remise(40)
+        self.produits[2].save()
+        panier = Panier.objects.create(client=self.client_tokos)
+        PanierItem.objects.bulk_create([
+            PanierItem(panier=panier, produit=produit, quantite=2) for produit in self.produits
+        ])
+
+        with self.assertNumQueries(1):
+            lignes, total = tarifer_panier(panier)
+            noms = [ligne['item'].produit.nom for ligne in lignes]
+        self.assertEqual(noms, [produit.nom for produit in self.produits])
+        self.assertEqual(lignes[2]['prix_unitaire'], Decimal('900.00'))
+        self.assertEqual(lignes[2]['prix_total'], Decimal('1800.00'))
+        self.assertEqual(total, sum(ligne['prix_total'] for ligne in lignes))
+        self.assertEqual(total, 2 * sum(produit.prix for produit in self.produits) - Decimal('1200.00'))
+
+
+class RechercheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        vendeur, _ = creer_catalogue(0)
+        categorie = Categorie.objects.get()
+        cls.sac, cls.ceinture, cls.sandale = [
+            Produit.objects.create(
+                nom=nom, description=description, prix=Decimal(1000), stock=1, categorie=categorie, vendeur=vendeur,
+            )
+            for nom, description in (
+                ('Sac cuir', 'Sac à main en cuir'),
+                ('Ceinture', 'Cuir véritable'),
+                ('Sandale été', 'Lanières de cuir tressé'),
+            )
+        ]
+        indexer_produits([cls.sac, cls.ceinture, cls.sandale])
+
+    def trouver(self, texte):
+        return [produit.pk for produit in rechercher(Produit.objects.all(), texte)]
+
+    def test_tokenisation(self):
+        self.assertEqual(tokeniser("Les Chaussures d'ÉTÉ, 2 paires !"), ['chaussure', 'ete', 'paire'])
+
+    def test_classement_par_pertinence(self):
+        # Nom pondéré plus que la description ; à score égal, le plus récent d'abord
+        self.assertEqual(self.trouver('cuir'), [self.sac.pk, self.sandale.pk, self.ceinture.pk])
+        self.assertEqual(self.trouver('CUIR ete'), [self.sandale.pk])
+        self.assertEqual(self.trouver('sacs'), [self.sac.pk])
+        self.assertEqual(self.trouver('cuir parapluie'), [])
+
+    def test_reindexation_complete_identique(self):
+        incremental = set(TermeProduit.objects.values_list('terme', 'produit', 'poids'))
+        self.assertEqual(reindexer_tout(taille_lot=2), 3)
+        self.assertEqual(set(TermeProduit.objects.values_list('terme', 'produit', 'poids')), incremental)
+
+
+class MeilleuresVentesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur, cls.produits = creer_catalogue(5, stock=100)
+        cls.autre_categorie = Categorie.objects.create(nom='Sacs')
+        Produit.objects.filter(pk=cls.produits[4].pk).update(categorie=cls.autre_categorie)
+        cls.client_tokos = Client.objects.create(username='client', email='client@tokos.cm', role='C')
+
+    def commander(self, quantites):
+        panier, _ = Panier.objects.get_or_create(client=self.client_tokos)
+        PanierItem.objects.bulk_create([
+            PanierItem(panier=panier, produit=self.produits[rang], quantite=quantite) for rang, quantite in quantites
+        ])
+        creer_commande(self.client_tokos, panier)
+
+    def classement(self):
+        return set(ClassementVente.objects.values_list('fenetre', 'produit_id', 'quantite'))
+
+    def test_classement_tenu_a_chaque_commande(self):
+        self.commander([(0, 1), (1, 5), (4, 2)])
+        self.commander([(0, 3), (2, 1)])
+        self.assertEqual(meilleures_ventes(), [self.produits[rang] for rang in (1, 0, 4, 2)])
+        self.assertEqual(meilleures_ventes(categorie_id=self.autre_categorie.pk), [self.produits[4]])
+        self.assertEqual(meilleures_ventes(limite=1), [self.produits[1]])
+        # Un produit retiré de la vente sort du classement affiché
+        Produit.objects.filter(pk=self.produits[1].pk).update(statut='indisponible')
+        self.assertEqual(meilleures_ventes()[0], self.produits[0])
+
+        incremental = self.classement()
+        reconstruire_ventes()
+        self.assertEqual(self.classement(), incremental)
+
+    def test_fenetres_glissantes(self):
+        aujourd_hui = timezone.localdate()
+        enregistrer_ventes({self.produits[0].pk: 4}, jour=aujourd_hui - timedelta(days=20))
+        self.assertEqual(self.classement(), {(30, self.produits[0].pk, 4), (90, self.produits[0].pk, 4)})
+        self.assertEqual(meilleures_ventes(fenetre=7), [])
+        rafraichir_classement(aujourd_hui=aujourd_hui + timedelta(days=15))
+        self.assertEqual(self.classement(), {(90, self.produits[0].pk, 4)})
+
+
+class PanierSessionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur, cls.produits = creer_catalogue(3)
+        cls.client_tokos = Client.objects.create(username='client', email='client@tokos.cm', role='C')
+        cls.utilisateur = User.objects.get(pk=cls.client_tokos.user_ptr_id)
+
+    def ajouter(self, produit, quantite=1):
+        self.client.post(reverse('ajouter_au_panier', args=[produit.pk]), {'quantite': quantite})
+
+    def en_base(self):
+        return dict(PanierItem.objects.filter(panier__client=self.client_tokos).values_list('produit_id', 'quantite'))
+
+    def test_panier_anonyme_fusionne_a_la_connexion(self):
+        panier = Panier.objects.create(client=self.client_tokos)
+        PanierItem.objects.create(panier=panier, produit=self.produits[0], quantite=1)
+        with CaptureQueriesContext(connection) as requetes:
+            self.ajouter(self.produits[0], 2)
+            self.ajouter(self.produits[1])
+        # Seule la session est écrite : le panier enregistré n'est pas touché
+        self.assertFalse([requete for requete in requetes.captured_queries if 'bd_panier' in requete['sql']])
+        self.assertEqual(self.client.session[CLE_SESSION]['lignes'],
+                         {str(self.produits[0].pk): 2, str(self.produits[1].pk): 1})
+
+        self.client.force_login(self.utilisateur)
+        self.assertEqual(self.en_base(), {self.produits[0].pk: 3, self.produits[1].pk: 1})
+
+    def test_recopie_differee_puis_a_la_deconnexion(self):
+        self.client.force_login(self.utilisateur)
+        self.ajouter(self.produits[0])
+        self.ajouter(self.produits[2], 4)
+        # Dans le délai de persistance : rien n'est écrit en base
+        self.assertEqual(self.en_base(), {})
+        self.client.get(reverse('logout'))
+        self.assertEqual(self.en_base(), {self.produits[0].pk: 1, self.produits[2].pk: 4})
+
+        # Nouvelle session : le panier enregistré est rechargé
+        self.client.force_login(self.utilisateur)
+        with override_settings(PANIER_DELAI_PERSISTANCE=0):
+            self.ajouter(self.produits[1])
+        self.assertEqual(self.en_base(), {self.produits[0].pk: 1, self.produits[1].pk: 1, self.produits[2].pk: 4})
+
+    def test_produit_supprime_ecarte(self):
+        self.ajouter(self.produits[0])
+        self.ajouter(self.produits[1])
+        self.produits[1].delete()
+        operations = [{'op': 'fixer', 'produit_id': self.produits[0].pk, 'quantite': 3}]
+        reponse = self.client.post(
+            reverse('operations_panier'), json.dumps({'operations': operations}), content_type='application/json',
+        )
+        self.assertEqual([ligne['produit_id'] for ligne in reponse.json()['lignes']], [self.produits[0].pk])
+        self.assertEqual(self.client.session[CLE_SESSION]['lignes'], {str(self.produits[0].pk): 3})
+
+
+class OperationsPanierTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur, cls.produits = creer_catalogue(3)
+
+    def envoyer(self, operations):
+        return self.client.post(
+            reverse('operations_panier'), json.dumps({'operations': operations}), content_type='application/json',
+        )
+
+    def lignes(self):
+        return self.client.session.get(CLE_SESSION, {}).get('lignes', {})
+
+    def test_lot_applique_dans_l_ordre(self):
+        a, b, c = (produit.pk for produit in self.produits)
+        self.envoyer([{'op': 'ajouter', 'produit_id': c}])
+        reponse = self.envoyer([
+            {'op': 'add', 'produit_id': a, 'quantite': 2},
+            {'op': 'ajouter', 'produit_id': a},
+            {'op': 'set', 'produit_id': b, 'quantite': 5},
+            {'op': 'fixer', 'produit_id': b, 'quantite': 4},
+            {'op': 'remove', 'produit_id': c},
+        ])
+        donnees = reponse.json()
+        self.assertEqual(self.lignes(), {str(a): 3, str(b): 4})
+        self.assertEqual(donnees['nb_articles'], 7)
+        self.assertEqual(Decimal(str(donnees['total'])), 3 * self.produits[0].prix + 4 * self.produits[1].prix)
+
+    def test_tout_ou_rien(self):
+        a = self.produits[0].pk
+        self.envoyer([{'op': 'ajouter', 'produit_id': a, 'quantite': 2}])
+        for operations in (
+            [{'op': 'fixer', 'produit_id': a, 'quantite': 9}, {'op': 'ajouter', 'produit_id': 999}],
+            [{'op': 'fixer', 'produit_id': a, 'quantite': 9}, {'op': 'vider', 'produit_id': a}],
+            [{'op': 'ajouter', 'produit_id': a, 'quantite': 0}],
+            [{'op': 'ajouter', 'produit_id': 'abc'}],
+            [],
+        ):
+            reponse = self.envoyer(operations)
+            self.assertEqual(reponse.status_code, 400)
+            self.assertFalse(reponse.json()['success'])
+            self.assertEqual(self.lignes(), {str(a): 2})
+        reponse = self.client.post(reverse('operations_panier'), 'pas du json', content_type='application/json')
+        self.assertEqual(reponse.status_code, 400)
+
+    def test_deux_requetes_produit_quel_que_soit_le_lot(self):
+        operations = [{'op': 'ajouter', 'produit_id': produit.pk} for produit in self.produits]
+        with CaptureQueriesContext(connection) as requetes:
+            self.envoyer(operations)
+        # Existence des produits du lot, puis tarification du panier
+        self.assertEqual(len([requete for requete in requetes.captured_queries if 'bd_produit' in requete['sql']]), 2)
+
+
+class CreerCommandeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur, cls.produits = creer_catalogue(40)
+        cls.client_tokos = Client.objects.create(username='client', email='client@tokos.cm', role='C')
+
+    def remplir_panier(self, quantites):
+        panier, _ = Panier.objects.get_or_create(client=self.client_tokos)
+        PanierItem.objects.filter(panier=panier).delete()
+        PanierItem.objects.bulk_create([
+            PanierItem(panier=panier, produit=produit, quantite=quantite) for produit, quantite in quantites
+        ])
+        return panier
+
+    def test_montant_total_egal_a_la_somme_des_lignes(self):
+        produit_remise = self.produits[1]
+        produit_remise.appliquer_remise(20)
+        produit_remise.save()
+        panier = self.remplir_panier([(self.produits[0], 2), (produit_remise, 3), (self.produits[2], 1)])
+
+        commande = creer_commande(self.client_tokos, panier)
+
+        lignes = CommandeItem.objects.filter(commande=commande)
+        self.assertEqual(commande.montant_total, sum(ligne.prix * ligne.quantite for ligne in lignes))
+        self.assertEqual(lignes.get(produit=produit_remise).prix, Decimal('1000.00'))
+        self.assertFalse(PanierItem.objects.filter(panier=panier).exists())
+
+    def test_stock_insuffisant_annule_toute_la_commande(self):
+        # Plus de la moitié du stock sur la ligne disponible : une fois décrémentée, elle paraîtrait manquante
+        panier = self.remplir_panier([(self.produits[0], 6), (self.produits[1], 11)])
+
+        with self.assertRaises(StockInsuffisant) as erreur:
+            creer_commande(self.client_tokos, panier)
+
+        self.assertEqual([produit.pk for produit in erreur.exception.produits], [self.produits[1].pk])
+        self.assertEqual(str(erreur.exception), f'Stock insuffisant pour : {self.produits[1].nom}')
+        self.assertFalse(Commande.objects.exists())
+        self.assertFalse(CommandeItem.objects.exists())
+        # Le produit disponible n'a pas été décrémenté non plus
+        self.assertEqual(
+            list(Produit.objects.filter(pk__in=[self.produits[0].pk, self.produits[1].pk]).values_list('stock', flat=True)),
+            [10, 10],
+        )
+        self.assertEqual(PanierItem.objects.filter(panier=panier).count(), 2)
+
+    def test_nombre_de_requetes_independant_du_nombre_de_lignes(self):
+        # La première commande du jour crée en plus la ligne StatistiqueJour
+        creer_commande(self.client_tokos, self.remplir_panier([(self.produits[0], 1)]))
+        nombres = []
+        for nb_lignes in (5, 40):
+            panier = self.remplir_panier([(produit, 1) for produit in self.produits[:nb_lignes]])
+            with CaptureQueriesContext(connection) as requetes:
+                creer_commande(self.client_tokos, panier)
+            nombres.append(len(requetes))
+        self.assertEqual(nombres[0], nombres[1])
+
+
+class BudgetRequetesPanierTests(TestCase):
+    """Chaque vue du parcours d'achat tient son budget, sans requête par ligne de panier"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur, cls.produits = creer_catalogue(40)
+        client = Client.objects.create(username='client', email='client@tokos.cm', role='C')
+        cls.utilisateur = User.objects.get(pk=client.user_ptr_id)
+
+    def setUp(self):
+        self.client.force_login(self.utilisateur)
+
+    def remplir_panier(self, nb_lignes):
+        operations = [{'op': 'ajouter', 'produit_id': produit.id, 'quantite': 1} for produit in self.produits[:nb_lignes]]
+        with verifier_requetes(budget=views.operations_panier.budget_requetes[0]):
+            reponse = self.client.post(
+                reverse('operations_panier'), json.dumps({'operations': operations}), content_type='application/json',
+            )
+        self.assertEqual(reponse.status_code, 200)
+
+    @override_settings(TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'OPTIONS': {'loaders': [('django.template.loaders.locmem.Loader', GABARIT_PANIER)]},
+    }])
+    def test_panier(self):
+        for nb_lignes in (5, 40):
+            self.remplir_panier(nb_lignes)
+            with verifier_requetes(budget=views.panier.budget_requetes[0], seuil_n_plus_un=4):
+                reponse = self.client.get(reverse('panier'))
+            self.assertContains(reponse, self.produits[nb_lignes - 1].nom)
+
+    def test_passer_commande(self):
+        budget, seuil = views.passer_commande.budget_requetes
+        for nb_lignes in (5, 40):
+            self.remplir_panier(nb_lignes)
+            with verifier_requetes(budget=budget, seuil_n_plus_un=seuil):
+                reponse = self.client.post(reverse('passer_commande'))
+            self.assertRedirects(reponse, reverse('mon_compte'), fetch_redirect_response=False)
+        self.assertEqual(CommandeItem.objects.count(), 45)
+
+
+class PageProduitsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendeur, cls.produits = creer_catalogue(15)
+
+    def test_recherche_sans_resultat_ou_sans_terme(self):
+        # Terme absent de l'index, puis recherche réduite à des mots vides ou à de la ponctuation
+        for recherche, nombre in (('zzz', 0), ('les', 12), ('!!!', 12)):
+            reponse = self.client.get(reverse('produits'), {'search': recherche})
+            self.assertEqual(reponse.status_code, 200)
+            self.assertEqual(len(reponse.context['page_obj']), nombre)
+
+    def test_changement_de_tri_avec_curseur(self):
+        curseur = self.client.get(reverse('produits'), {'sort': 'prix'}).context['page_obj'].curseur_suivant
+        reponse = self.client.get(reverse('produits'), {'sort': 'nom', 'curseur': curseur})
+        self.assertEqual(reponse.status_code, 200)
+        # Curseur d'un autre tri ignoré : première page du nouveau tri
+        self.assertEqual(
+            [produit.id for produit in reponse.context['page_obj']],
+            list(Produit.objects.order_by('nom', 'id').values_list('id', flat=True)[:12]),
+        )
+
+
+class FacettesPrixTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Prix de 1000 à 10750 par pas de 250 : 5000 et 10000 tombent sur des bornes de tranche
+        cls.vendeur, cls.produits = creer_catalogue(40)
+
+    def ids_de_toutes_les_pages(self, params):
+        ids, curseur = [], None
+        while True:
+            page = self.client.get(reverse('produits'), {**params, **({'curseur': curseur} if curseur else {})})
+            ids += [produit.id for produit in page.context['page_obj']]
+            curseur = page.context['page_obj'].curseur_suivant
+            if not curseur:
+                return ids
+
+    def test_prix_aux_bornes_dans_une_seule_tranche(self):
+        reponse = self.client.get(reverse('produits'))
+        self.assertEqual([n for _, _, n in reponse.context['facettes']['tranches']], [17, 20, 3, 0, 0, 0])
+        liens = [html.unescape(lien) for lien in re.findall(r'href="(\?[^"]*prix_[^"]*)"', reponse.content.decode())]
+        self.assertEqual(len(liens), 3)
+
+        vus = []
+        for lien, (_, _, nombre) in zip(liens, reponse.context['facettes']['tranches']):
+            ids = self.ids_de_toutes_les_pages(dict(re.findall(r'(\w+)=([^&]*)', lien)))
+            self.assertEqual(len(ids), nombre)
+            vus += ids
+        self.assertCountEqual(vus, [produit.id for produit in self.produits])
+
+    def test_facettes_comptees_sans_la_leur(self):
+        autre = Categorie.objects.create(nom='Sacs')
+        Produit.objects.filter(pk__in=[p.pk for p in self.produits[:4]]).update(categorie=autre, stock=0)
+        self.produits[5].appliquer_remise(10)
+        self.produits[5].save()
+
+        facettes = self.client.get(reverse('produits'), {'categorie': autre.pk, 'en_stock': '1'}).context['facettes']
+        # Catégories comptées sans le filtre de catégorie, mais avec celui du stock
+        self.assertEqual(facettes['categories'], {self.produits[4].categorie_id: 36})
+        self.assertEqual((facettes['total'], facettes['en_stock'], facettes['promotion']), (0, 0, 0))
+        facettes = self.client.get(reverse('produits'), {'promotion': '1'}).context['facettes']
+        self.assertEqual((facettes['total'], facettes['en_stock'], facettes['promotion']), (1, 1, 1))
+        self.assertEqual(facettes['categories'], {self.produits[4].categorie_id: 1})
@@ -8,10 +8,16 @@ urlpatterns = [
     path('promotions/', views.promotions, name='promotions'),
     path('produit/<int:produit_id>/', views.detail_produit, name='detail_produit'),
     
+    # Vendeurs et avis
+    path('vendeur/<int:vendeur_id>/', views.vendeur, name='vendeur'),
+    path('vendeur/<int:vendeur_id>/avis/', views.donner_avis, name='donner_avis'),
+    path('vendeur/<int:vendeur_id>/avis/supprimer/', views.supprimer_avis, name='supprimer_avis'),
+    
     # Panier
     path('panier/', views.panier, name='panier'),
     path('ajouter-au-panier/<int:produit_id>/', views.ajouter_au_panier, name='ajouter_au_panier'),
     path('modifier-quantite-panier/', views.modifier_quantite_panier, name='modifier_quantite_panier'),
+    path('panier/operations/', views.operations_panier, name='operations_panier'),
     path('supprimer-du-panier/<int:item_id>/', views.supprimer_du_panier, name='supprimer_du_panier'),
     path('passer-commande/', views.passer_commande, name='passer_commande'),
     
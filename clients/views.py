@@ -1,151 +1,151 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.cache import cache
 from django.http import JsonResponse
-from django.db.models import Q
-from django.core.paginator import Paginator
+from django.views.decorators.http import require_POST
 
-from bd.models import Categorie, Commande, CommandeItem, Panier, PanierItem, Produit, RemiseValidee
+from bd.models import Avis, Categorie, Commande, CommandeItem, Produit, Vendeur
+from bd.cache import cle_catalogue
+from bd.pagination import paginer
+from bd.requetes import budget_requetes
 from .models import *
+from .recherche import rechercher
+from .classement import meilleures_ventes
+from .facettes import calculer_facettes
+from .commande import PanierVide, StockInsuffisant, creer_commande
+from .panier import OperationInvalide, PanierSession, client_de
+from .tarification import tarifer_lignes
 import json
 
+# Durée de vie des blocs de la page d'accueil ; l'invalidation se fait par signaux
+DUREE_CACHE_ACCUEIL = 600
+
+# Tris autorisés sur la page produits (paramètre GET "sort")
+TRIS_PRODUITS = {
+    'nom': ('nom', 'id'),
+    'prix': ('prix_effectif', 'id'),
+    '-prix': ('-prix_effectif', '-id'),
+    'date': ('-id',),
+    # Note moyenne du vendeur, dénormalisée sur Vendeur (jointure déjà présente)
+    'note': ('-vendeur__note_moyenne', '-id'),
+}
+
+def donnees_accueil():
+    """Blocs de la page d'accueil, évalués une fois puis mis en cache"""
+    return {
+        'categories': list(Categorie.objects.all()),
+        # Nouveautés (8 derniers produits)
+        'nouveautes': list(Produit.objects.filter(statut='disponible').order_by('-id')[:8]),
+        # Meilleures ventes sur 30 jours glissants (classement matérialisé)
+        'meilleures_ventes': meilleures_ventes(),
+        # Produits en promotion (remise déjà dénormalisée sur Produit)
+        'produits_promo': list(
+            Produit.objects.filter(statut='disponible', en_promotion=True).order_by('-pourcentage_promotion', '-id')[:6]
+        ),
+    }
+
+@budget_requetes(8)
 def home(request):
     """Page d'accueil avec carrousel et produits en vedette"""
-    categories = Categorie.objects.all()
-    
-    # Nouveautés (5 derniers produits)
-    nouveautes = Produit.objects.filter(statut='disponible').order_by('-id')[:8]
-    
-    # Meilleures ventes (simulation avec les produits ayant le moins de stock)
-    meilleures_ventes = Produit.objects.filter(statut='disponible').order_by('stock')[:8]
-    
-    # Produits en promotion
-    produits_promo = []
-    remises = RemiseValidee.objects.select_related('produit')[:6]
-    for remise in remises:
-        produit = remise.produit
-        prix_reduit = float(produit.prix) * (1 - remise.pourcentage / 100)
-        produits_promo.append({
-            'produit': produit,
-            'prix_original': produit.prix,
-            'prix_reduit': prix_reduit,
-            'pourcentage': remise.pourcentage
-        })
-    
-    context = {
-        'categories': categories,
-        'nouveautes': nouveautes,
-        'meilleures_ventes': meilleures_ventes,
-        'produits_promo': produits_promo,
-    }
+    # Seules les données sont partagées : la page porte le jeton CSRF propre à chaque visiteur
+    context = cache.get_or_set(cle_catalogue('accueil:donnees'), donnees_accueil, DUREE_CACHE_ACCUEIL)
     return render(request, 'store/home.html', context)
 
+@budget_requetes(10)
 def produits(request):
-    """Page des produits avec filtres"""
+    """Page des produits avec filtres et comptes par facette"""
     produits_list = Produit.objects.filter(statut='disponible').select_related('categorie', 'vendeur')
     categories = Categorie.objects.all()
     
     # Filtres
     categorie_id = request.GET.get('categorie')
+    vendeur_id = request.GET.get('vendeur')
     prix_min = request.GET.get('prix_min')
     prix_max = request.GET.get('prix_max')
+    # Liens des tranches de prix : borne basse exclue, les tranches étant (borne précédente, borne]
+    prix_min_exclu = request.GET.get('prix_min_exclu')
     search = request.GET.get('search')
+    promotion = request.GET.get('promotion') == '1'
+    en_stock = request.GET.get('en_stock') == '1'
+    categorie_id = categorie_id if categorie_id and categorie_id.isdigit() else None
+    vendeur_id = vendeur_id if vendeur_id and vendeur_id.isdigit() else None
     
-    if categorie_id:
-        produits_list = produits_list.filter(categorie_id=categorie_id)
+    if vendeur_id:
+        produits_list = produits_list.filter(vendeur_id=vendeur_id)
     
     if prix_min:
-        produits_list = produits_list.filter(prix__gte=prix_min)
+        produits_list = produits_list.filter(prix_effectif__gte=prix_min)
+    
+    if prix_min_exclu:
+        produits_list = produits_list.filter(prix_effectif__gt=prix_min_exclu)
     
     if prix_max:
-        produits_list = produits_list.filter(prix__lte=prix_max)
+        produits_list = produits_list.filter(prix_effectif__lte=prix_max)
     
+    # Tri : par pertinence pour une recherche, sauf tri explicite
+    sort = request.GET.get('sort')
+    ordre = TRIS_PRODUITS.get(sort, ('-id',))
     if search:
-        produits_list = produits_list.filter(
-            Q(nom__icontains=search) | Q(description__icontains=search)
-        )
+        produits_list = rechercher(produits_list, search)
+        if sort not in TRIS_PRODUITS:
+            ordre = ('-pertinence', '-id')
     
-    # Récupérer les remises validées
-    remises = {}
-    for remise in RemiseValidee.objects.select_related('produit'):
-        prix_reduit = float(remise.produit.prix) * (1 - remise.pourcentage / 100)
-        remises[remise.produit.id] = {
-            'pourcentage': remise.pourcentage,
-            'prix_reduit': prix_reduit
-        }
+    # Facettes comptées sur le filtrage de base, en une requête groupée (ou depuis le cache)
+    facettes = calculer_facettes(
+        produits_list, categorie_id, promotion, en_stock, cle=(vendeur_id, prix_min, prix_min_exclu, prix_max, search),
+    )
     
-    # Pagination
-    paginator = Paginator(produits_list, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if categorie_id:
+        produits_list = produits_list.filter(categorie_id=categorie_id)
+    if promotion:
+        produits_list = produits_list.filter(en_promotion=True)
+    if en_stock:
+        produits_list = produits_list.filter(stock__gt=0)
+    
+    # Pagination par curseur (pas de COUNT ni d'OFFSET) ; le total vient des facettes
+    page_obj = paginer(request, produits_list, 12, ordre)
+    page_obj.paginator.count = facettes['total']
+    
+    # Meilleures ventes de la catégorie sélectionnée
+    top_categorie = meilleures_ventes(categorie_id=categorie_id, limite=4) if categorie_id else []
     
     context = {
         'page_obj': page_obj,
-        'categories': categories,
-        'remises': remises,
+        'categories': [(categorie, facettes['categories'].get(categorie.id, 0)) for categorie in categories],
+        'facettes': facettes,
+        'meilleures_ventes': top_categorie,
         'current_filters': {
             'categorie': categorie_id,
+            'vendeur': vendeur_id,
             'prix_min': prix_min,
             'prix_max': prix_max,
+            'prix_min_exclu': prix_min_exclu,
             'search': search,
+            'promotion': promotion,
+            'en_stock': en_stock,
+            'sort': sort,
         }
     }
     return render(request, 'store/produits.html', context)
 
+@budget_requetes(5)
 def promotions(request):
     """Page des promotions - Les prix ont été cassés"""
-    remises = RemiseValidee.objects.select_related('produit').filter(produit__statut='disponible')
+    produits_promo = Produit.objects.filter(statut='disponible', en_promotion=True).select_related('categorie', 'vendeur')
     
-    produits_promo = []
-    for remise in remises:
-        produit = remise.produit
-        prix_reduit = float(produit.prix) * (1 - remise.pourcentage / 100)
-        produits_promo.append({
-            'produit': produit,
-            'prix_original': produit.prix,
-            'prix_reduit': prix_reduit,
-            'pourcentage': remise.pourcentage
-        })
-    
-    # Pagination
-    paginator = Paginator(produits_promo, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur
+    page_obj = paginer(request, produits_promo, 12, ('-pourcentage_promotion', '-id'), approx_count=True)
     
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'store/promotions.html', context)
 
-@login_required
+@budget_requetes(6)
 def panier(request):
     """Page du panier"""
-    try:
-        panier = Panier.objects.get(client=request.user.client)
-        items = PanierItem.objects.filter(panier=panier).select_related('produit')
-    except (Panier.DoesNotExist, AttributeError):
-        items = []
-    
-    # Calculer les totaux avec les remises
-    total = 0
-    items_with_prices = []
-    
-    for item in items:
-        # Vérifier s'il y a une remise
-        try:
-            remise = RemiseValidee.objects.get(produit=item.produit)
-            prix_unitaire = float(item.produit.prix) * (1 - remise.pourcentage / 100)
-        except RemiseValidee.DoesNotExist:
-            prix_unitaire = float(item.produit.prix)
-        
-        prix_total_item = prix_unitaire * item.quantite
-        total += prix_total_item
-        
-        items_with_prices.append({
-            'item': item,
-            'prix_unitaire': prix_unitaire,
-            'prix_total': prix_total_item
-        })
+    items_with_prices, total = tarifer_lignes(PanierSession(request).lignes_tarifables())
     
     context = {
         'items_with_prices': items_with_prices,
@@ -153,114 +153,104 @@ def panier(request):
     }
     return render(request, 'store/panier.html', context)
 
-@login_required
 def ajouter_au_panier(request, produit_id):
-    """Ajouter un produit au panier"""
+    """Ajouter un produit au panier (visiteurs anonymes compris)"""
     if request.method == 'POST':
-        produit = get_object_or_404(Produit, id=produit_id)
-        quantite = int(request.POST.get('quantite', 1))
+        produit = get_object_or_404(Produit.objects.only('id', 'nom'), id=produit_id)
+        quantite = max(1, int(request.POST.get('quantite', 1)))
         
-        try:
-            client = request.user.client
-            panier, created = Panier.objects.get_or_create(client=client)
-            
-            item, created = PanierItem.objects.get_or_create(
-                panier=panier,
-                produit=produit,
-                defaults={'quantite': quantite}
-            )
-            
-            if not created:
-                item.quantite += quantite
-                item.save()
-            
-            messages.success(request, f'{produit.nom} ajouté au panier!')
-            
-        except AttributeError:
-            messages.error(request, 'Erreur: Vous devez être connecté comme client.')
+        PanierSession(request).ajouter(produit.id, quantite)
+        messages.success(request, f'{produit.nom} ajouté au panier!')
     
     return redirect('produits')
 
-@login_required
 def modifier_quantite_panier(request):
     """Modifier la quantité d'un produit dans le panier"""
     if request.method == 'POST':
         data = json.loads(request.body)
-        item_id = data.get('item_id')
-        nouvelle_quantite = data.get('quantite')
+        # Les lignes du panier de session sont identifiées par leur produit
+        produit_id = data.get('produit_id', data.get('item_id'))
+        nouvelle_quantite = int(data.get('quantite', 0))
         
-        try:
-            item = PanierItem.objects.get(id=item_id, panier__client=request.user.client)
-            if nouvelle_quantite <= 0:
-                item.delete()
-            else:
-                item.quantite = nouvelle_quantite
-                item.save()
-            
+        if PanierSession(request).modifier(produit_id, nouvelle_quantite):
             return JsonResponse({'success': True})
-        except PanierItem.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'Produit non trouvé'})
+        return JsonResponse({'success': False, 'error': 'Produit non trouvé'})
     
     return JsonResponse({'success': False})
 
-@login_required
+@require_POST
+@budget_requetes(8)
+def operations_panier(request):
+    """
+    Modifie le panier par lots : {"operations": [{"op": "ajouter"|"fixer"|"retirer",
+    "produit_id": 12, "quantite": 2}, ...]}. Tout ou rien ; retourne le panier
+    retarifé.
+    """
+    try:
+        operations = json.loads(request.body).get('operations')
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'JSON invalide'}, status=400)
+    
+    panier_session = PanierSession(request)
+    try:
+        panier_session.appliquer(operations)
+    except OperationInvalide as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    lignes, total = tarifer_lignes(panier_session.lignes_tarifables())
+    return JsonResponse({
+        'success': True,
+        'lignes': [
+            {
+                'produit_id': ligne['item'].produit.id,
+                'nom': ligne['item'].produit.nom,
+                'quantite': ligne['item'].quantite,
+                'prix_unitaire': ligne['prix_unitaire'],
+                'prix_total': ligne['prix_total'],
+            }
+            for ligne in lignes
+        ],
+        'nb_articles': len(panier_session),
+        'total': total,
+    })
+
 def supprimer_du_panier(request, item_id):
     """Supprimer un produit du panier"""
-    try:
-        item = PanierItem.objects.get(id=item_id, panier__client=request.user.client)
-        item.delete()
+    if PanierSession(request).retirer(item_id):
         messages.success(request, 'Produit supprimé du panier!')
-    except PanierItem.DoesNotExist:
+    else:
         messages.error(request, 'Produit non trouvé dans le panier.')
     
     return redirect('panier')
 
+# Budget de la première commande : création du Panier et de la ligne StatistiqueJour du jour comprises
 @login_required
+@budget_requetes(44, seuil_n_plus_un=4)
 def passer_commande(request):
     """Passer une commande"""
+    panier_session = PanierSession(request)
     try:
         client = request.user.client
-        panier = Panier.objects.get(client=client)
-        items = PanierItem.objects.filter(panier=panier)
-        
-        if not items.exists():
-            messages.error(request, 'Votre panier est vide!')
-            return redirect('panier')
-        
-        # Créer la commande
-        commande = Commande.objects.create(client=client)
-        
-        # Créer les items de commande
-        for item in items:
-            # Calculer le prix avec remise si applicable
-            try:
-                remise = RemiseValidee.objects.get(produit=item.produit)
-                prix = float(item.produit.prix) * (1 - remise.pourcentage / 100)
-            except RemiseValidee.DoesNotExist:
-                prix = item.produit.prix
-            
-            CommandeItem.objects.create(
-                commande=commande,
-                produit=item.produit,
-                quantite=item.quantite,
-                prix=prix
-            )
-            
-            # Réduire le stock
-            item.produit.stock -= item.quantite
-            item.produit.save()
-        
-        # Vider le panier
-        items.delete()
+        # Le panier de session est recopié en base juste avant la commande
+        panier = panier_session.persister()
+        commande = creer_commande(client, panier)
+        panier_session.vider()
         
         messages.success(request, f'Commande #{commande.id} passée avec succès!')
         return redirect('mon_compte')
         
-    except (Panier.DoesNotExist, AttributeError):
+    except PanierVide:
+        messages.error(request, 'Votre panier est vide!')
+        return redirect('panier')
+    except StockInsuffisant as e:
+        messages.error(request, str(e))
+        return redirect('panier')
+    except AttributeError:
         messages.error(request, 'Erreur lors de la commande.')
         return redirect('panier')
 
 @login_required
+@budget_requetes(5)
 def mon_compte(request):
     """Page du compte utilisateur"""
     try:
@@ -276,21 +266,19 @@ def mon_compte(request):
         messages.error(request, 'Accès refusé.')
         return redirect('home')
 
+@budget_requetes(8)
 def detail_produit(request, produit_id):
     """Page de détail d'un produit"""
-    produit = get_object_or_404(Produit, id=produit_id)
+    # Note du vendeur lue sur Vendeur : aucun agrégat sur les avis
+    produit = get_object_or_404(Produit.objects.select_related('categorie', 'vendeur'), id=produit_id)
     
-    # Vérifier s'il y a une remise
+    # Remise courante (dénormalisée sur Produit)
     remise_info = None
-    try:
-        remise = RemiseValidee.objects.get(produit=produit)
-        prix_reduit = float(produit.prix) * (1 - remise.pourcentage / 100)
+    if produit.promotion_active:
         remise_info = {
-            'pourcentage': remise.pourcentage,
-            'prix_reduit': prix_reduit
+            'pourcentage': produit.pourcentage_promotion,
+            'prix_reduit': produit.prix_promotion
         }
-    except RemiseValidee.DoesNotExist:
-        pass
     
     # Produits similaires (même catégorie)
     produits_similaires = Produit.objects.filter(
@@ -303,4 +291,63 @@ def detail_produit(request, produit_id):
         'remise_info': remise_info,
         'produits_similaires': produits_similaires,
     }
-    return render(request, 'store/detail_produit.html', context)
\ No newline at end of file
+    return render(request, 'store/detail_produit.html', context)
+
+@budget_requetes(6)
+def vendeur(request, vendeur_id):
+    """Boutique d'un vendeur : note, répartition des notes, derniers avis et produits"""
+    vendeur = get_object_or_404(Vendeur, pk=vendeur_id)
+    produits_list = Produit.objects.filter(vendeur=vendeur, statut='disponible').select_related('categorie')
+    page_obj = paginer(request, produits_list, 12, ('-id',))
+    derniers_avis = Avis.objects.filter(vendeur=vendeur).select_related('client').order_by('-date', '-id')[:10]
+    
+    client = client_de(request.user)
+    mon_avis = Avis.objects.filter(vendeur=vendeur, client=client).first() if client else None
+    
+    context = {
+        'vendeur': vendeur,
+        'page_obj': page_obj,
+        'derniers_avis': derniers_avis,
+        'mon_avis': mon_avis,
+    }
+    return render(request, 'store/vendeur.html', context)
+
+@login_required
+@require_POST
+def donner_avis(request, vendeur_id):
+    """Créer ou modifier l'avis du client connecté sur un vendeur dont il a commandé un produit"""
+    client = client_de(request.user)
+    if client is None:
+        messages.error(request, 'Seuls les clients peuvent donner un avis.')
+        return redirect('vendeur', vendeur_id=vendeur_id)
+    
+    vendeur = get_object_or_404(Vendeur.objects.only('idVendeur'), pk=vendeur_id)
+    try:
+        note = int(request.POST.get('note', 0))
+    except ValueError:
+        note = 0
+    if not 1 <= note <= 5:
+        messages.error(request, 'La note doit être comprise entre 1 et 5.')
+        return redirect('vendeur', vendeur_id=vendeur_id)
+    if not CommandeItem.objects.filter(commande__client=client, produit__vendeur=vendeur).exists():
+        messages.error(request, 'Vous devez avoir commandé chez ce vendeur pour le noter.')
+        return redirect('vendeur', vendeur_id=vendeur_id)
+    
+    # Les agrégats du vendeur suivent par signaux (bd.avis.ajuster_notes)
+    Avis.objects.update_or_create(
+        client=client, vendeur=vendeur,
+        defaults={'note': note, 'commentaire': request.POST.get('commentaire', '').strip()},
+    )
+    messages.success(request, 'Merci pour votre avis !')
+    return redirect('vendeur', vendeur_id=vendeur_id)
+
+@login_required
+@require_POST
+def supprimer_avis(request, vendeur_id):
+    """Supprimer l'avis du client connecté sur un vendeur"""
+    client = client_de(request.user)
+    avis = Avis.objects.filter(client=client, vendeur_id=vendeur_id).first() if client else None
+    if avis is not None:
+        avis.delete()
+        messages.success(request, 'Avis supprimé.')
+    return redirect('vendeur', vendeur_id=vendeur_id)
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +27,9 @@ SECRET_KEY = 'django-insecure-4p-zt!q!=(kiu#ev945=r8w+ft^p5s1%n#(chm1#bt7!)d3ow#
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Exécution de la suite de tests (manage.py test) : cache et journaux isolés
+TESTS = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = []
 
 
@@ -45,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bd.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,13 +58,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'bd.middleware.BudgetRequetesMiddleware',
 ]
 
 ROOT_URLCONF = 'tchokos.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'bd.instrumentation.GabaritsMesures',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,13 +85,83 @@ WSGI_APPLICATION = 'tchokos.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# Profil choisi par TCHOKOS_DB : « sqlite » (défaut, une seule machine) ou
+# « postgresql » (serveur de base de données, pool de connexions optionnel).
+
+TCHOKOS_DB = os.environ.get('TCHOKOS_DB', 'sqlite')
+
+if TCHOKOS_DB == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('TCHOKOS_DB_NAME', 'tchokos'),
+            'USER': os.environ.get('TCHOKOS_DB_USER', 'tchokos'),
+            'PASSWORD': os.environ.get('TCHOKOS_DB_PASSWORD', ''),
+            'HOST': os.environ.get('TCHOKOS_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('TCHOKOS_DB_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('TCHOKOS_DB_POOL'):
+        # Pool psycopg 3 (psycopg[pool]) ; incompatible avec CONN_MAX_AGE
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('TCHOKOS_DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('TCHOKOS_DB_POOL_MAX', 10)),
+            'timeout': int(os.environ.get('TCHOKOS_DB_POOL_TIMEOUT', 10)),
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('TCHOKOS_DB_CONN_MAX_AGE', 60))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('TCHOKOS_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            # Connexions persistantes : les PRAGMA ne sont rejoués qu'à l'ouverture
+            'CONN_MAX_AGE': int(os.environ.get('TCHOKOS_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Attente d'un verrou avant « database is locked » (secondes)
+                'timeout': 20,
+                # Les écrivains prennent le verrou dès BEGIN au lieu d'échouer en cours de transaction
+                'transaction_mode': 'IMMEDIATE',
+                # Exécuté à chaque nouvelle connexion : fsync allégé, cache de pages de 64 Mo
+                'init_command': (
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA busy_timeout=20000;'
+                    'PRAGMA cache_size=-65536;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA mmap_size=268435456;'
+                ),
+            },
+        }
+    }
+    # WAL (lecteurs non bloqués par l'écrivain) sur demande seulement : le mode est
+    # écrit dans le fichier, ce qui modifierait le db.sqlite3 versionné du dépôt
+    if os.environ.get('TCHOKOS_DB_WAL', '').lower() in ('1', 'true', 'oui'):
+        DATABASES['default']['OPTIONS']['init_command'] = (
+            'PRAGMA journal_mode=WAL;' + DATABASES['default']['OPTIONS']['init_command']
+        )
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Backend fichier : partagé entre les workers d'une même machine, ce qui garde
+# l'invalidation du catalogue cohérente d'un processus à l'autre.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'TIMEOUT': 600,
     }
 }
 
+# Les tests ne lisent ni ne modifient le cache du serveur de développement
+if TESTS:
+    CACHES['default'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'TIMEOUT': 600}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -105,6 +182,80 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+# Le premier hasher est utilisé pour les nouveaux mots de passe ; les anciens
+# hachages sont migrés de façon transparente à la connexion suivante.
+
+# None : valeur par défaut de la version de Django installée
+PBKDF2_ITERATIONS = int(os.environ['TCHOKOS_PBKDF2_ITERATIONS']) if os.environ.get('TCHOKOS_PBKDF2_ITERATIONS') else None
+
+PASSWORD_HASHERS = os.environ.get('TCHOKOS_PASSWORD_HASHERS', ','.join([
+    'authentifie.hashers.PBKDF2ReglableHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+])).split(',')
+
+
+# Limitation de débit des points d'entrée d'authentification
+# (capacité de la rafale, essais par minute en moyenne). Les compteurs
+# exigent un cache où add/incr sont atomiques, ce que n'est pas le cache
+# fichier : mémoire locale par défaut (un compteur par processus), Redis
+# partagé entre les workers si TCHOKOS_LIMITATION_REDIS est renseigné.
+
+if os.environ.get('TCHOKOS_LIMITATION_REDIS'):
+    CACHES['limitation'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['TCHOKOS_LIMITATION_REDIS'],
+    }
+else:
+    CACHES['limitation'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'limitation'}
+
+LIMITATION_CACHE = 'limitation'
+
+LIMITATION_AUTH = {
+    'connexion': {'ip': (20, 10), 'email': (5, 1)},
+    'inscription': {'ip': (5, 1)},
+}
+
+
+# Sessions lues depuis le cache (écrites aussi en base) ; le panier de travail y
+# est conservé et recopié dans Panier/PanierItem au plus toutes les N secondes
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+PANIER_DELAI_PERSISTANCE = 300
+
+
+# Budget de requêtes SQL par vue (@budget_requetes) et détection des boucles N+1.
+# Actif par défaut en DEBUG ; le mode strict lève une erreur au lieu d'avertir.
+
+BUDGET_REQUETES_ACTIF = os.environ.get('TCHOKOS_BUDGET_REQUETES', str(DEBUG)).lower() in ('1', 'true', 'oui')
+BUDGET_REQUETES_STRICT = os.environ.get('TCHOKOS_BUDGET_REQUETES_STRICT', '').lower() in ('1', 'true', 'oui')
+BUDGET_REQUETES_SEUIL_N_PLUS_UN = 5
+
+# Instrumentation par vue (durée, base, gabarits, taille) : fraction des requêtes
+# mesurées (aucune pendant les tests), et adresses autorisées à lire /metriques/
+# (format Prometheus). La ligne JSON par requête mesurée n'est écrite sur la
+# console que si TCHOKOS_INSTRUMENTATION_JOURNAL est positionné.
+
+INSTRUMENTATION_ECHANTILLON = float(os.environ.get('TCHOKOS_INSTRUMENTATION_ECHANTILLON', 0 if TESTS else 1.0))
+INSTRUMENTATION_IPS = ('127.0.0.1', '::1')
+INSTRUMENTATION_JOURNAL = os.environ.get('TCHOKOS_INSTRUMENTATION_JOURNAL', '').lower() in ('1', 'true', 'oui')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'tchokos': {'handlers': ['console'], 'level': 'INFO'},
+        'tchokos.instrumentation': {'level': 'INFO' if INSTRUMENTATION_JOURNAL else 'WARNING'},
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -122,6 +273,14 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Fichiers envoyés (images produits et leurs variantes)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Vignettes produits : largeurs générées et fils de traitement (0 = dans la requête)
+IMAGES_LARGEURS = (160, 320, 640)
+IMAGES_WORKERS = int(os.environ.get('TCHOKOS_IMAGES_WORKERS', 2))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -129,3 +288,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Custom user model
 AUTH_USER_MODEL = 'bd.User'
+
+AUTHENTICATION_BACKENDS = [
+    'authentifie.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
@@ -1,3 +1,63 @@
+import json
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+
+from bd.models import Categorie, Produit, RemiseProposee, User, Vendeur
+
+
+class ProposerRemisesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categorie = Categorie.objects.create(nom='Chaussures')
+        cls.vendeurs = [
+            Vendeur.objects.create(username=f'vendeur{i}', email=f'vendeur{i}@tokos.cm', role='V') for i in range(2)
+        ]
+        cls.produits = [
+            Produit.objects.create(
+                nom=f'Basket {i}', description='Chaussure', prix=Decimal(1000), stock=1,
+                categorie=categorie, vendeur=cls.vendeurs[i // 2],
+            )
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        self.client.force_login(User.objects.get(pk=self.vendeurs[0].user_ptr_id))
+
+    def proposer(self, propositions):
+        return self.client.post(
+            reverse('vendeurs:proposer_remises'),
+            json.dumps({'propositions': [{'produit_id': pk, 'pourcentage': p} for pk, p in propositions]}),
+            content_type='application/json',
+        )
+
+    def en_attente(self):
+        return dict(RemiseProposee.objects.filter(statut='en_attente').values_list('produit_id', 'pourcentage_propose'))
+
+    def test_proposition_remplace_celle_en_attente(self):
+        a, b = self.produits[0].pk, self.produits[1].pk
+        self.assertEqual(self.proposer([(a, 10), (b, 20)]).json(), {'success': True, 'nombre': 2})
+        RemiseProposee.objects.filter(produit_id=b).update(statut='rejete')
+        self.proposer([(a, 15), (b, 25)])
+        self.assertEqual(self.en_attente(), {a: 15, b: 25})
+        self.assertEqual(RemiseProposee.objects.count(), 3)
+
+        propositions = self.client.get(reverse('vendeurs:mes_propositions')).json()['propositions']
+        # Une proposition remplacée garde sa date : seule celle de b est nouvelle
+        self.assertEqual([(p['produit_id'], p['statut']) for p in propositions],
+                         [(b, 'en_attente'), (b, 'rejete'), (a, 'en_attente')])
+
+    def test_refus_sans_rien_enregistrer(self):
+        a, etranger = self.produits[0].pk, self.produits[2].pk
+        for propositions in ([(a, 10), (etranger, 10)], [(a, 100)], [(a, 'dix')], [(a, 10), (999, 5)]):
+            reponse = self.proposer(propositions)
+            self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(
+            self.proposer([(a, 10), (etranger, 10)]).json()['error'], f'Produit(s) introuvable(s) : {etranger}',
+        )
+        self.assertFalse(RemiseProposee.objects.exists())
 
-# Create your tests here.
+        self.client.force_login(User.objects.create(username='client', email='client@tokos.cm', role='C'))
+        self.assertEqual(self.proposer([(a, 10)]).status_code, 403)
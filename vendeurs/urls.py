@@ -1,22 +1,10 @@
-"""
-URL configuration for tchokos project.
-
-The `urlpatterns` list routes URLs to views. For more information please see:
-    https://docs.djangoproject.com/en/5.1/topics/http/urls/
-Examples:
-Function views
-    1. Add an import:  from my_app import views
-    2. Add a URL to urlpatterns:  path('', views.home, name='home')
-Class-based views
-    1. Add an import:  from other_app.views import Home
-    2. Add a URL to urlpatterns:  path('', Home.as_view(), name='home')
-Including another URLconf
-    1. Import the include() function: from django.urls import include, path
-    2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
-"""
-from django.contrib import admin
 from django.urls import path
+from . import views
+
+app_name = 'vendeurs'
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # Remises proposées à la validation de l'administration
+    path('remises/', views.mes_propositions, name='mes_propositions'),
+    path('remises/proposer/', views.proposer_remises, name='proposer_remises'),
 ]
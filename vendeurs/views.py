@@ -1,3 +1,44 @@
-from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
 
-# Create your views here.
+from adminT.remises import RemiseInvalide, proposer_remises as enregistrer_propositions
+from bd.models import RemiseProposee
+import json
+
+
+@login_required
+@require_http_methods(["POST"])
+def proposer_remises(request):
+    """
+    Propose des remises sur ses produits :
+    {"propositions": [{"produit_id": 12, "pourcentage": 20}, ...]}
+    """
+    if request.user.role != 'V':
+        return JsonResponse({'error': 'Non autorisé'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        propositions = {p['produit_id']: p['pourcentage'] for p in data['propositions']}
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Données invalides'}, status=400)
+    
+    try:
+        nombre = enregistrer_propositions(request.user.vendeur, propositions)
+    except RemiseInvalide as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'success': True, 'nombre': nombre})
+
+
+@login_required
+def mes_propositions(request):
+    """Propositions de remise du vendeur connecté, les plus récentes d'abord"""
+    if request.user.role != 'V':
+        return JsonResponse({'error': 'Non autorisé'}, status=403)
+    
+    propositions = (
+        RemiseProposee.objects.filter(vendeur=request.user.vendeur)
+        .order_by('-date_proposition', '-id')
+        .values('id', 'produit_id', 'produit__nom', 'pourcentage_propose', 'statut', 'date_proposition')[:200]
+    )
+    return JsonResponse({'propositions': list(propositions)})